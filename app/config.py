@@ -1,4 +1,5 @@
 import logging
+from typing import Optional
 
 from pydantic_settings import BaseSettings
 
@@ -24,8 +25,34 @@ class Settings(BaseSettings):
         "The predicted number of streams based on the Spotify API audio features."
     )
 
+    # maximum number of songs per request of the batch prediction endpoint
+    MAX_BATCH_PREDICTIONS: int = 300
+
+    # disk tier of the raw features cache, lambda can only write to "/tmp"
+    RAW_FEATURES_CACHE_PATH: str = "/tmp/raw_features_cache.sqlite"
+    # number of predictions that are memoized per model
+    PREDICTION_CACHE_SIZE: int = 1_024
+
     GITHUB_URL: str = "https://github.com/MauroLuzzatto/music-flow"
 
+    # analytics records are uploaded in batches once full or older than max age
+    RECORD_SINK_MAX_RECORDS: int = 500
+    RECORD_SINK_MAX_AGE: float = 60.0
+    RECORD_SINK_MAX_BUFFER: int = 10_000
+    # write the analytics and prediction logs into this folder instead of s3
+    RECORD_SINK_LOCAL_PATH: Optional[str] = None
+
+    # shadow model that scores the same features as the served model, the
+    # paired predictions are written to the prediction log
+    SHADOW_MODEL_FOLDER: Optional[str] = None
+    # shadow evaluations are dropped once this many are pending
+    SHADOW_MAX_PENDING: int = 100
+    # seconds to wait for pending shadow evaluations before Lambda freezes
+    SHADOW_TIMEOUT: float = 5.0
+
+    # token of the admin endpoints (X-Admin-Token header), disabled if not set
+    ADMIN_TOKEN: Optional[str] = None
+
     LOGGING_LEVEL: int = logging.DEBUG
     BUCKET_NAME: str = "musicflow-data-store"
     FOLDER_PREDICTIONS: str = "predictions"
@@ -2,7 +2,6 @@
 Take from https://github.com/tom-draper/api-analytics
 """
 
-import uuid
 from datetime import datetime
 from time import time
 from typing import Optional
@@ -12,13 +11,19 @@ from starlette.requests import Request
 from starlette.responses import Response
 from starlette.types import ASGIApp
 
-from app.config import settings
-from app.core.aws import upload_json_to_s3
+from app.core.record_sink import RecordSink
 
 
 class Analytics(BaseHTTPMiddleware):
-    def __init__(self, app: ASGIApp, is_lambda_runtime: bool, is_testing: bool = False):
+    def __init__(
+        self,
+        app: ASGIApp,
+        sink: RecordSink,
+        is_lambda_runtime: bool,
+        is_testing: bool = False,
+    ):
         super().__init__(app)
+        self.sink = sink
         self.is_lambda_runtime = is_lambda_runtime
         self.is_testing = is_testing
 
@@ -55,12 +60,6 @@ class Analytics(BaseHTTPMiddleware):
             "environment": "prod" if self.is_lambda_runtime else "dev",
         }
         if self.is_lambda_runtime or self.is_testing:
-            save_folder = (
-                settings.FOLDER_ACTIVITY if not self.is_testing else "activity_test"
-            )
-            name = str(uuid.uuid4())
-            upload_json_to_s3(
-                data_dict=request_data,
-                save_name=f"{save_folder}/{name}.json",
-            )
+            # uploaded in batches by the sink, not on the request path
+            self.sink.add(request_data)
         return response
@@ -1,9 +1,12 @@
 import json
 import logging
-
-import boto3
+from functools import lru_cache
+from typing import Optional
 
 from app.config import settings
+from music_flow.core.startup_profiler import lazy_import
+
+boto3 = lazy_import("boto3")
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.StreamHandler())
@@ -13,7 +16,11 @@ logger.setLevel(settings.LOGGING_LEVEL)
 bucket_name = settings.BUCKET_NAME
 logger.debug(f"bucket_name: {bucket_name}")
 
-s3_resource = boto3.resource("s3")
+
+@lru_cache(maxsize=None)
+def get_s3_resource():
+    """create the s3 resource on first use, creating it takes long at cold start"""
+    return boto3.resource("s3")
 
 
 def upload_json_to_s3(data_dict: dict, save_name: str) -> bool:
@@ -29,12 +36,32 @@ def upload_json_to_s3(data_dict: dict, save_name: str) -> bool:
     assert save_name.endswith(".json")
 
     json_data = bytes(json.dumps(data_dict, indent=4).encode("UTF-8"))
-    s3object = s3_resource.Object(bucket_name, save_name)
+    s3object = get_s3_resource().Object(bucket_name, save_name)
     s3object.put(Body=(json_data))
     logger.debug(f"File uploaded: {save_name}")
     return True
 
 
+def upload_bytes_to_s3(
+    data: bytes, save_name: str, content_encoding: Optional[str] = None
+) -> bool:
+    """this function uploads raw bytes into a defined s3 bucket
+
+    args:
+        data: bytes to upload
+        save_name: name of the file in the s3 bucket
+        content_encoding: content encoding of the data, e.g. "gzip"
+
+    return:
+        bool: True if the file was uploaded successfully
+    """
+    kwargs = {"ContentEncoding": content_encoding} if content_encoding else {}
+    s3object = get_s3_resource().Object(bucket_name, save_name)
+    s3object.put(Body=data, **kwargs)
+    logger.debug(f"File uploaded: {save_name}")
+    return True
+
+
 if __name__ == "__main__":
     json_data = {"test": "test"}
     file_name = "test.json"
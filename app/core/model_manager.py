@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from music_flow import Predictor
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.DEBUG)
+
+
+class ModelManager:
+    """Holds the predictor that serves the requests and swaps in new models
+
+    A new model is loaded and warmed up in a background thread, while the
+    current predictor keeps serving. The swap replaces a single reference,
+    requests take the predictor once and finish on the model they started with.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Predictor],
+        model_folder: Optional[str],
+        on_swap: Optional[Callable[[Predictor], None]] = None,
+    ):
+        self.loader = loader
+        self.model_folder = model_folder
+        self.on_swap = on_swap
+        self.predictor: Optional[Predictor] = None
+        self.reload_lock = threading.Lock()
+        self.task: Optional[asyncio.Task] = None
+        self.loaded_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def get_predictor(self) -> Predictor:
+        """the predictor of the current model
+
+        Raises:
+            Exception: if no model is loaded
+        """
+        predictor = self.predictor
+        if predictor is None:
+            raise Exception("model is not loaded")
+        return predictor
+
+    def is_reloading(self) -> bool:
+        return self.reload_lock.locked()
+
+    def swap(self, predictor: Predictor) -> None:
+        self.predictor = predictor
+        self.model_folder = predictor.model_folder
+        self.loaded_at = time.time()
+        logger.info(
+            f"serving model {predictor.model_folder} ({predictor.model_version})"
+        )
+        if self.on_swap:
+            self.on_swap(predictor)
+
+    def load(self) -> Predictor:
+        """load and warm up the model folder, unless a model is already loaded"""
+        with self.reload_lock:
+            if self.predictor is None:
+                predictor = self.loader(self.model_folder)
+                predictor.warm_up()
+                self.swap(predictor)
+            return self.predictor
+
+    def reload(self, model_folder: str) -> Predictor:
+        """load the model folder, warm it up and swap it in
+
+        Args:
+            model_folder (str): name of the model folder
+
+        Raises:
+            Exception: if a reload is already running
+
+        Returns:
+            Predictor: the new predictor
+        """
+        if not self.reload_lock.acquire(blocking=False):
+            raise Exception("a model reload is already running")
+        try:
+            predictor = self.loader(model_folder)
+            predictor.warm_up()
+            self.swap(predictor)
+            self.last_error = None
+            return predictor
+        except Exception as e:
+            logger.error(f"reload of {model_folder} failed: {e}")
+            self.last_error = str(e)
+            raise
+        finally:
+            self.reload_lock.release()
+
+    def start_reload(self, model_folder: str) -> None:
+        """reload the model in a background thread, the current model serves the
+        requests until the new one is swapped in
+
+        Raises:
+            Exception: if a reload is already running
+        """
+        if self.is_reloading() or (self.task is not None and not self.task.done()):
+            raise Exception("a model reload is already running")
+        self.task = asyncio.create_task(asyncio.to_thread(self.reload, model_folder))
+        self.task.add_done_callback(self.log_result)
+
+    @staticmethod
+    def log_result(task: asyncio.Task) -> None:
+        # the error is kept in `last_error`, retrieving it avoids the asyncio
+        # "exception was never retrieved" warning
+        if not task.cancelled() and task.exception() is None:
+            logger.info("model reload finished")
+
+    def get_status(self) -> dict:
+        predictor = self.predictor
+        return {
+            "model_folder": predictor.model_folder if predictor else None,
+            "model_version": predictor.model_version if predictor else None,
+            "loaded_at": self.loaded_at,
+            "is_reloading": self.is_reloading()
+            or (self.task is not None and not self.task.done()),
+            "last_error": self.last_error,
+        }
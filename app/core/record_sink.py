@@ -0,0 +1,233 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional, Protocol
+
+from app.config import settings
+from app.core.aws import upload_bytes_to_s3
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel(settings.LOGGING_LEVEL)
+
+
+class Uploader(Protocol):
+    def upload(self, data: bytes, save_name: str) -> None: ...
+
+
+class S3Uploader:
+    """Upload the batches into the s3 bucket of the app"""
+
+    def upload(self, data: bytes, save_name: str) -> None:
+        upload_bytes_to_s3(data=data, save_name=save_name, content_encoding="gzip")
+
+
+class LocalUploader:
+    """Write the batches into a local folder, stand-in for s3 in tests and
+    during development"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def upload(self, data: bytes, save_name: str) -> None:
+        path_file = os.path.join(self.path, save_name)
+        os.makedirs(os.path.dirname(path_file), exist_ok=True)
+
+        # write to a temporary file first, so that readers never see a partial batch
+        path_tmp = f"{path_file}.tmp"
+        with open(path_tmp, "wb") as f:
+            f.write(data)
+        os.replace(path_tmp, path_file)
+        logger.debug(f"File saved: {path_file}")
+
+
+def get_uploader(path: Optional[str] = None) -> Uploader:
+    """get the local uploader if a folder is given, otherwise the s3 uploader"""
+    if path:
+        return LocalUploader(path)
+    return S3Uploader()
+
+
+class RecordSink:
+    """Buffer of records that are uploaded in batches
+
+    Records are added without blocking the request and uploaded as one gzip
+    compressed NDJSON file once the batch is full or the oldest record is older
+    than `max_age` seconds. The uploads run in a background task, `flush` uploads
+    the remaining records on shutdown or at the end of a Lambda invocation.
+    """
+
+    def __init__(
+        self,
+        uploader: Uploader,
+        folder: str,
+        max_records: int = settings.RECORD_SINK_MAX_RECORDS,
+        max_age: float = settings.RECORD_SINK_MAX_AGE,
+        max_buffer: int = settings.RECORD_SINK_MAX_BUFFER,
+        is_partitioned: bool = False,
+    ):
+        """
+        Args:
+            uploader (Uploader): uploader of the batches
+            folder (str): folder of the batches
+            max_records (int): number of records per batch
+            max_age (float): seconds after which a batch is uploaded
+            max_buffer (int): maximum number of buffered records, the oldest records
+                are dropped if the uploads fail for longer
+            is_partitioned (bool): store the batches in hourly partitions
+                (year=/month=/day=/hour=) of the upload time in UTC
+        """
+        self.uploader = uploader
+        self.folder = folder
+        self.max_records = max_records
+        self.max_age = max_age
+        self.max_buffer = max_buffer
+        self.is_partitioned = is_partitioned
+
+        self.records: list[dict] = []
+        self.first_record_at: Optional[float] = None
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.event: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+
+        self.uploaded_records = 0
+        self.uploaded_batches = 0
+        self.failed_uploads = 0
+        self.dropped_records = 0
+
+    def add(self, record: dict) -> None:
+        """add a record to the buffer, can be called from any thread"""
+        with self.lock:
+            if not self.records:
+                self.first_record_at = time.monotonic()
+            self.records.append(record)
+
+            if len(self.records) > self.max_buffer:
+                number_of_dropped = len(self.records) - self.max_buffer
+                del self.records[:number_of_dropped]
+                self.dropped_records += number_of_dropped
+
+            is_full = len(self.records) >= self.max_records
+
+        if is_full and self.loop is not None and self.event is not None:
+            self.loop.call_soon_threadsafe(self.event.set)
+
+    def get_name(self) -> str:
+        if not self.is_partitioned:
+            return f"{self.folder}/{uuid.uuid4()}.ndjson.gz"
+
+        now = datetime.now(timezone.utc)
+        partition = now.strftime("year=%Y/month=%m/day=%d/hour=%H")
+        timestamp = now.strftime("%Y%m%dT%H%M%S")
+        return f"{self.folder}/{partition}/{timestamp}-{uuid.uuid4()}.ndjson.gz"
+
+    @staticmethod
+    def encode(records: list[dict]) -> bytes:
+        """encode the records as gzip compressed NDJSON"""
+        lines = "".join(
+            json.dumps(record, separators=(",", ":"), default=str) + "\n"
+            for record in records
+        )
+        return gzip.compress(lines.encode("UTF-8"))
+
+    def is_due(self) -> bool:
+        with self.lock:
+            if not self.records:
+                return False
+            is_full = len(self.records) >= self.max_records
+            is_old = time.monotonic() - self.first_record_at >= self.max_age  # type: ignore
+            return is_full or is_old
+
+    def flush(self) -> int:
+        """upload all buffered records in batches of `max_records`
+
+        Returns:
+            int: number of uploaded records
+        """
+        with self.flush_lock:
+            with self.lock:
+                records = self.records
+                self.records = []
+                self.first_record_at = None
+
+            number_of_uploaded = 0
+            for start in range(0, len(records), self.max_records):
+                batch = records[start : start + self.max_records]
+                try:
+                    self.uploader.upload(self.encode(batch), self.get_name())
+                except Exception as e:
+                    logger.error(f"Failed to upload {len(batch)} records: {e}")
+                    self.failed_uploads += 1
+                    self.requeue(records[start:])
+                    break
+                number_of_uploaded += len(batch)
+                self.uploaded_batches += 1
+
+            self.uploaded_records += number_of_uploaded
+            return number_of_uploaded
+
+    def requeue(self, records: list[dict]) -> None:
+        """put the records of a failed upload back in front of the buffer"""
+        with self.lock:
+            self.records = records + self.records
+            self.first_record_at = time.monotonic()
+            if len(self.records) > self.max_buffer:
+                number_of_dropped = len(self.records) - self.max_buffer
+                del self.records[:number_of_dropped]
+                self.dropped_records += number_of_dropped
+
+    def get_timeout(self) -> float:
+        """seconds until the buffered records are due because of their age"""
+        with self.lock:
+            if self.first_record_at is None:
+                return self.max_age
+            return max(0.0, self.first_record_at + self.max_age - time.monotonic())
+
+    async def run(self) -> None:
+        """upload the due batches until the task is cancelled"""
+        while True:
+            try:
+                await asyncio.wait_for(self.event.wait(), timeout=self.get_timeout())  # type: ignore
+            except asyncio.TimeoutError:
+                pass
+            self.event.clear()  # type: ignore
+
+            if self.is_due():
+                await asyncio.to_thread(self.flush)
+
+    def start(self) -> None:
+        """start the background task on the running event loop"""
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """stop the background task and upload the remaining records"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.task = None
+        self.loop = None
+        self.event = None
+        await asyncio.to_thread(self.flush)
+
+    def get_stats(self) -> dict:
+        return {
+            "buffered_records": len(self.records),
+            "uploaded_records": self.uploaded_records,
+            "uploaded_batches": self.uploaded_batches,
+            "failed_uploads": self.failed_uploads,
+            "dropped_records": self.dropped_records,
+        }
@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Optional
+
+from app.core.record_sink import RecordSink
+from music_flow import Predictor
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.DEBUG)
+
+
+class ShadowEvaluator:
+    """Scores the features of the served predictions with a shadow model
+
+    The shadow model runs in its own thread, off the response path, on the
+    features that were already fetched for the primary model. The paired
+    predictions and the latency of both models are written to the prediction
+    log. Requests are dropped instead of queued once `max_pending` evaluations
+    are waiting, so that a slow shadow model never builds up a backlog.
+    """
+
+    def __init__(self, sink: RecordSink, max_pending: int):
+        self.sink = sink
+        self.max_pending = max_pending
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.futures: set[Future] = set()
+        self.lock = threading.Lock()
+        self.evaluated = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(
+        self, predictor: Predictor, samples: list[dict], records: list[dict]
+    ) -> None:
+        """score the samples with the shadow predictor in the background
+
+        Args:
+            predictor (Predictor): shadow predictor
+            samples (list[dict]): flattened features, scored by the primary model
+            records (list[dict]): prediction log record of the primary model per sample
+        """
+        with self.lock:
+            if len(self.futures) >= self.max_pending:
+                self.dropped += len(samples)
+                return
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="shadow"
+                )
+            future = self.executor.submit(self.evaluate, predictor, samples, records)
+            self.futures.add(future)
+        future.add_done_callback(self.remove)
+
+    def remove(self, future: Future) -> None:
+        with self.lock:
+            self.futures.discard(future)
+
+    def evaluate(
+        self, predictor: Predictor, samples: list[dict], records: list[dict]
+    ) -> None:
+        start = time.perf_counter()
+        try:
+            values = predictor.predict_from_features_batch(samples)
+        except Exception as e:
+            logger.error(f"shadow prediction failed: {e}")
+            with self.lock:
+                self.failed += len(samples)
+            return
+        latency_ms = round((time.perf_counter() - start) * 1000, 3)
+
+        for record, value in zip(records, values):
+            shadow = {
+                "model_folder": predictor.model_folder,
+                "model_version": predictor.model_version,
+                "prediction": round(value, 2),
+                "latency_ms": latency_ms,
+            }
+            self.sink.add({**record, "shadow": shadow})
+        with self.lock:
+            self.evaluated += len(samples)
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """wait for the pending evaluations, e.g. before Lambda freezes"""
+        with self.lock:
+            futures = list(self.futures)
+        if futures:
+            wait(futures, timeout=timeout)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "pending": len(self.futures),
+                "evaluated": self.evaluated,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
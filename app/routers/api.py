@@ -7,8 +7,14 @@ from app.config import settings
 from app.schemas import Features, Health
 from app.utils.response_formatter import prepare_raw_features_response
 from app.utils.response_messages import get_exception_details
-from music_flow import get_formatted_features, get_raw_features
+from music_flow import get_formatted_features, get_raw_features_async
 from music_flow.__init__ import __version__ as model_version
+from music_flow.core.features.get_batch_raw_features import batch_spotify_api
+from music_flow.core.features.get_raw_features import (
+    raw_features_cache,
+    spotify_api,
+)
+from music_flow.core.startup_profiler import startup_profiler
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.StreamHandler())
@@ -37,6 +43,24 @@ async def health_api() -> Health:
     return health
 
 
+@router.get("/stats")
+async def stats_api() -> dict:
+    """Get the connection pool statistics of the Spotify API clients and the
+    hit, miss and eviction counts of the raw features cache"""
+    return {
+        "spotify_api": spotify_api.get_pool_stats(),
+        "batch_spotify_api": batch_spotify_api.get_pool_stats(),
+        "raw_features_cache": raw_features_cache.get_stats(),
+    }
+
+
+@router.get("/startup")
+async def startup_api() -> dict:
+    """Get the startup timings in milliseconds of the phases (imports, model
+    download, unpickle, token) and of the lazily loaded imports"""
+    return startup_profiler.get_report()
+
+
 @router.get("/raw_features/")
 async def get_raw_features_api(song: str, artist: str) -> dict:
     """
@@ -52,7 +76,7 @@ async def get_raw_features_api(song: str, artist: str) -> dict:
     Returns:
         dict: dict with raw features
     """
-    raw_features, status_code = get_raw_features(song, artist)
+    raw_features, status_code = await get_raw_features_async(song, artist)
 
     if raw_features["status"] != "success":
         detail = prepare_raw_features_response(raw_features, status_code)
@@ -1,20 +1,29 @@
 import logging
+from functools import lru_cache
 from pathlib import Path
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 
 from app.core.highscore import Highscore
 from app.utils.song_request_form import SongRequestForm
+from music_flow.core.startup_profiler import lazy_import
 from music_flow.core.utils import path_app
 
+templating = lazy_import("fastapi.templating")
+
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.StreamHandler())
 logger.setLevel(logging.DEBUG)
 
 base_path = Path(path_app).absolute()
-templates = Jinja2Templates(directory=str(base_path / "templates"))
+
+
+@lru_cache(maxsize=None)
+def get_templates():
+    """load jinja2 and the templates once the first page is rendered"""
+    return templating.Jinja2Templates(directory=str(base_path / "templates"))
+
 
 erros = {
     "song_not_found": "Song not found.",
@@ -44,7 +53,7 @@ async def get_form(request: Request):
         "scores": highscore.get_highscore(),
     }
     template = "prediction.html"
-    return templates.TemplateResponse(template, payload)
+    return get_templates().TemplateResponse(template, payload)
 
 
 @router.get("/about/", response_class=HTMLResponse)
@@ -57,7 +66,7 @@ async def get_about(request: Request):
     Returns:
         _type_: _description_
     """
-    return templates.TemplateResponse("about.html", {"request": request})
+    return get_templates().TemplateResponse("about.html", {"request": request})
 
 
 @router.post("/search_song")
@@ -76,20 +85,25 @@ async def get_success_endpoint(request: Request):
 
     if not form.is_valid():
         payload = form.as_dict()
-        return templates.TemplateResponse(template, payload)
+        return get_templates().TemplateResponse(template, payload)
 
     logger.debug(f"form: {form.as_dict()}")
 
     from main import get_prediction_api
 
     try:
-        output = await get_prediction_api(song=form.song, artist=form.artist)  # type: ignore
+        # the model version header of the API response is not used by the form
+        output = await get_prediction_api(
+            song=form.song,  # type: ignore
+            artist=form.artist,  # type: ignore
+            response=Response(),
+        )
     except HTTPException:
         form.errors.append(erros["failed_to_fetch_song"])
         payload = form.as_dict()
         del payload["song"]
         del payload["artist"]
-        return templates.TemplateResponse(template, payload)
+        return get_templates().TemplateResponse(template, payload)
 
     header = f'"{form.song.capitalize()}" by "{form.artist.capitalize()}"'  # type: ignore
     response = output.dict()
@@ -107,8 +121,8 @@ async def get_success_endpoint(request: Request):
     }
     try:
         template = "partials/success.html"
-        return templates.TemplateResponse(template, payload)
+        return get_templates().TemplateResponse(template, payload)
     except Exception as e:
         form.errors.append(erros["generic_error"])
         logger.error(e)
-        return templates.TemplateResponse(template, payload)
+        return get_templates().TemplateResponse(template, payload)
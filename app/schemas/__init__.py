@@ -1,5 +1,10 @@
 from app.schemas.features import Features
 from app.schemas.raw_features import RawFeatures
-from app.schemas.schema import Health, Prediction
+from app.schemas.schema import (
+    Health,
+    Prediction,
+    Predictions,
+    PredictionsRequest,
+)
 
-__all__ = [Features, RawFeatures, Prediction, Health]
+__all__ = [Features, RawFeatures, Prediction, Predictions, PredictionsRequest, Health]
@@ -1,6 +1,8 @@
-from typing import Any, List, Union
+from typing import Any, List, Optional, Union
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
+
+from app.config import settings
 
 
 class Health(BaseModel):
@@ -51,6 +53,43 @@ class Prediction(BaseModel):
     song_metadata: SongMetadataModel
     message: Message
     preview_url: Union[str, None]
+    model_version: Optional[str] = None
+
+
+class PredictionRequestItem(BaseModel):
+    song: Optional[str] = None
+    artist: Optional[str] = None
+    track_id: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_song_or_track_id(self) -> "PredictionRequestItem":
+        if not self.track_id and not self.song:
+            raise ValueError("either song or track_id is required")
+        return self
+
+
+class PredictionsRequest(BaseModel):
+    items: List[PredictionRequestItem] = Field(
+        min_length=1, max_length=settings.MAX_BATCH_PREDICTIONS
+    )
+
+
+class BatchPrediction(BaseModel):
+    song: Optional[str] = None
+    artist: Optional[str] = None
+    track_id: Optional[str] = None
+    status: str
+    failure_type: Optional[str] = None
+    prediction: Optional[float] = None
+    song_metadata: Optional[SongMetadataModel] = None
+    message: Optional[Message] = None
+    preview_url: Union[str, None] = None
+
+
+class Predictions(BaseModel):
+    description: str
+    model_version: Optional[str] = None
+    predictions: List[BatchPrediction]
 
 
 class Metadata(BaseModel):
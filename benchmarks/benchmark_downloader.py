@@ -0,0 +1,191 @@
+"""
+Throughput of the audio feature download against the local Spotify stand-in,
+one worker, as the former serial loop, compared to the concurrent workers and
+the pipelined batch download.
+
+    python -m benchmarks.benchmark_downloader --tracks 200 --latency lognormal:50:0.5
+
+With `--stub-rate-limit 60 --adaptive` the stand-in answers with 429s above 60
+requests per second and the downloads follow the adaptive limit instead of a
+fixed rate, the progress of every download shows its 429s.
+
+    python -m benchmarks.benchmark_downloader --processes 2 --stub-rate-limit 60
+
+runs the adaptive download in two processes at once, first with a limiter per
+process and then with the limiter shared in a SQLite file
+(SPOTIFY_LIMITER_PATH), and compares the 429s that the stand-in returned.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import Callable, Optional
+
+import pandas as pd
+import requests
+
+from benchmarks.spotify_stub import StubConfig, start_stub_server
+from music_flow.config import settings
+from music_flow.core.features import get_raw_features
+from music_flow.dataset.download_audio_features import download_audio_features
+from music_flow.dataset.download_audio_features_batch import (
+    download_audio_features_batch,
+)
+
+
+def run_download(
+    path: str, name: str, tracks: int, download: Callable, **kwargs
+) -> float:
+    """download `tracks` new tracks and return the tracks per second"""
+    path_run = os.path.join(path, name)
+    os.makedirs(path_run)
+
+    target_values = pd.DataFrame(
+        {
+            "hash": [f"{name}-{i}" for i in range(tracks)],
+            "track_name": [f"{name} track {i}" for i in range(tracks)],
+            "artist_name": ["benchmark artist"] * tracks,
+        }
+    )
+    path_target_values = os.path.join(path_run, "target_values.csv")
+    target_values.to_csv(path_target_values, sep=";", index=False)
+
+    start = time.perf_counter()
+    download(
+        path_target_values=path_target_values,
+        path_data_lake=os.path.join(path_run, "data_lake"),
+        **kwargs,
+    )
+    return tracks / (time.perf_counter() - start)
+
+
+def run_process(url: str, path: str, name: str, tracks: int, workers: int) -> float:
+    """adaptive download in a new process, the limiter of the process is shared
+    if SPOTIFY_LIMITER_PATH was set before the process was started"""
+    logging.disable(logging.INFO)
+    settings.SPOTIFY_API_URL = f"{url}/v1"
+    token_manager = get_raw_features.spotify_api.token_manager
+    token_manager.token, token_manager.expires_at = "benchmark", time.time() + 3600
+    return run_download(
+        path,
+        name,
+        tracks,
+        download_audio_features,
+        max_workers=workers,
+        rate_limit=None,
+    )
+
+
+def run_processes(
+    url: str, path: str, name: str, processes: int, tracks: int, workers: int
+) -> tuple[float, int]:
+    """download in parallel processes
+
+    Returns:
+        tuple[float, int]: tracks per second of all processes and the number of
+            429 responses
+    """
+    throttled_before = requests.get(f"{url}/stub/stats").json().get("429", 0)
+    start = time.perf_counter()
+    # spawn, so that every process creates its limiter from the environment
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        pool.starmap(
+            run_process,
+            [
+                (url, path, f"{name}-{index}", tracks, workers)
+                for index in range(processes)
+            ],
+        )
+    rate = processes * tracks / (time.perf_counter() - start)
+    throttled = requests.get(f"{url}/stub/stats").json().get("429", 0)
+    return rate, throttled - throttled_before
+
+
+def compare_limiters(url: str, parsed: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as path:
+        separate = run_processes(
+            url, path, "separate", parsed.processes, parsed.tracks, parsed.workers
+        )
+        os.environ["SPOTIFY_LIMITER_PATH"] = os.path.join(path, "limiter.sqlite")
+        try:
+            shared = run_processes(
+                url, path, "shared", parsed.processes, parsed.tracks, parsed.workers
+            )
+        finally:
+            del os.environ["SPOTIFY_LIMITER_PATH"]
+
+    print(f"\n{parsed.processes} processes with {parsed.workers} workers each")
+    for name, (rate, throttled) in [
+        ("separate limiters:", separate),
+        ("shared limiter:", shared),
+    ]:
+        print(f"{name:19} {rate:8.1f} tracks/s, {throttled} 429s")
+
+
+def main(args: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--rate-limit", type=float, default=1_000)
+    parser.add_argument("--adaptive", action="store_true")
+    parser.add_argument("--latency", default="lognormal:50:0.5")
+    parser.add_argument("--stub-rate-limit", type=float, default=None)
+    parser.add_argument("--processes", type=int, default=None)
+    parsed = parser.parse_args(args)
+
+    logging.disable(logging.INFO)
+    server, url = start_stub_server(
+        StubConfig(latency=parsed.latency, rate_limit=parsed.stub_rate_limit)
+    )
+    settings.SPOTIFY_API_URL = f"{url}/v1"
+    token_manager = get_raw_features.spotify_api.token_manager
+    token_manager.token, token_manager.expires_at = "benchmark", time.time() + 3600
+
+    if parsed.processes:
+        try:
+            compare_limiters(url, parsed)
+        finally:
+            server.shutdown()
+        return
+
+    try:
+        with tempfile.TemporaryDirectory() as path:
+            rate_limit = None if parsed.adaptive else parsed.rate_limit
+            serial = run_download(
+                path,
+                "serial",
+                parsed.tracks,
+                download_audio_features,
+                max_workers=1,
+                rate_limit=rate_limit,
+            )
+            concurrent = run_download(
+                path,
+                "concurrent",
+                parsed.tracks,
+                download_audio_features,
+                max_workers=parsed.workers,
+                rate_limit=rate_limit,
+            )
+            batch = run_download(
+                path,
+                "batch",
+                parsed.tracks,
+                download_audio_features_batch,
+                search_workers=parsed.workers,
+                rate_limit=rate_limit,
+            )
+    finally:
+        server.shutdown()
+
+    print(f"\nserial:     {serial:8.1f} tracks/s")
+    print(f"concurrent: {concurrent:8.1f} tracks/s ({parsed.workers} workers)")
+    print(f"batch:      {batch:8.1f} tracks/s ({parsed.workers} search workers)")
+    print(f"speedup:    {concurrent / serial:8.1f}x, batch {batch / serial:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Micro-benchmarks of the prediction hot path, from the Spotify responses to the
+serialized response. Runs offline on recorded Spotify responses and a model
+that is trained on synthetic data.
+
+    python -m benchmarks.benchmark_hot_path --output benchmark.json
+    python -m benchmarks.benchmark_hot_path --compare benchmark.json
+
+The results are written as json, with p50/p95 timings in microseconds, the peak
+memory allocated during a call and the number of memory blocks that are still
+allocated after a call, per stage.
+"""
+
+import argparse
+import json
+import logging
+import os
+import pickle
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.schemas import Prediction
+from app.utils.response_formatter import map_score_to_emoji
+from music_flow.config import feature_settings
+from music_flow.core.features.get_formatted_features import get_formatted_features
+from music_flow.core.features.get_raw_features import (
+    get_endpoints,
+    spotify_api,
+    store_endpoint_responses,
+)
+from music_flow.core.features.preprocessing import feature_preprocessing
+from music_flow.core.model_loader import ModelLoader
+from music_flow.core.model_registry import ModelRegistry
+from music_flow.core.predictor import Predictor
+from music_flow.core.tree_ensemble import TreeEnsemble
+
+path_fixtures = os.path.join(os.path.dirname(__file__), "fixtures")
+model_folder = "benchmark-model"
+
+
+def get_raw_features() -> dict:
+    """raw features of the recorded Spotify responses, the same as returned by
+    `get_raw_features`"""
+    with open(os.path.join(path_fixtures, "spotify_responses.json")) as f:
+        fixture = json.load(f)
+
+    data = {"track_name": fixture["track_name"], "artist_name": fixture["artist_name"]}
+    endpoints = get_endpoints(spotify_api)
+    responses = [(fixture[endpoint.name], 200) for endpoint in endpoints]
+    data, _ = store_endpoint_responses(data, fixture["track_id"], endpoints, responses)
+    return data
+
+
+def create_synthetic_model(
+    path_registry: str, n_estimators: int, max_depth: int, seed: int = 0
+) -> None:
+    """train a XGBRegressor on random data and save it as model folder, with
+    the pickled model, the exported trees, the metadata and the manifest"""
+    from xgboost import XGBRegressor  # type: ignore
+
+    columns = feature_settings.columns_scope
+    rng = np.random.default_rng(seed)
+    X = rng.random((2_000, len(columns)), dtype=np.float32)
+    y = np.log1p(rng.integers(0, 30, 2_000)).astype(np.float32)
+
+    estimator = XGBRegressor(
+        n_estimators=n_estimators, max_depth=max_depth, random_state=seed
+    )
+    estimator.fit(X, y)
+
+    path_folder = os.path.join(path_registry, model_folder)
+    os.makedirs(path_folder, exist_ok=True)
+    with open(os.path.join(path_folder, "model.pickle"), "wb") as handle:
+        pickle.dump(estimator, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    TreeEnsemble.from_xgboost(estimator).save(
+        os.path.join(path_folder, TreeEnsemble.file_name)
+    )
+    metadata = {
+        "model": {"name": "model.pickle", "model_version": "benchmark"},
+        "data": {"features": columns},
+    }
+    with open(os.path.join(path_folder, "metadata.json"), "w") as f:
+        json.dump(metadata, f)
+
+    # the manifest marks the folder as complete, nothing is downloaded
+    registry = ModelRegistry("benchmark", path_registry=path_registry)
+    files = ["model.pickle", TreeEnsemble.file_name, "metadata.json"]
+    registry.write_manifest(
+        path_folder, registry.create_manifest(path_folder, model_folder, files)
+    )
+
+
+def measure(func: Callable, iterations: int, warmup: int) -> dict:
+    """time `func` and measure the memory it allocates
+
+    Args:
+        func (Callable): stage to measure, without arguments
+        iterations (int): number of timed calls
+        warmup (int): number of calls before the timed calls
+
+    Returns:
+        dict: timings in microseconds, peak allocated KiB and retained blocks
+    """
+    for _ in range(warmup):
+        func()
+
+    timings = np.empty(iterations)
+    for iteration in range(iterations):
+        start = time.perf_counter_ns()
+        func()
+        timings[iteration] = time.perf_counter_ns() - start
+    timings /= 1_000
+
+    # a separate pass, tracemalloc slows down the calls
+    allocation_iterations = min(iterations, 20)
+    peaks, blocks = [], []
+    tracemalloc.start()
+    for _ in range(allocation_iterations):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        blocks_before = sys.getallocatedblocks()
+        func()
+        blocks.append(sys.getallocatedblocks() - blocks_before)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "p50_us": round(float(np.percentile(timings, 50)), 2),
+        "p95_us": round(float(np.percentile(timings, 95)), 2),
+        "mean_us": round(float(timings.mean()), 2),
+        "min_us": round(float(timings.min()), 2),
+        "peak_kib": round(float(np.median(peaks)) / 1024, 2),
+        "retained_blocks": int(np.median(blocks)),
+    }
+
+
+def get_stages(path_registry: str, batch_size: int) -> dict[str, tuple]:
+    """stages of the hot path as (function, iterations scale)"""
+    raw_features = get_raw_features()
+    features = get_formatted_features(data=raw_features, is_flattened=True)
+    metadata = features.pop("metadata")
+
+    frame = pd.DataFrame(features, index=[0])
+    frame_batch = pd.concat([frame] * batch_size, ignore_index=True)
+
+    predictors = {
+        backend: Predictor(
+            model_folder=model_folder, path_registry=path_registry, backend=backend
+        )
+        for backend in ["xgboost", "numpy"]
+    }
+    encoder = predictors["numpy"].encoder
+    samples = [features] * batch_size
+
+    prediction = predictors["numpy"].predict_from_features(features)
+    data_response = {
+        "song": raw_features["track_name"],
+        "artist": raw_features["artist_name"],
+        "description": "benchmark",
+        "model_version": "benchmark",
+        "prediction": round(prediction, 2),
+        "song_metadata": metadata,
+        "message": map_score_to_emoji(prediction),
+        "preview_url": raw_features["track"]["preview_url"],
+    }
+
+    def load_model(backend: str) -> None:
+        ModelLoader(
+            model_folder=model_folder, path_registry=path_registry, backend=backend
+        ).load()
+
+    def serialize_response() -> bytes:
+        return Prediction(**data_response).model_dump_json().encode("utf-8")
+
+    return {
+        "get_formatted_features": (
+            lambda: get_formatted_features(data=raw_features, is_flattened=True),
+            1,
+        ),
+        "feature_preprocessing": (lambda: feature_preprocessing(frame), 1),
+        f"feature_preprocessing[batch={batch_size}]": (
+            lambda: feature_preprocessing(frame_batch),
+            0.1,
+        ),
+        "feature_encoder": (lambda: encoder.transform(features), 1),
+        "predict_from_features[xgboost]": (
+            lambda: predictors["xgboost"].predict_from_features(features),
+            1,
+        ),
+        "predict_from_features[numpy]": (
+            lambda: predictors["numpy"].predict_from_features(features),
+            1,
+        ),
+        f"predict_from_features_batch[numpy, batch={batch_size}]": (
+            lambda: predictors["numpy"].predict_from_features_batch(samples),
+            0.1,
+        ),
+        "model_load[xgboost]": (lambda: load_model("xgboost"), 0.05),
+        "model_load[numpy]": (lambda: load_model("numpy"), 0.05),
+        "response_serialization": (serialize_response, 1),
+    }
+
+
+def get_environment() -> dict:
+    import xgboost  # type: ignore
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "xgboost": xgboost.__version__,
+    }
+
+
+def compare(results: dict, previous: dict, threshold: float) -> list[str]:
+    """print the p50 and p95 ratios against a previous run
+
+    Returns:
+        list[str]: stages with a p50 slower than `threshold` times the previous
+    """
+    regressions = []
+    print(f"\n{'stage':<52} {'p50':>10} {'prev':>10} {'ratio':>7}")
+    for stage, result in results["stages"].items():
+        previous_result = previous["stages"].get(stage)
+        if previous_result is None:
+            print(f"{stage:<52} {result['p50_us']:>10.1f} {'-':>10} {'new':>7}")
+            continue
+        ratio = result["p50_us"] / previous_result["p50_us"]
+        flag = " !" if ratio > threshold else ""
+        print(
+            f"{stage:<52} {result['p50_us']:>10.1f} "
+            f"{previous_result['p50_us']:>10.1f} {ratio:>6.2f}x{flag}"
+        )
+        if ratio > threshold:
+            regressions.append(stage)
+    return regressions
+
+
+def main(args: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=1_000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--n-estimators", type=int, default=200)
+    parser.add_argument("--max-depth", type=int, default=6)
+    parser.add_argument("--output", help="write the results to this json file")
+    parser.add_argument("--compare", help="json file of a previous run")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    parsed = parser.parse_args(args)
+
+    # the loaders log every call
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as path_registry:
+        create_synthetic_model(path_registry, parsed.n_estimators, parsed.max_depth)
+        stages = get_stages(path_registry, parsed.batch_size)
+
+        results = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "environment": get_environment(),
+            "config": {
+                "batch_size": parsed.batch_size,
+                "n_estimators": parsed.n_estimators,
+                "max_depth": parsed.max_depth,
+            },
+            "stages": {},
+        }
+        for stage, (func, scale) in stages.items():
+            iterations = max(int(parsed.iterations * scale), 10)
+            warmup = max(int(parsed.warmup * scale), 1)
+            results["stages"][stage] = measure(func, iterations, warmup)
+            result = results["stages"][stage]
+            print(
+                f"{stage:<52} p50 {result['p50_us']:>10.1f} us  "
+                f"p95 {result['p95_us']:>10.1f} us  "
+                f"peak {result['peak_kib']:>9.1f} KiB"
+            )
+
+    if parsed.output:
+        with open(parsed.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSave: {parsed.output}")
+
+    if parsed.compare:
+        with open(parsed.compare) as f:
+            previous = json.load(f)
+        regressions = compare(results, previous, parsed.threshold)
+        if regressions:
+            print(f"\nslower than {parsed.threshold}x: {regressions}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Compare the vectorized `feature_preprocessing` with the previous row-wise
+implementation on a synthetic dataset
+
+    python -m benchmarks.benchmark_preprocessing --rows 100000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from music_flow.core.features.preprocessing import (
+    all_keys,
+    drop_columns,
+    feature_preprocessing,
+    get_one_hot_encoding,
+    limit_max_plays,
+    log_transform_columns,
+    map_keys_to_string,
+)
+
+
+def feature_preprocessing_rowwise(dataset: pd.DataFrame) -> pd.DataFrame:
+    """previous implementation, applies the functions per value"""
+    dataset = limit_max_plays(dataset)
+    columns = list(set(drop_columns) & set(list(dataset)))
+    dataset.drop(columns=columns, inplace=True)
+
+    for column in log_transform_columns:
+        dataset[column] = dataset[column].apply(np.log1p)
+
+    dataset["key"] = dataset["key"].apply(map_keys_to_string)
+    dataset = get_one_hot_encoding(dataset, column="key")
+
+    for col in all_keys:
+        if col not in dataset:
+            dataset[col] = 0
+    return dataset
+
+
+def get_dataset(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    keys = rng.integers(-1, 12, rows).astype(float)
+    keys[rng.random(rows) < 0.01] = np.nan
+    return pd.DataFrame(
+        {
+            "track_name": [f"track {i}" for i in range(rows)],
+            "artist_name": [f"artist {i % 1000}" for i in range(rows)],
+            "id": [f"id{i}" for i in range(rows)],
+            "number_of_available_markets": rng.integers(0, 185, rows),
+            "num_artists": rng.integers(1, 5, rows),
+            "duration_ms": rng.integers(60_000, 600_000, rows),
+            "explicit": rng.random(rows) < 0.2,
+            "popularity": rng.integers(0, 100, rows),
+            "release_year": rng.integers(1960, 2023, rows),
+            "release_month": rng.integers(1, 13, rows),
+            "release_day": rng.integers(1, 29, rows),
+            "date_is_complete": rng.random(rows) < 0.9,
+            "danceability": rng.random(rows),
+            "energy": rng.random(rows),
+            "key": keys,
+            "loudness": rng.uniform(-30, 0, rows),
+            "mode": rng.integers(0, 2, rows),
+            "speechiness": rng.random(rows),
+            "acousticness": rng.random(rows),
+            "instrumentalness": rng.random(rows),
+            "liveness": rng.random(rows),
+            "valence": rng.random(rows),
+            "tempo": rng.uniform(60, 200, rows),
+            "time_signature": rng.integers(3, 6, rows),
+            "plays": rng.integers(0, 100, rows),
+        }
+    )
+
+
+def measure(function, dataset: pd.DataFrame, repeat: int) -> float:
+    """best time of `repeat` runs in seconds, on a fresh copy per run"""
+    timings = []
+    for _ in range(repeat):
+        data = dataset.copy()
+        start = time.perf_counter()
+        function(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    dataset = get_dataset(args.rows)
+
+    # the row-wise version fails on unknown keys (-1), compare without them
+    known = dataset[dataset["key"].fillna(0) >= 0].reset_index(drop=True)
+    expected = feature_preprocessing_rowwise(known.copy())
+    result = feature_preprocessing(known)
+    np.testing.assert_allclose(
+        result[list(expected)].to_numpy(dtype=float), expected.to_numpy(dtype=float)
+    )
+
+    rowwise = measure(feature_preprocessing_rowwise, known, args.repeat)
+    vectorized = measure(feature_preprocessing, dataset, args.repeat)
+    print(f"rows: {args.rows}")
+    print(f"row-wise:   {rowwise * 1000:.1f} ms")
+    print(f"vectorized: {vectorized * 1000:.1f} ms ({rowwise / vectorized:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+Local stand-in of the Spotify API, serves the recorded responses of the fixtures
+with configurable latency, rate limiting and server errors, so that the API and
+the downloaders can be tested and load-tested offline and reproducibly.
+
+    python -m benchmarks.spotify_stub --port 8765 --latency lognormal:50:0.5 \
+        --rate-limit 20 --error-rate 0.01
+
+    SPOTIFY_API_URL=http://localhost:8765/v1 \
+    SPOTIFY_ACCOUNTS_URL=http://localhost:8765 python -m ...
+
+Every track id is answered with the recorded track, a search returns an id that
+is derived from the query, so that different songs get different ids.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlencode, urlparse
+
+path_fixtures = os.path.join(os.path.dirname(__file__), "fixtures")
+alphabet = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+
+@dataclass
+class StubConfig:
+    """Behaviour of the stand-in
+
+    Args:
+        latency (str): latency distribution in milliseconds, "constant:50",
+            "uniform:20:80" or "lognormal:50:0.5" (median and sigma)
+        rate_limit (Optional[float]): requests per second over a sliding window of
+            one second, above the limit a 429 with Retry-After is returned
+        retry_after (int): seconds of the Retry-After header
+        error_rate (float): share of the requests answered with `error_status`
+        error_status (int): status code of the injected errors
+        playlist_size (int): number of tracks per playlist
+        seed (int): seed of the latency and error injection
+    """
+
+    latency: str = "constant:0"
+    rate_limit: Optional[float] = None
+    retry_after: int = 1
+    error_rate: float = 0.0
+    error_status: int = 503
+    playlist_size: int = 250
+    seed: int = 0
+
+
+def parse_latency(spec: str) -> tuple[str, list[float]]:
+    name, *params = spec.split(":")
+    expected = {"constant": 1, "uniform": 2, "lognormal": 2}
+    if name not in expected or len(params) != expected[name]:
+        raise Exception(f"invalid latency distribution: {spec}")
+    return name, [float(param) for param in params]
+
+
+def get_track_id(query: str) -> str:
+    """deterministic base62 track id of 22 characters for a search query"""
+    number = int.from_bytes(hashlib.sha1(query.encode("utf-8")).digest(), "big")
+    characters = []
+    for _ in range(22):
+        number, remainder = divmod(number, 62)
+        characters.append(alphabet[remainder])
+    return "".join(characters)
+
+
+class SpotifyStub:
+    """Responses and fault injection of the stand-in, shared by all handler
+    threads of the server"""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.latency = parse_latency(config.latency)
+        self.random = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.requests: deque = deque()
+        self.stats: Counter = Counter()
+
+        with open(os.path.join(path_fixtures, "spotify_responses.json")) as f:
+            self.fixture = json.load(f)
+        self.fixture_id = self.fixture["track_id"]
+
+    def sample_latency(self) -> float:
+        """latency of the next response in seconds"""
+        name, params = self.latency
+        with self.lock:
+            if name == "constant":
+                value = params[0]
+            elif name == "uniform":
+                value = self.random.uniform(*params)
+            else:
+                value = self.random.lognormvariate(0, params[1]) * params[0]
+        return max(value, 0) / 1000
+
+    def is_rate_limited(self) -> bool:
+        if self.config.rate_limit is None:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            while self.requests and now - self.requests[0] >= 1:
+                self.requests.popleft()
+            if len(self.requests) >= self.config.rate_limit:
+                return True
+            self.requests.append(now)
+            return False
+
+    def is_error(self) -> bool:
+        with self.lock:
+            return self.random.random() < self.config.error_rate
+
+    def replace_id(self, response: dict, track_id: str) -> dict:
+        """the recorded response with the ids of the fixture replaced"""
+        text = json.dumps(response).replace(self.fixture_id, track_id)
+        return json.loads(text)
+
+    def get_track(self, track_id: str) -> dict:
+        return self.replace_id(self.fixture["track"], track_id)
+
+    def get_audio_features(self, track_id: str) -> dict:
+        return self.replace_id(self.fixture["audio_features"], track_id)
+
+    def search(self, base_url: str, params: dict) -> dict:
+        query = params.get("q", [""])[0]
+        limit = int(params.get("limit", ["1"])[0])
+        track = self.get_track(get_track_id(query))
+        href = f"{base_url}/search?{urlencode({'query': query, 'type': 'track'})}"
+        return {
+            "tracks": {
+                "href": f"{href}&offset=0&limit={limit}",
+                "items": [track],
+                "limit": limit,
+                "next": None,
+                "offset": 0,
+                "previous": None,
+                "total": 1,
+            }
+        }
+
+    def get_playlist_items(self, base_url: str, playlist_id: str, params: dict) -> dict:
+        limit = min(int(params.get("limit", ["100"])[0]), 100)
+        offset = int(params.get("offset", ["0"])[0])
+        total = self.config.playlist_size
+        end = min(offset + limit, total)
+
+        items = [
+            {"track": self.get_track(get_track_id(f"{playlist_id}:{position}"))}
+            for position in range(offset, end)
+        ]
+        href = f"{base_url}/playlists/{playlist_id}/tracks"
+        return {
+            "href": f"{href}?offset={offset}&limit={limit}",
+            "items": items,
+            "limit": limit,
+            "next": f"{href}?offset={end}&limit={limit}" if end < total else None,
+            "offset": offset,
+            "previous": None,
+            "total": total,
+        }
+
+    def get_playlists(self, base_url: str, user_id: str) -> dict:
+        playlist_id = get_track_id(f"playlist:{user_id}")
+        items = [
+            {
+                "id": playlist_id,
+                "name": f"{user_id} playlist",
+                "tracks": {
+                    "href": f"{base_url}/playlists/{playlist_id}/tracks",
+                    "total": self.config.playlist_size,
+                },
+            }
+        ]
+        return {"items": items, "limit": 20, "offset": 0, "next": None, "total": 1}
+
+    def route(self, base_url: str, path: str, params: dict) -> tuple[int, dict]:
+        """response of a GET request to the API, without the fault injection"""
+        if path == "/v1/search":
+            return 200, self.search(base_url, params)
+
+        if path in ["/v1/tracks", "/v1/audio-features"]:
+            ids = params.get("ids", [""])[0].split(",")
+            max_ids = 50 if path == "/v1/tracks" else 100
+            if len(ids) > max_ids or not ids[0]:
+                return 400, error_response(400, "invalid ids")
+            if path == "/v1/tracks":
+                return 200, {"tracks": [self.get_track(id) for id in ids]}
+            return 200, {"audio_features": [self.get_audio_features(id) for id in ids]}
+
+        match = re.fullmatch(r"/v1/(tracks|audio-features|audio-analysis)/(\w+)", path)
+        if match:
+            endpoint, track_id = match.groups()
+            if endpoint == "tracks":
+                return 200, self.get_track(track_id)
+            if endpoint == "audio-features":
+                return 200, self.get_audio_features(track_id)
+            return 200, self.fixture["audio_analysis"]
+
+        match = re.fullmatch(r"/v1/albums/(\w+)", path)
+        if match:
+            return 200, self.replace_id(self.fixture["track"]["album"], match.group(1))
+
+        match = re.fullmatch(r"/v1/users/(\w+)/playlists", path)
+        if match:
+            return 200, self.get_playlists(base_url, match.group(1))
+
+        match = re.fullmatch(r"/v1/playlists/(\w+)/tracks", path)
+        if match:
+            return 200, self.get_playlist_items(base_url, match.group(1), params)
+
+        return 404, error_response(404, "Service not found")
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.stats[key] += 1
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self.stats)
+
+
+def error_response(status: int, message: str) -> dict:
+    return {"error": {"status": status, "message": message}}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    stub: SpotifyStub
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def send_json(self, status: int, data: dict, headers: Optional[dict] = None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+
+        if urlparse(self.path).path != "/api/token":
+            self.send_json(404, error_response(404, "Service not found"))
+            return
+        self.stub.count("token")
+        token = {
+            "access_token": "stub-token",
+            "token_type": "Bearer",
+            "expires_in": 3600,
+        }
+        self.send_json(200, token)
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path == "/stub/stats":
+            self.send_json(200, self.stub.get_stats())
+            return
+
+        stub = self.stub
+        stub.count("requests")
+        time.sleep(stub.sample_latency())
+
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            stub.count("401")
+            self.send_json(401, error_response(401, "No token provided"))
+            return
+
+        if stub.is_rate_limited():
+            stub.count("429")
+            retry_after = {"Retry-After": str(stub.config.retry_after)}
+            self.send_json(
+                429, error_response(429, "API rate limit exceeded"), retry_after
+            )
+            return
+
+        if stub.is_error():
+            status = stub.config.error_status
+            stub.count(str(status))
+            self.send_json(status, error_response(status, "Service unavailable"))
+            return
+
+        base_url = f"http://{self.headers.get('Host')}/v1"
+        status, data = stub.route(base_url, url.path, parse_qs(url.query))
+        stub.count(str(status))
+        self.send_json(status, data)
+
+
+def start_stub_server(
+    config: Optional[StubConfig] = None, port: int = 0
+) -> tuple[ThreadingHTTPServer, str]:
+    """serve the stand-in in a daemon thread, stop it with `server.shutdown()`
+
+    Args:
+        config (Optional[StubConfig], optional): latency and fault injection.
+        port (int, optional): port on localhost, a free port by default.
+
+    Returns:
+        tuple[ThreadingHTTPServer, str]: the server and its url, the API is
+            served under `{url}/v1` and the token endpoint under `{url}/api/token`
+    """
+    handler = type(
+        "Handler", (StubHandler,), {"stub": SpotifyStub(config or StubConfig())}
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main(args: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="constant:0")
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--playlist-size", type=int, default=250)
+    parser.add_argument("--seed", type=int, default=0)
+    parsed = vars(parser.parse_args(args))
+
+    port = parsed.pop("port")
+    server, url = start_stub_server(StubConfig(**parsed), port=port)
+    print(f"SPOTIFY_API_URL={url}/v1 SPOTIFY_ACCOUNTS_URL={url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,148 @@
+import asyncio
 import logging
-import uuid
+import secrets
+import time
 from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Optional
 
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.staticfiles import StaticFiles
 from mangum import Mangum
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
 
 from app.__init__ import __version__ as api_version
 from app.config import settings
 from app.core.analytics import Analytics
-from app.core.aws import upload_json_to_s3
+from app.core.model_manager import ModelManager
+from app.core.record_sink import RecordSink, get_uploader
+from app.core.shadow import ShadowEvaluator
 from app.routers import api, root
-from app.schemas import Prediction
+from app.schemas import Prediction, Predictions, PredictionsRequest
 from app.utils.get_registry_path import setup
 from app.utils.response_formatter import map_score_to_emoji
-from app.utils.response_messages import get_exception_details
+from app.utils.response_messages import failure_dict, get_exception_details
 from app.utils.runtime import get_is_lambda_runtime
-from music_flow import Predictor, get_formatted_features
+from music_flow import Predictor, get_batch_raw_features, get_formatted_features
 from music_flow.config import model_settings
+from music_flow.config import settings as music_flow_settings
+from music_flow.core.cache import LRUCache
+from music_flow.core.features.get_raw_features import (
+    async_spotify_api,
+    raw_features_cache,
+)
+from music_flow.core.spotify_token import token_manager
+from music_flow.core.startup_profiler import startup_profiler
 from music_flow.core.utils import path_app
 
+startup_profiler.record_phase("imports", startup_profiler.start)
+
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.StreamHandler())
 logger.setLevel(logging.DEBUG)
 
-ml_model = {}
-model_folder = model_settings.MODEL_FOLDER
+# predictions of the loaded model keyed by (track_id, model_folder, model_version),
+# the popularity of a track is a feature, so the predictions expire together
+# with the raw features they were made from
+prediction_cache = LRUCache(
+    max_size=settings.PREDICTION_CACHE_SIZE,
+    ttl=music_flow_settings.RAW_FEATURES_CACHE_TTL,
+)
 
 is_testing = False
 is_lambda_runtime = get_is_lambda_runtime()
 path_registry = setup(is_lambda_runtime)
 
+analytics_sink = RecordSink(
+    uploader=get_uploader(settings.RECORD_SINK_LOCAL_PATH),
+    folder=settings.FOLDER_ACTIVITY if not is_testing else "activity_test",
+)
+prediction_log = RecordSink(
+    uploader=get_uploader(settings.RECORD_SINK_LOCAL_PATH),
+    folder=settings.FOLDER_PREDICTIONS if not is_testing else "predictions_test",
+    is_partitioned=True,
+)
+
+
+def load_predictor(model_folder: str) -> Predictor:
+    with startup_profiler.phase("model"):
+        return Predictor(model_folder=model_folder, path_registry=path_registry)
+
+
+def clear_prediction_cache(predictor: Predictor) -> None:
+    """the memoized predictions of the previous model are not served anymore"""
+    prediction_cache.clear()
+
+
+# the model is loaded once per process, Mangum runs the lifespan on every
+# Lambda invocation
+model_manager = ModelManager(
+    loader=load_predictor,
+    model_folder=model_settings.MODEL_FOLDER,
+    on_swap=clear_prediction_cache,
+)
+# optional shadow model, scores the same features off the response path
+shadow_manager = ModelManager(
+    loader=load_predictor, model_folder=settings.SHADOW_MODEL_FOLDER
+)
+shadow_evaluator = ShadowEvaluator(
+    sink=prediction_log, max_pending=settings.SHADOW_MAX_PENDING
+)
+
+
+def load_shadow_model() -> None:
+    """Load the shadow model, the primary model serves without it on failure"""
+    if not settings.SHADOW_MODEL_FOLDER:
+        return
+    try:
+        shadow_manager.load()
+    except Exception as e:
+        logger.error(f"Failed to load the shadow model: {e}")
+
+
+def warm_up_token() -> None:
+    """Fetch the Spotify access token before the first request needs it"""
+    if not token_manager.is_expired():
+        return
+    try:
+        with startup_profiler.phase("token"):
+            token_manager.get_token()
+    except Exception as e:
+        logger.error(f"Failed to fetch the Spotify access token: {e}")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
-    Load the Machine Learning model
+    Load the Machine Learning model, the model, the shadow model and the access
+    token are loaded concurrently
 
     Args:
         app (FastAPI): fastapi app object
     """
-    predictor = Predictor(
-        model_folder=model_folder,
-        path_registry=path_registry,
+    await asyncio.gather(
+        asyncio.to_thread(model_manager.load),
+        asyncio.to_thread(load_shadow_model),
+        asyncio.to_thread(warm_up_token),
     )
-    model_metadata = predictor.get_metdata()
+    raw_features_cache.set_path(settings.RAW_FEATURES_CACHE_PATH)
 
-    ml_model["predict"] = predictor.predict_from_features
-    ml_model["metadata"] = model_metadata
-
-    global model_version
-    model_version = predictor.get_model_version()
+    analytics_sink.start()
+    prediction_log.start()
+    startup_profiler.set_ready()
 
     yield
 
-    # Clean up the ML models and release the resources
-    ml_model.clear()
+    # release the resources, the model and the connection pool of the Spotify
+    # client are kept for the next Lambda invocation
+    await asyncio.to_thread(shadow_evaluator.wait, settings.SHADOW_TIMEOUT)
+    await analytics_sink.stop()
+    await prediction_log.stop()
+    if not is_lambda_runtime:
+        await async_spotify_api.aclose()
 
 
 app = FastAPI(
@@ -76,7 +160,10 @@ path_static = str(Path(path_app).absolute() / "static")
 app.mount("/static", StaticFiles(directory=path_static), name="static")
 
 app.add_middleware(
-    Analytics, is_lambda_runtime=is_lambda_runtime, is_testing=is_testing
+    Analytics,
+    sink=analytics_sink,
+    is_lambda_runtime=is_lambda_runtime,
+    is_testing=is_testing,
 )
 
 app.add_middleware(SessionMiddleware, secret_key="some-random-string")
@@ -85,9 +172,66 @@ app.include_router(api.router)
 app.include_router(root.router)
 
 
+def get_prediction_cache_key(track_id: str, predictor: Predictor) -> tuple:
+    """key of a memoized prediction, predictions of another model never match"""
+    return (track_id, predictor.model_folder, predictor.model_version)
+
+
+def evaluate_shadow(
+    predictor: Predictor,
+    items: list[dict],
+    samples: list[dict],
+    values: list[float],
+    latency_ms: float,
+) -> None:
+    """Score the samples with the shadow model, if one is loaded, the paired
+    predictions are written to the prediction log
+
+    Args:
+        predictor (Predictor): primary predictor that scored the samples
+        items (list[dict]): song, artist and track_id per sample
+        samples (list[dict]): flattened features per sample
+        values (list[float]): predictions of the primary model
+        latency_ms (float): latency of the primary model call
+    """
+    shadow_predictor = shadow_manager.predictor
+    if shadow_predictor is None or not (is_lambda_runtime or is_testing):
+        return
+
+    created_at = datetime.now(timezone.utc).isoformat()
+    records = [
+        {
+            **item,
+            "type": "shadow",
+            "created_at": created_at,
+            "primary": {
+                "model_folder": predictor.model_folder,
+                "model_version": predictor.model_version,
+                "prediction": round(value, 2),
+                "latency_ms": latency_ms,
+            },
+        }
+        for item, value in zip(items, values)
+    ]
+    shadow_evaluator.submit(shadow_predictor, samples, records)
+
+
+def get_predictor() -> Predictor:
+    """the predictor that serves the request, the request finishes on this
+    model even if a new model is swapped in meanwhile"""
+    try:
+        return model_manager.get_predictor()
+    except Exception as e:
+        logger.error(e)
+        status_code = 500
+        detail = get_exception_details("prediction_failure", status_code)
+        raise HTTPException(status_code=status_code, detail=detail)
+
+
 @app.get("/api/prediction/", tags=["API"])
-async def get_prediction_api(song: str, artist: str) -> Prediction:
-    """Get the model predictions
+async def get_prediction_api(song: str, artist: str, response: Response) -> Prediction:
+    """Get the model predictions, the model version is returned in the
+    X-Model-Version header
 
     Args:
         song (str): name of the song
@@ -103,54 +247,237 @@ async def get_prediction_api(song: str, artist: str) -> Prediction:
     """
 
     raw_features = await api.get_raw_features_api(song, artist)
-    features = get_formatted_features(data=raw_features, is_flattened=True)
-    logger.debug(f"features: {features}")
 
-    if not features:
-        status_code = 500
-        detail = get_exception_details("formating_failure", status_code)
-        raise HTTPException(status_code=status_code, detail=detail)
+    predictor = get_predictor()
+    cache_key = get_prediction_cache_key(raw_features["track_id"], predictor)
+    cached_prediction = prediction_cache.get(cache_key)
+
+    if cached_prediction is None:
+        features = get_formatted_features(data=raw_features, is_flattened=True)
+        logger.debug(f"features: {features}")
+
+        if not features:
+            status_code = 500
+            detail = get_exception_details("formating_failure", status_code)
+            raise HTTPException(status_code=status_code, detail=detail)
+
+        metadata = features.get("metadata")
+        logger.debug(f"metadata: {metadata}")
+        del features["metadata"]
+
+        try:
+            start = time.perf_counter()
+            prediction = predictor.predict_from_features(features)
+            latency_ms = round((time.perf_counter() - start) * 1000, 3)
+            logger.debug(f"prediction: {prediction}")
+        except Exception as e:
+            logging.debug(e)
+            status_code = 500
+            detail = get_exception_details("prediction_failure", status_code)
+            raise HTTPException(status_code=status_code, detail=detail)
+
+        cached_prediction = {
+            "prediction": round(prediction, 2),
+            "song_metadata": metadata,
+            "message": map_score_to_emoji(prediction),
+            "preview_url": raw_features["track"]["preview_url"],
+            "features": features,
+        }
+        prediction_cache.set(cache_key, cached_prediction)
+        evaluate_shadow(
+            predictor,
+            [{"song": song, "artist": artist, "track_id": raw_features["track_id"]}],
+            [features],
+            [prediction],
+            latency_ms,
+        )
 
-    metadata = features.get("metadata")
-    logger.debug(f"metadata: {metadata}")
-    del features["metadata"]
+    data_response = {
+        "song": song,
+        "artist": artist,
+        "description": settings.PREDICTION_DESCRIPTION,
+        "model_version": predictor.model_version,
+        **cached_prediction,
+    }
+    response.headers["X-Model-Version"] = str(predictor.model_version)
+
+    if is_lambda_runtime or is_testing:
+        prediction_log.add(
+            {**data_response, "created_at": datetime.now(timezone.utc).isoformat()}
+        )
+
+    return Prediction(**data_response)
+
+
+@app.post("/api/predictions", tags=["API"])
+async def get_predictions_api(
+    request: PredictionsRequest, response: Response
+) -> Predictions:
+    """Get the model predictions for multiple songs
+
+    The Spotify data is fetched with the batch endpoints and all songs are scored
+    with a single model call. The model version is returned in the
+    X-Model-Version header.
+
+    Args:
+        request (PredictionsRequest): songs given by song and artist or by track_id
+
+    Raises:
+        HTTPException: if the prediction failed
+
+    Returns:
+        Predictions: prediction per song, in the same order as the request
+    """
+    items = [
+        {"track_name": item.song, "artist_name": item.artist, "track_id": item.track_id}
+        for item in request.items
+    ]
+    results = await run_in_threadpool(get_batch_raw_features, items)
+    predictor = get_predictor()
+
+    predictions = []
+    samples = []
+    for item, (raw_features, _) in zip(request.items, results):
+        prediction = {
+            "song": raw_features["track_name"],
+            "artist": raw_features["artist_name"],
+            "track_id": raw_features.get("track_id", item.track_id),
+            "status": raw_features["status"],
+            "failure_type": raw_features["failure_type"],
+        }
+        predictions.append(prediction)
+
+        if raw_features["status"] != "success":
+            continue
+
+        cached_prediction = prediction_cache.get(
+            get_prediction_cache_key(raw_features["track_id"], predictor)
+        )
+        if cached_prediction is not None:
+            prediction.update(
+                {k: v for k, v in cached_prediction.items() if k != "features"}
+            )
+            continue
+
+        features = get_formatted_features(data=raw_features, is_flattened=True)
+        if not features:
+            prediction["status"] = "failed"
+            prediction["failure_type"] = failure_dict["formating_failure"].failure_type
+            continue
+
+        prediction["song_metadata"] = features.pop("metadata")
+        prediction["preview_url"] = raw_features["track"].get("preview_url")
+        samples.append((prediction, features))
 
     try:
-        prediction = ml_model["predict"](features)
-        logger.debug(f"prediction: {prediction}")
+        start = time.perf_counter()
+        values = predictor.predict_from_features_batch(
+            [features for _, features in samples]
+        )
+        latency_ms = round((time.perf_counter() - start) * 1000, 3)
+        logger.debug(f"predictions: {values}")
     except Exception as e:
         logging.debug(e)
         status_code = 500
         detail = get_exception_details("prediction_failure", status_code)
         raise HTTPException(status_code=status_code, detail=detail)
 
-    user_message = map_score_to_emoji(prediction)
+    for (prediction, features), value in zip(samples, values):
+        prediction["prediction"] = round(value, 2)
+        prediction["message"] = map_score_to_emoji(value)
+        prediction_cache.set(
+            get_prediction_cache_key(prediction["track_id"], predictor),
+            {
+                "prediction": prediction["prediction"],
+                "song_metadata": prediction["song_metadata"],
+                "message": prediction["message"],
+                "preview_url": prediction["preview_url"],
+                "features": features,
+            },
+        )
+
+    if samples:
+        evaluate_shadow(
+            predictor,
+            [
+                {key: prediction[key] for key in ("song", "artist", "track_id")}
+                for prediction, _ in samples
+            ],
+            [features for _, features in samples],
+            values,
+            latency_ms,
+        )
 
     data_response = {
-        "song": song,
-        "artist": artist,
-        "prediction": round(prediction, 2),
-        "song_metadata": metadata,
         "description": settings.PREDICTION_DESCRIPTION,
-        "message": user_message,
-        "preview_url": raw_features["track"]["preview_url"],
-        "features": features,
+        "model_version": predictor.model_version,
+        "predictions": predictions,
     }
+    response.headers["X-Model-Version"] = str(predictor.model_version)
 
     if is_lambda_runtime or is_testing:
-        save_folder = (
-            settings.FOLDER_PREDICTIONS if not is_testing else "predictions_test"
-        )
-        name = str(uuid.uuid4())
-        upload_json_to_s3(
-            data_dict=data_response,
-            save_name=f"{save_folder}/{name}.json",
-        )
+        created_at = datetime.now(timezone.utc).isoformat()
+        for prediction in predictions:
+            prediction_log.add({**prediction, "created_at": created_at})
 
-    return Prediction(**data_response)
+    return Predictions(**data_response)
+
+
+def check_admin_token(admin_token: Optional[str]) -> None:
+    """the admin endpoints are disabled if no ADMIN_TOKEN is configured"""
+    if not settings.ADMIN_TOKEN or not admin_token:
+        raise HTTPException(status_code=403, detail="admin endpoints are disabled")
+    if not secrets.compare_digest(admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="invalid admin token")
+
+
+@app.get("/api/admin/model", tags=["Admin"])
+async def get_model_api(x_admin_token: Optional[str] = Header(None)) -> dict:
+    """Get the model that serves the predictions and the state of the reload"""
+    check_admin_token(x_admin_token)
+    return {
+        **model_manager.get_status(),
+        "shadow": {**shadow_manager.get_status(), **shadow_evaluator.get_stats()},
+    }
+
+
+@app.post("/api/admin/model/reload", tags=["Admin"], status_code=202)
+async def reload_model_api(
+    model_folder: str, x_admin_token: Optional[str] = Header(None)
+) -> dict:
+    """Load a model folder in the background and swap it in once it is warmed
+    up, the current model serves the requests until then
+
+    Args:
+        model_folder (str): name of the model folder in the model registry
 
+    Raises:
+        HTTPException: if the admin token is invalid or a reload is running
+
+    Returns:
+        dict: state of the reload
+    """
+    check_admin_token(x_admin_token)
+    try:
+        model_manager.start_reload(model_folder)
+    except Exception as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return model_manager.get_status()
+
+
+mangum_handler = Mangum(app)
+
+
+def handler(event, context):
+    """Lambda handler, the buffered analytics and prediction records are uploaded
+    before the invocation ends, since Lambda is frozen between invocations"""
+    try:
+        return mangum_handler(event, context)
+    finally:
+        shadow_evaluator.wait(settings.SHADOW_TIMEOUT)
+        analytics_sink.flush()
+        prediction_log.flush()
 
-handler = Mangum(app)
 
 if __name__ == "__main__":
     logger.warning("Running in development mode. Do not run like this in production.")
@@ -11,12 +11,21 @@ import os
 from music_flow.core import (
     Predictor,
     SpotifyAPI,
+    get_batch_raw_features,
     get_formatted_features,
     get_raw_features,
+    get_raw_features_async,
 )
 from music_flow.core.utils import path_base
 
-__all__ = [Predictor, SpotifyAPI, get_formatted_features, get_raw_features]
+__all__ = [
+    Predictor,
+    SpotifyAPI,
+    get_batch_raw_features,
+    get_formatted_features,
+    get_raw_features,
+    get_raw_features_async,
+]
 
 
 with open(os.path.join(path_base, "VERSION")) as version_file:
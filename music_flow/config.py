@@ -1,5 +1,6 @@
 import logging
 import os
+from typing import Optional
 
 from pydantic_settings import BaseSettings
 
@@ -12,9 +13,12 @@ class PathSettings(BaseSettings):
     path_results: str = os.path.join(path, "results")
     path_registry: str = os.path.join(path, "registry")
     path_reports: str = os.path.join(path, "reports")
-    path_data_lake: str = os.path.join(path, "data_lake")
+    # the downloaded raw features, e.g. PATH_DATA_LAKE_SUCCESS=/mnt/data_lake/success
+    path_data_lake: str = os.path.join(path, "data_lake_v2")
     path_data_lake_success: str = os.path.join(path_data_lake, "success")
     path_data_lake_failed: str = os.path.join(path_data_lake, "failed")
+    # segments and index of the raw features, see music_flow.dataset.data_lake
+    path_data_lake_segments: str = os.path.join(path, "data_lake_v3")
     path_data: str = os.path.join(path, "data")
     path_features: str = os.path.join(path_data, "features")
     path_dataset: str = os.path.join(path_data, "dataset")
@@ -27,6 +31,16 @@ class DatasetSettings(BaseSettings):
     KAGGEL_DATASET: str = "kaggle_tracks.csv"
     AUDIO_FEATURES: str = "audio_features.csv"
     FINAL_DATASET: str = "dataset.csv"
+    # folder with a .npy file per column and the schema.json
+    COLUMNAR_DATASET: str = "dataset_columnar"
+    # concurrent download of the raw features, by default the requests follow
+    # the adaptive limit of the Spotify requests, a rate limit in requests per
+    # second across all workers replaces it, every track takes about three
+    # requests
+    DOWNLOAD_WORKERS: int = 8
+    DOWNLOAD_RATE_LIMIT: Optional[float] = None
+    # raw features per segment of the data lake
+    DATA_LAKE_SEGMENT_RECORDS: int = 10_000
 
     test_size: float = 0.2
     random_state: int = 42
@@ -36,6 +50,9 @@ class ModelSettings(BaseSettings):
     MODEL_NAME: str = "model"
     MAX_PREDICTION_VALUE: int = 30
     MODEL_FOLDER: str = "2023-03-24--22-58-57"
+    # "xgboost" predicts with the pickled estimator, "numpy" with the exported
+    # trees (model.npz), which does not need xgboost at serving time
+    PREDICTOR_BACKEND: str = "xgboost"
 
 
 class Settings(BaseSettings):
@@ -43,52 +60,93 @@ class Settings(BaseSettings):
     INCLUDE_AUDIO_ANALYSIS_DATASET: bool = False
     INCLUDE_AUDIO_ANALYSIS_API: bool = False
     API_MODE: bool = True
+    # base urls of the Spotify API and accounts service, can point to a local
+    # stand-in, e.g. `python -m benchmarks.spotify_stub`
+    SPOTIFY_API_URL: str = "https://api.spotify.com/v1"
+    SPOTIFY_ACCOUNTS_URL: str = "https://accounts.spotify.com"
+    # connection pool of the Spotify API clients
+    SPOTIFY_MAX_CONNECTIONS: int = 20
+    SPOTIFY_CONNECT_RETRIES: int = 1
+    SPOTIFY_TIMEOUT: float = 10.0
+    # adaptive limit of the concurrent Spotify requests of the downloads, raised
+    # while the responses are healthy and cut by 30% on a 429, with a SQLite file
+    # the limit is shared by all processes on the host, e.g.
+    # /tmp/spotify_limiter.sqlite. The requests of the API are not limited.
+    SPOTIFY_CONCURRENCY_MIN: int = 1
+    SPOTIFY_CONCURRENCY_INITIAL: int = 4
+    SPOTIFY_CONCURRENCY_MAX: int = 20
+    SPOTIFY_LIMITER_PATH: Optional[str] = None
+    # seconds before expiry at which the access token is refreshed
+    SPOTIFY_TOKEN_REFRESH_MARGIN: int = 60
+    # number of concurrent search requests for batch predictions
+    BATCH_SEARCH_WORKERS: int = 8
+    # raw features cache, entries expire after the time to live in seconds
+    RAW_FEATURES_CACHE_SIZE: int = 1_024
+    RAW_FEATURES_CACHE_DISK_SIZE: int = 50_000
+    RAW_FEATURES_CACHE_TTL: int = 24 * 60 * 60
     # model registry s3 bucket name
     BUCKET_NAME: str = "musicflow-registry-398212703914"
+    # concurrent transfers of the model registry, files larger than the
+    # threshold are transferred in parts of the chunk size
+    REGISTRY_MAX_WORKERS: int = 8
+    REGISTRY_MULTIPART_THRESHOLD: int = 8 * 1024 * 1024
+    REGISTRY_MULTIPART_CHUNKSIZE: int = 8 * 1024 * 1024
     LOGGING_LEVEL: int = logging.DEBUG
 
 
 class FeatureSettings(BaseSettings):
-    # TODO: add datatype of each feature
     target_column: str = "plays"
-    columns_scope: list[str] = [
-        "number_of_available_markets",
-        "num_artists",
-        "duration_ms",
-        "explicit",
-        "popularity",
-        "release_year",
-        "release_month",
-        "release_day",
-        "date_is_complete",
-        "danceability",
-        "energy",
-        "loudness",
-        "mode",
-        "speechiness",
-        "acousticness",
-        "instrumentalness",
-        "liveness",
-        "valence",
-        "tempo",
-        "time_signature",
-        "A",
-        "A#/Bb",
-        "B",
-        "C",
-        "C#/Db",
-        "D",
-        "D#/Eb",
-        "E",
-        "F",
-        "F#/Gb",
-        "G",
-        "G#/Ab",
-        "Unknown",
-    ]
+    # dtype of each feature after the preprocessing, in the column order of the
+    # model, also the schema of the columnar dataset
+    feature_schema: dict[str, str] = {
+        "number_of_available_markets": "int16",
+        "num_artists": "int16",
+        "duration_ms": "int32",
+        "explicit": "bool",
+        "popularity": "int16",
+        "release_year": "int16",
+        "release_month": "int16",
+        "release_day": "int16",
+        "date_is_complete": "bool",
+        "danceability": "float32",
+        "energy": "float32",
+        "loudness": "float32",
+        "mode": "int16",
+        "speechiness": "float32",
+        "acousticness": "float32",
+        "instrumentalness": "float32",
+        "liveness": "float32",
+        "valence": "float32",
+        "tempo": "float32",
+        "time_signature": "int16",
+        "A": "bool",
+        "A#/Bb": "bool",
+        "B": "bool",
+        "C": "bool",
+        "C#/Db": "bool",
+        "D": "bool",
+        "D#/Eb": "bool",
+        "E": "bool",
+        "F": "bool",
+        "F#/Gb": "bool",
+        "G": "bool",
+        "G#/Ab": "bool",
+        "Unknown": "bool",
+    }
+    target_dtype: str = "float32"
+
+    @property
+    def columns_scope(self) -> list[str]:
+        return list(self.feature_schema)
+
+    @property
+    def dataset_schema(self) -> dict[str, str]:
+        """dtype of the features and the target"""
+        return {**self.feature_schema, self.target_column: self.target_dtype}
 
 
 settings = Settings()
 model_settings = ModelSettings()
 dataset_settings = DatasetSettings()
 path_settings = PathSettings()
+feature_settings = FeatureSettings()
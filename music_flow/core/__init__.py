@@ -1,6 +1,17 @@
+from music_flow.core.features.get_batch_raw_features import get_batch_raw_features
 from music_flow.core.features.get_formatted_features import get_formatted_features
-from music_flow.core.features.get_raw_features import get_raw_features
+from music_flow.core.features.get_raw_features import (
+    get_raw_features,
+    get_raw_features_async,
+)
 from music_flow.core.predictor import Predictor
 from music_flow.core.spotify_api import SpotifyAPI
 
-__all__ = [Predictor, SpotifyAPI, get_formatted_features, get_raw_features]
+__all__ = [
+    Predictor,
+    SpotifyAPI,
+    get_batch_raw_features,
+    get_formatted_features,
+    get_raw_features,
+    get_raw_features_async,
+]
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+from requests.utils import requote_uri
+
+from music_flow.config import settings
+from music_flow.core.rate_limiter import RequestLimiter
+from music_flow.core.spotify_token import SpotifyTokenManager, token_manager
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.DEBUG)
+
+
+class AsyncSpotifyAPI:
+    """Async client for the Spotify API
+
+    The client keeps a long-lived pool of keep-alive connections, so that
+    concurrent requests from async handlers share connections instead of
+    blocking the event loop. The pool is bound to the event loop it was
+    created on and is recreated if it is used from another loop.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = settings.SPOTIFY_MAX_CONNECTIONS,
+        timeout: float = settings.SPOTIFY_TIMEOUT,
+        token: SpotifyTokenManager = token_manager,
+        rate_limiter: Optional[RequestLimiter] = None,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+        self.timeout = timeout
+        self.client: Optional[httpx.AsyncClient] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.token_manager = token
+        self.rate_limiter = rate_limiter
+
+    def get_client(self) -> httpx.AsyncClient:
+        """Return the pooled client of the running event loop, the client of a
+        previous loop is closed"""
+        loop = asyncio.get_running_loop()
+        if self.client is None or self.client.is_closed or self.loop is not loop:
+            if self.client is not None and not self.client.is_closed:
+                self.close_stale_client(self.client, self.loop)
+            self.client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+            self.loop = loop
+        return self.client
+
+    @staticmethod
+    def close_stale_client(
+        client: httpx.AsyncClient, loop: Optional[asyncio.AbstractEventLoop]
+    ) -> None:
+        """Close the client of another event loop
+
+        The connections can only be closed on the loop they were opened on. If
+        that loop is not running anymore, e.g. the loop of a finished
+        `asyncio.run`, the sockets of the pooled connections are closed directly.
+        """
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            return
+
+        pool = client._transport._pool  # type: ignore[attr-defined]
+        for connection in pool.connections:
+            network_stream = getattr(connection._connection, "_network_stream", None)
+            if network_stream is None:
+                continue
+            transport_socket = network_stream.get_extra_info("socket")
+            if transport_socket is not None:
+                transport_socket._sock.close()
+
+    async def aclose(self) -> None:
+        """Close the connection pool"""
+        if self.client is not None and self.loop is asyncio.get_running_loop():
+            await self.client.aclose()
+        elif self.client is not None and not self.client.is_closed:
+            self.close_stale_client(self.client, self.loop)
+        self.client = None
+        self.loop = None
+
+    async def get_headers(self) -> dict:
+        """Get the headers with the shared access token, a refresh of the token
+        runs in a worker thread to not block the event loop"""
+        if self.token_manager.is_expired():
+            await asyncio.to_thread(self.token_manager.get_token)
+        return self.token_manager.get_headers()
+
+    async def send(self, client: httpx.AsyncClient, url: str) -> httpx.Response:
+        """send a GET request within the limit of the rate limiter, if one is
+        set"""
+        headers = await self.get_headers()
+        if not self.rate_limiter:
+            return await client.get(url, headers=headers)
+
+        lease = await self.rate_limiter.acquire_async()
+        status_code, retry_after = None, 1
+        try:
+            response = await client.get(url, headers=headers)
+            status_code = response.status_code
+            retry_after = int(response.headers.get("Retry-After", 1))
+            return response
+        finally:
+            self.rate_limiter.release(lease, status_code, retry_after)
+
+    async def get_request(self, url: str, max_retries: int = 3):
+        """Fetches data from the specified URL without blocking the event loop.
+
+        Args:
+            url (str): The URL of the API endpoint.
+            max_retries (int): The maximum number of retries if rate limit is exceeded (default: 3).
+
+        Returns:
+            Tuple(dict, int): The JSON response from the API and the status code
+        """
+        client = self.get_client()
+
+        retries = 0
+        is_token_refreshed = False
+        while True:
+            response = await self.send(client, url)
+
+            if response.status_code == 200 or response.status_code == 404:
+                return response.json(), response.status_code
+
+            if response.status_code == 401 and not is_token_refreshed:
+                self.token_manager.invalidate()
+                is_token_refreshed = True
+                continue
+
+            if response.status_code == 429 or response.status_code == 503:
+                if retries >= max_retries:
+                    raise Exception("Rate limit exceeded after multiple retries.")
+
+                retry_after = int(response.headers.get("Retry-After", 1))
+                logger.debug(f"retry_after: {retry_after}")
+                if not self.rate_limiter:
+                    await asyncio.sleep(retry_after)
+                retries += 1
+                continue
+
+            raise Exception(f"Request failed with status code {response.status_code}.")
+
+    async def get_track(self, id: str):
+        url = f"{settings.SPOTIFY_API_URL}/tracks/{id}"
+        response, status_code = await self.get_request(url)
+        return response, status_code
+
+    async def get_audio_features(self, id: str):
+        url = f"{settings.SPOTIFY_API_URL}/audio-features/{id}"
+        response, status_code = await self.get_request(url)
+        return response, status_code
+
+    async def get_audio_analysis(self, id: str):
+        url = f"{settings.SPOTIFY_API_URL}/audio-analysis/{id}"
+        response, status_code = await self.get_request(url)
+        return response, status_code
+
+    def search_track_url(self, track, artist=None):
+        artist = "" if not artist else artist
+        track = "" if not track else track
+        track = requote_uri(track)
+        artist = requote_uri(artist)
+        return f"{settings.SPOTIFY_API_URL}/search?q=track:{track} artist:{artist}&type=track"
@@ -1,32 +1,41 @@
-from music_flow import SpotifyAPI
+from typing import Optional
+
+from music_flow.config import settings
+from music_flow.core.rate_limiter import RequestLimiter
+from music_flow.core.spotify_api import SpotifyAPI
 
 
 class BatchSpotifyAPI(SpotifyAPI):
-    def __init__(self):
-        super().__init__()
+    # maximum number of ids per request accepted by the Spotify API
+    max_audio_features_ids = 100
+    max_tracks_ids = 50
+
+    def __init__(self, rate_limiter: Optional[RequestLimiter] = None):
+        super().__init__(rate_limiter=rate_limiter)
 
     def get_batch_audio_features(self, ids: list[str]):
-        if len(ids) > 100:
+        if len(ids) > self.max_audio_features_ids:
             raise Exception("too many values requested")
 
         ids_string = ",".join(ids)
-        url = f"https://api.spotify.com/v1/audio-features?ids={ids_string}"
+        url = f"{settings.SPOTIFY_API_URL}/audio-features?ids={ids_string}"
         response, status_code = self.get_request(url)
         return response, status_code
 
     def get_batch_tracks(self, ids: list[str]):
-        if len(ids) > 50:
+        if len(ids) > self.max_tracks_ids:
             raise Exception("too many values requested")
 
         ids_string = ",".join(ids)
-        url = f"https://api.spotify.com/v1/tracks?ids={ids_string}"
+        url = f"{settings.SPOTIFY_API_URL}/tracks?ids={ids_string}"
         response, status_code = self.get_request(url)
         return response, status_code
 
     @staticmethod
     def convert_batch_response_to_dict(responses):
         try:
-            output_dict = {audio["id"]: audio for audio in responses}
+            # unknown ids are returned as null values
+            output_dict = {audio["id"]: audio for audio in responses if audio}
         except:
             output_dict = {}
         return output_dict
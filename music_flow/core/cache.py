@@ -0,0 +1,158 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    """Thread-safe in-memory cache with a maximum size and a time to live
+
+    The least recently used entry is evicted once the cache is full.
+    """
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        """
+        Args:
+            max_size (int): maximum number of entries
+            ttl (Optional[float], optional): seconds after which an entry expires.
+                Defaults to None, entries never expire.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.data: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at is not None and time.time() >= expires_at:
+                del self.data[key]
+                self.misses += 1
+                return default
+
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = time.time() + self.ttl if self.ttl else None
+        with self.lock:
+            self.data[key] = (expires_at, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_size:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def get_stats(self) -> dict:
+        return {
+            "size": len(self.data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SqliteCache:
+    """Thread-safe on-disk cache of JSON values with a maximum size and a time to
+    live, the least recently used entries are evicted once the cache is full.
+    """
+
+    def __init__(self, path: str, max_size: int, ttl: Optional[float] = None):
+        """
+        Args:
+            path (str): path of the SQLite database file
+            max_size (int): maximum number of entries
+            ttl (Optional[float], optional): seconds after which an entry expires.
+                Defaults to None, entries never expire.
+        """
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT, expires_at REAL, accessed_at REAL)"
+            )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = row
+            if expires_at is not None and now >= expires_at:
+                self.connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self.misses += 1
+                return default
+
+            self.connection.execute(
+                "UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            (size,) = self.connection.execute("SELECT COUNT(*) FROM cache").fetchone()
+            if size > self.max_size:
+                cursor = self.connection.execute(
+                    "DELETE FROM cache WHERE key IN "
+                    "(SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                    (size - self.max_size,),
+                )
+                self.evictions += cursor.rowcount
+
+    def clear(self) -> None:
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM cache")
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            (size,) = self.connection.execute("SELECT COUNT(*) FROM cache").fetchone()
+        return {
+            "size": size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
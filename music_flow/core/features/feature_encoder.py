@@ -0,0 +1,83 @@
+from typing import Optional
+
+import numpy as np
+
+from music_flow.core.features.preprocessing import (
+    all_keys,
+    log_transform_columns,
+    map_keys_to_string,
+)
+
+
+class FeatureEncoder:
+    """Encode a flattened feature dict into a model input row without pandas.
+
+    The column layout is compiled once from the feature names stored in the
+    model metadata. The encoded row is identical to the output of
+    `feature_preprocessing` followed by the selection of the model features.
+    """
+
+    def __init__(self, features: list[str]):
+        self.features = list(features)
+        self.num_features = len(self.features)
+
+        index = {name: position for position, name in enumerate(self.features)}
+
+        self.key_positions = {key: index[key] for key in all_keys if key in index}
+        self.value_columns = [
+            (position, name)
+            for position, name in enumerate(self.features)
+            if name not in all_keys
+        ]
+        self.log_positions = np.array(
+            [
+                position
+                for position, name in self.value_columns
+                if name in log_transform_columns
+            ],
+            dtype=np.intp,
+        )
+        self.template = np.zeros(self.num_features, dtype=np.float64)
+
+    def transform(self, features: dict, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Encode a single sample into a (1, num_features) float32 array
+
+        Args:
+            features (dict): flattened features from `get_formatted_features`
+            out (Optional[np.ndarray], optional): preallocated float32 array of
+                shape (1, num_features) to write into. Defaults to None.
+
+        Raises:
+            KeyError: if a feature required by the model is missing
+
+        Returns:
+            np.ndarray: encoded sample in the column order of the model
+        """
+        row = self.template.copy()
+        for position, name in self.value_columns:
+            row[position] = features[name]
+
+        row[self.log_positions] = np.log1p(row[self.log_positions])
+
+        key = map_keys_to_string(features["key"])
+        if key in self.key_positions:
+            row[self.key_positions[key]] = 1.0
+
+        if out is None:
+            out = np.empty((1, self.num_features), dtype=np.float32)
+        out[0] = row
+        return out
+
+    def transform_batch(self, samples: list[dict]) -> np.ndarray:
+        """Encode multiple samples into a (num_samples, num_features) float32 array
+
+        Args:
+            samples (list[dict]): flattened features from `get_formatted_features`
+
+        Returns:
+            np.ndarray: encoded samples in the column order of the model
+        """
+        out = np.empty((len(samples), self.num_features), dtype=np.float32)
+        for position, features in enumerate(samples):
+            self.transform(features, out=out[position : position + 1])
+        return out
@@ -0,0 +1,149 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from music_flow.config import settings
+from music_flow.core.batch_spotify_api import BatchSpotifyAPI
+from music_flow.core.features.get_raw_features import (
+    failure_descriptions,
+    get_song_data_metadata,
+    get_track_id,
+)
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.INFO)
+
+batch_spotify_api = BatchSpotifyAPI()
+
+
+def get_chunks(values: list, size: int) -> list[list]:
+    """split a list into chunks of a maximum size"""
+    return [values[index : index + size] for index in range(0, len(values), size)]
+
+
+def search_track_id(item: dict) -> Tuple[Optional[str], int]:
+    """get the track_id for an item, a failed request counts as not found"""
+    try:
+        return get_track_id(item.get("track_name"), item.get("artist_name"))  # type: ignore
+    except Exception as e:
+        logger.debug(f"search failed: {e}")
+        return None, 500
+
+
+def fetch_batch(func: Callable, ids: list[str], key: str) -> dict:
+    """call a batch endpoint and map the responses by track_id
+
+    Args:
+        func (Callable): batch endpoint of the BatchSpotifyAPI
+        ids (list[str]): track_ids of the request
+        key (str): key of the response list in the Spotify response
+
+    Returns:
+        dict: responses by track_id, empty if the request failed
+    """
+    try:
+        response, status_code = func(ids)
+    except Exception as e:
+        logger.debug(f"batch request failed: {e}")
+        return {}
+
+    if status_code != 200:
+        return {}
+    return batch_spotify_api.convert_batch_response_to_dict(response.get(key, []))
+
+
+def get_batch_raw_features(items: list[dict]) -> list[Tuple[dict, int]]:
+    """get the raw features for multiple tracks using the Spotify batch endpoints
+
+    Items without a track_id are resolved concurrently with the search endpoint.
+    The tracks and audio features are then fetched in chunks of the maximum
+    number of ids allowed per request. The audio analysis is not available as
+    batch endpoint and is therefore not included.
+
+    Args:
+        items (list[dict]): tracks with "track_name", "artist_name" and
+            an optional "track_id"
+
+    Returns:
+        list[Tuple[dict, int]]: raw features and status code per item, in the
+            same order as the items
+    """
+    track_ids = [item.get("track_id") for item in items]
+    status_codes = [200] * len(items)
+
+    with ThreadPoolExecutor(max_workers=settings.BATCH_SEARCH_WORKERS) as executor:
+        missing = [index for index, track_id in enumerate(track_ids) if not track_id]
+        searches = executor.map(search_track_id, [items[index] for index in missing])
+        for index, (track_id, status_code) in zip(missing, searches):
+            track_ids[index] = track_id
+            status_codes[index] = status_code
+
+        unique_ids = list(dict.fromkeys(filter(None, track_ids)))
+
+        audio_features_futures = [
+            executor.submit(
+                fetch_batch,
+                batch_spotify_api.get_batch_audio_features,
+                ids,
+                "audio_features",
+            )
+            for ids in get_chunks(unique_ids, batch_spotify_api.max_audio_features_ids)
+        ]
+        tracks_futures = [
+            executor.submit(
+                fetch_batch, batch_spotify_api.get_batch_tracks, ids, "tracks"
+            )
+            for ids in get_chunks(unique_ids, batch_spotify_api.max_tracks_ids)
+        ]
+
+        audio_features = {}
+        for future in audio_features_futures:
+            audio_features.update(future.result())
+
+        tracks = {}
+        for future in tracks_futures:
+            tracks.update(future.result())
+
+    results = []
+    for item, track_id, status_code in zip(items, track_ids, status_codes):
+        data = {
+            "track_name": item.get("track_name"),
+            "artist_name": item.get("artist_name"),
+        }
+
+        if not track_id:
+            failure_type = "search_track_url"
+        elif track_id not in audio_features:
+            failure_type, status_code = "audio_features", 404
+        elif track_id not in tracks:
+            failure_type, status_code = "track", 404
+        else:
+            failure_type = None
+
+        if failure_type:
+            data["status"] = "failed"
+            data["failure_type"] = failure_type
+            data["description"] = failure_descriptions[failure_type]
+            results.append((data, status_code))
+            continue
+
+        track = tracks[track_id]
+        if not data["track_name"]:
+            data["track_name"] = track.get("name")
+        if not data["artist_name"]:
+            artists = [artist["name"] for artist in track.get("artists", [])]
+            data["artist_name"] = artists[0] if artists else None
+
+        data["audio_features"] = audio_features[track_id]
+        data["track"] = track
+        data["status"] = "success"
+        data["failure_type"] = None
+        data["description"] = (
+            "Raw audio features from Spotify API fetched successfully."
+        )
+        data["metadata"] = get_song_data_metadata(track)
+        data["track_id"] = track_id
+        results.append((data, status_code))
+
+    return results
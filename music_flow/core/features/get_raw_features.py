@@ -1,9 +1,13 @@
+import asyncio
 import logging
 import logging.config
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Callable, Optional, Tuple
+from typing import Callable, Iterable, Iterator, Optional, Tuple
 
 from music_flow.config import settings
+from music_flow.core.async_spotify_api import AsyncSpotifyAPI
+from music_flow.core.features.raw_features_cache import RawFeaturesCache
 from music_flow.core.spotify_api import SpotifyAPI
 
 logger = logging.getLogger(__name__)
@@ -11,6 +15,19 @@ logger.addHandler(logging.StreamHandler())
 logger.setLevel(logging.INFO)
 
 spotify_api = SpotifyAPI()
+async_spotify_api = AsyncSpotifyAPI()
+raw_features_cache = RawFeaturesCache()
+
+failure_descriptions = {
+    "search_track_url": "Failed to fetched track_id from Spotfiy API.",
+    "audio_features": (
+        "Failed to fetched data from Spotify API audio features endpoint."
+    ),
+    "track": "Failed to fetched data from Sptofiy API track endpoint.",
+    "audio_analysis": (
+        "Failed to fetched data from Spotify API audio analysis endpoint."
+    ),
+}
 
 
 @dataclass
@@ -37,10 +54,14 @@ def get_song_data_metadata(response: dict) -> dict:
     return metadata
 
 
-def get_track_id(track_name: str, artist_name: str) -> Tuple[Optional[str], int]:
-    """get the track_id from the Spotify API for a given track"""
-    url = spotify_api.search_track_url(track_name, artist_name)
-    response, status_code = spotify_api.get_request(url)
+def get_track_id(
+    track_name: str, artist_name: str, api: Optional[SpotifyAPI] = None
+) -> Tuple[Optional[str], int]:
+    """get the track_id from the Spotify API for a given track, with the shared
+    client unless another `api` is given"""
+    api = api or spotify_api
+    url = api.search_track_url(track_name, artist_name)
+    response, status_code = api.get_request(url)
     logger.debug(f"status_code: {status_code}")
     try:
         track_id = response["tracks"]["items"][0]["id"]
@@ -50,44 +71,30 @@ def get_track_id(track_name: str, artist_name: str) -> Tuple[Optional[str], int]
     return track_id, status_code
 
 
-def get_raw_features(
-    track_name: str, artist_name: str, track_id: Optional[str] = None
-) -> Tuple[dict, int]:
-    """get the features from the Spotify API for a given track"""
-    # TODO: refactor this function
-
-    data = {
-        "track_name": track_name,
-        "artist_name": artist_name,
-    }
+def get_endpoints(api) -> list[Endpoint]:
+    """get the endpoints that are called once the track_id is known
 
-    if not track_id:
-        track_id, status_code = get_track_id(track_name, artist_name)
-        if not track_id:
-            data["status"] = "failed"
-            data["failure_type"] = "search_track_url"
-            data["description"] = "Failed to fetched track_id from Spotfiy API."
-            return data, status_code
+    Args:
+        api: SpotifyAPI or AsyncSpotifyAPI client
 
+    Returns:
+        list[Endpoint]: endpoints in the order in which failures are reported
+    """
     endpoints = [
         Endpoint(
             name="audio_features",
-            func=spotify_api.get_audio_features,
-            description=(
-                "Failed to fetched data from Spotify API audio features endpoint."
-            ),
+            func=api.get_audio_features,
+            description=failure_descriptions["audio_features"],
         ),
         Endpoint(
             name="track",
-            func=spotify_api.get_track,
-            description="Failed to fetched data from Sptofiy API track endpoint.",
+            func=api.get_track,
+            description=failure_descriptions["track"],
         ),
         Endpoint(
             name="audio_analysis",
-            func=spotify_api.get_audio_analysis,
-            description=(
-                "Failed to fetched data from Spotify API audio analysis endpoint."
-            ),
+            func=api.get_audio_analysis,
+            description=failure_descriptions["audio_analysis"],
         ),
     ]
 
@@ -97,25 +104,163 @@ def get_raw_features(
         ]
     else:
         logger.info("Including audio analysis")
+    return endpoints
+
+
+def store_endpoint_responses(
+    data: dict,
+    track_id: str,
+    endpoints: list[Endpoint],
+    responses: Iterable[Tuple[dict, int]],
+) -> Tuple[dict, int]:
+    """store the endpoint responses in the raw features
 
-    for endpoint in endpoints:
-        name = endpoint.name
-        response, status_code = endpoint.func(track_id)
+    The responses are consumed in the order of the endpoints, so that the first
+    failing endpoint determines the failure_type, the same as if the endpoints
+    had been called one after another.
+
+    Args:
+        data (dict): raw features to store the responses in
+        track_id (str): Spotify track_id
+        endpoints (list[Endpoint]): called endpoints
+        responses (Iterable[Tuple[dict, int]]): response and status code per endpoint
+
+    Returns:
+        Tuple[dict, int]: raw features and status code
+    """
+    status_code = 200
+    for endpoint, (response, status_code) in zip(endpoints, responses):
         logger.debug(f"endpoint: {endpoint.name}, status_code: {status_code}")
         if status_code == 200:
-            data[name] = response
+            data[endpoint.name] = response
         else:
             data["status"] = "failed"
-            data["failure_type"] = name
+            data["failure_type"] = endpoint.name
             data["description"] = endpoint.description
             return data, status_code
 
     data["status"] = "success"
-    data["failure_type"] = None  # type: ignore
+    data["failure_type"] = None
     data["description"] = "Raw audio features from Spotify API fetched successfully."
-    data["metadata"] = get_song_data_metadata(data["track"])  # type: ignore
+    data["metadata"] = get_song_data_metadata(data["track"])
     data["track_id"] = track_id
-    return data, status_code  # type: ignore
+    return data, status_code
+
+
+def get_cached_by_track_id(
+    track_name: str, artist_name: str, track_id: str
+) -> Optional[dict]:
+    """get the cached raw features of a track that was found under another name,
+    the raw features are then cached under this name as well"""
+    cached_data = raw_features_cache.get(track_name, artist_name, track_id)
+    if cached_data:
+        raw_features_cache.add(cached_data)
+    return cached_data
+
+
+def raise_exceptions(responses: list) -> Iterator[Tuple[dict, int]]:
+    """re-raise the exception of a gathered response once it is consumed"""
+    for response in responses:
+        if isinstance(response, BaseException):
+            raise response
+        yield response
+
+
+def get_raw_features(
+    track_name: str,
+    artist_name: str,
+    track_id: Optional[str] = None,
+    api: Optional[SpotifyAPI] = None,
+) -> Tuple[dict, int]:
+    """get the features from the Spotify API for a given track, with the shared
+    client unless another `api` is given"""
+    # TODO: refactor this function
+    api = api or spotify_api
+
+    data = {
+        "track_name": track_name,
+        "artist_name": artist_name,
+    }
+
+    cached_data = raw_features_cache.get(track_name, artist_name, track_id)
+    if cached_data:
+        return cached_data, 200
+
+    if not track_id:
+        track_id, status_code = get_track_id(track_name, artist_name, api=api)
+        if not track_id:
+            data["status"] = "failed"
+            data["failure_type"] = "search_track_url"
+            data["description"] = failure_descriptions["search_track_url"]
+            return data, status_code
+
+        cached_data = get_cached_by_track_id(track_name, artist_name, track_id)
+        if cached_data:
+            return cached_data, 200
+
+    # the endpoints are independent once the track_id is known
+    endpoints = get_endpoints(api)
+    with ThreadPoolExecutor(max_workers=len(endpoints)) as executor:
+        futures = [executor.submit(endpoint.func, track_id) for endpoint in endpoints]
+        responses = (future.result() for future in futures)
+        data, status_code = store_endpoint_responses(
+            data, track_id, endpoints, responses
+        )
+    raw_features_cache.add(data)
+    return data, status_code
+
+
+async def get_track_id_async(
+    track_name: str, artist_name: str
+) -> Tuple[Optional[str], int]:
+    """get the track_id from the Spotify API for a given track without blocking"""
+    url = async_spotify_api.search_track_url(track_name, artist_name)
+    response, status_code = await async_spotify_api.get_request(url)
+    logger.debug(f"status_code: {status_code}")
+    try:
+        track_id = response["tracks"]["items"][0]["id"]
+    except (IndexError, KeyError, TypeError):
+        track_id = None
+        logger.debug("Failed to get track_id from Spotify API.")
+    return track_id, status_code
+
+
+async def get_raw_features_async(
+    track_name: str, artist_name: str, track_id: Optional[str] = None
+) -> Tuple[dict, int]:
+    """get the features from the Spotify API for a given track without blocking
+    the event loop, the response is the same as for `get_raw_features`"""
+
+    data = {
+        "track_name": track_name,
+        "artist_name": artist_name,
+    }
+
+    cached_data = raw_features_cache.get(track_name, artist_name, track_id)
+    if cached_data:
+        return cached_data, 200
+
+    if not track_id:
+        track_id, status_code = await get_track_id_async(track_name, artist_name)
+        if not track_id:
+            data["status"] = "failed"
+            data["failure_type"] = "search_track_url"
+            data["description"] = failure_descriptions["search_track_url"]
+            return data, status_code
+
+        cached_data = get_cached_by_track_id(track_name, artist_name, track_id)
+        if cached_data:
+            return cached_data, 200
+
+    endpoints = get_endpoints(async_spotify_api)
+    responses = await asyncio.gather(
+        *[endpoint.func(track_id) for endpoint in endpoints], return_exceptions=True
+    )
+    data, status_code = store_endpoint_responses(
+        data, track_id, endpoints, raise_exceptions(responses)
+    )
+    raw_features_cache.add(data)
+    return data, status_code
 
 
 if __name__ == "__main__":
@@ -1,7 +1,12 @@
+from __future__ import annotations
+
 import numpy as np
-import pandas as pd
 
 from music_flow.config import model_settings
+from music_flow.core.startup_profiler import lazy_import
+
+# pandas is only needed for training, not for serving predictions
+pd = lazy_import("pandas")
 
 key_mapping = {
     0: "C",
@@ -18,11 +23,41 @@ key_mapping = {
     11: "B",
 }
 
+all_keys = list(key_mapping.values()) + ["Unknown"]
+
+log_transform_columns = [
+    "speechiness",
+    "acousticness",
+    "instrumentalness",
+    "liveness",
+    "plays",
+]
+
+
+drop_columns = [
+    "type",
+    "id",
+    "uri",
+    "track_href",
+    "analysis_url",
+    "id_hash",
+    "release_date",
+    "isrc",
+    "album",
+    "track_name",
+    "artist_name",
+    "release_date_precision",
+    "source",
+    "hash",
+    "error",
+]
+
 
 def limit_max_plays(dataset) -> pd.DataFrame:
-    """limit the max value of plays to max_value"""
-    dataset["plays"] = dataset["plays"].clip(upper=model_settings.MAX_PREDICTION_VALUE)
-    return dataset
+    """limit the max value of plays to max_value, returns a new frame"""
+    return dataset.assign(
+        plays=dataset["plays"].clip(upper=model_settings.MAX_PREDICTION_VALUE)
+    )
 
 
 def get_one_hot_encoding(df, column):
@@ -46,63 +81,64 @@ def map_keys_to_string(key: int) -> str:
     """
     try:
         string_key = key_mapping[int(key)]
-    except ValueError:
+    except (ValueError, KeyError):
+        # nan or -1, if no key was detected
         string_key = "Unknown"
     return string_key
 
 
+def get_key_codes(keys) -> np.ndarray:
+    """map keys to their position in `all_keys`, vectorized version of
+    `map_keys_to_string`
+
+    Args:
+        keys (pd.Series): pitch class of the songs, nan or -1 if unknown
+
+    Returns:
+        np.ndarray: position in `all_keys` per song, the last position is "Unknown"
+    """
+    values = np.trunc(pd.to_numeric(keys, errors="coerce").to_numpy(dtype=float))
+    is_known = (values >= 0) & (values < len(key_mapping))
+    return np.where(is_known, values, len(key_mapping)).astype(np.intp)
+
+
 def reverse_prediction(value):
     return np.expm1(value)
 
 
-def feature_preprocessing(dataset: pd.DataFrame):
-    """feature preprocessing"""
-    dataset = limit_max_plays(dataset)
-
-    drop_columns = [
-        "type",
-        "id",
-        "uri",
-        "track_href",
-        "analysis_url",
-        "id_hash",
-        "release_date",
-        "isrc",
-        "album",
-        "track_name",
-        "artist_name",
-        "release_date_precision",
-        "source",
-        "hash",
-        "error",
-    ]
+def feature_preprocessing(dataset: pd.DataFrame) -> pd.DataFrame:
+    """feature preprocessing, the frame of the caller is not modified
 
-    columns = list(set(drop_columns) & set(list(dataset)))
-    dataset.drop(columns=columns, inplace=True)
+    The columns are the columns of the dataset without the dropped columns and
+    the key, followed by the one hot encoded keys in the order of `all_keys`.
+    All keys are encoded, also keys that are not in the dataset, so that the
+    columns do not depend on the data.
 
-    # transformation step
-    for column in [
-        "speechiness",
-        "acousticness",
-        "instrumentalness",
-        "liveness",
-        "plays",
-    ]:
-        dataset[column] = dataset[column].apply(np.log1p)
+    Args:
+        dataset (pd.DataFrame): raw features, with or without the "plays" target
+
+    Returns:
+        pd.DataFrame: preprocessed features
+    """
+    columns = [
+        column
+        for column in dataset.columns
+        if column not in drop_columns and column != "key"
+    ]
+    data = {column: dataset[column] for column in columns}
+
+    if "plays" in data:
+        data["plays"] = data["plays"].clip(upper=model_settings.MAX_PREDICTION_VALUE)
 
     # feature engineering
     # - us np.log1 for skewed variables like instrumentalness
     # https://www.kaggle.com/general/93016
+    for column in log_transform_columns:
+        if column in data:
+            data[column] = np.log1p(data[column])
 
-    dataset["key"] = dataset["key"].apply(map_keys_to_string)
-
-    for column in ["key"]:
-        dataset = get_one_hot_encoding(dataset, column=column)
-
-    all_keys = list(key_mapping.values()) + ["Unknown"]
-    for col in all_keys:
-        if col not in dataset:
-            dataset[col] = 0
+    one_hot = np.eye(len(all_keys), dtype=np.uint8)[get_key_codes(dataset["key"])]
+    for position, column in enumerate(all_keys):
+        data[column] = one_hot[:, position]
 
-    list(dataset)
-    return dataset
+    return pd.DataFrame(data, index=dataset.index)
@@ -0,0 +1,106 @@
+import logging
+from typing import Optional
+
+from music_flow.config import settings
+from music_flow.core.cache import LRUCache, SqliteCache
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.INFO)
+
+
+class RawFeaturesCache:
+    """Two-tier cache of successfully fetched raw features
+
+    The raw features are cached in memory and, once a path is set, in a SQLite
+    database on disk, so that they survive a restart of the process (e.g. a warm
+    Lambda container). Entries are stored under the Spotify track_id and under
+    the normalized track and artist name.
+    """
+
+    def __init__(
+        self,
+        max_size: int = settings.RAW_FEATURES_CACHE_SIZE,
+        max_disk_size: int = settings.RAW_FEATURES_CACHE_DISK_SIZE,
+        ttl: int = settings.RAW_FEATURES_CACHE_TTL,
+    ):
+        self.ttl = ttl
+        self.max_disk_size = max_disk_size
+        self.memory = LRUCache(max_size=max_size, ttl=ttl)
+        self.disk: Optional[SqliteCache] = None
+
+    def set_path(self, path: str) -> None:
+        """Store the cache on disk in the SQLite database at the given path"""
+        if self.disk is not None:
+            if self.disk.path == path:
+                return
+            self.disk.close()
+        self.disk = SqliteCache(path, max_size=self.max_disk_size, ttl=self.ttl)
+        logger.info(f"raw features cache stored in: {path}")
+
+    @staticmethod
+    def get_track_id_key(track_id: str) -> str:
+        return f"track_id:{track_id}"
+
+    @staticmethod
+    def get_name_key(track_name: str, artist_name: str) -> str:
+        def normalize(name: str) -> str:
+            return " ".join(str(name or "").lower().split())
+
+        return f"name:{normalize(track_name)}|{normalize(artist_name)}"
+
+    def get_keys(self, data: dict) -> list[str]:
+        keys = [self.get_track_id_key(data["track_id"])]
+        if data.get("track_name"):
+            keys.append(self.get_name_key(data["track_name"], data["artist_name"]))
+        return keys
+
+    def get(
+        self, track_name: str, artist_name: str, track_id: Optional[str] = None
+    ) -> Optional[dict]:
+        """get the cached raw features, by track_id if known, otherwise by name
+
+        Args:
+            track_name (str): name of the track
+            artist_name (str): name of the artist
+            track_id (Optional[str], optional): Spotify track_id. Defaults to None.
+
+        Returns:
+            Optional[dict]: raw features or None if not cached
+        """
+        if track_id:
+            key = self.get_track_id_key(track_id)
+        else:
+            key = self.get_name_key(track_name, artist_name)
+
+        data = self.memory.get(key)
+        if data is None and self.disk is not None:
+            data = self.disk.get(key)
+            if data is not None:
+                self.memory.set(key, data)
+
+        if data is None:
+            return None
+
+        return {**data, "track_name": track_name, "artist_name": artist_name}
+
+    def add(self, data: dict) -> None:
+        """cache the raw features if they were fetched successfully"""
+        if data.get("status") != "success":
+            return
+
+        for key in self.get_keys(data):
+            self.memory.set(key, data)
+            if self.disk is not None:
+                self.disk.set(key, data)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def get_stats(self) -> dict:
+        return {
+            "memory": self.memory.get_stats(),
+            "disk": self.disk.get_stats() if self.disk is not None else None,
+        }
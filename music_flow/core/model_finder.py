@@ -1,11 +1,19 @@
 import os
-from typing import List, Optional
+from typing import Dict, List, Optional
 
+from music_flow.core.model_index import ModelIndex
 from music_flow.core.utils import path_results, read_json
 
 DEFAULT_MAX: int = 1_000_000
 DEFAULT_MIN: int = 0
 
+metrics = {
+    "r2_score": ("higher", DEFAULT_MIN),
+    "mean_absolute_error": ("lower", DEFAULT_MAX),
+    "mean_squared_error": ("lower", DEFAULT_MAX),
+    "mean_absolute_percentage_error": ("lower", DEFAULT_MAX),
+}
+
 
 def get_latest_folder(folders: List[str]) -> str:
     """
@@ -35,26 +43,40 @@ def get_best_score_folder(folders: List[str], metric: Optional[str]) -> str:
     Returns:
         str: _description_
     """
+    scores = {}
+    for folder in folders:
+        try:
+            path = os.path.join(path_results, folder, "metadata.json")
+            data = read_json(path)
+        except FileNotFoundError:
+            continue
+        scores[folder] = data["model"]["score"]
+
+    return select_best_score_folder(scores, metric)
+
+
+def select_best_score_folder(scores: Dict[str, dict], metric: Optional[str]) -> str:
+    """
+    Returns the folder with the best score for a given metric
+
+    Args:
+        scores (Dict[str, dict]): scores of the model per folder
+        metric (str): name of the metric to use
 
-    metrics = {
-        "r2_score": ("higher", DEFAULT_MIN),
-        "mean_absolute_error": ("lower", DEFAULT_MAX),
-        "mean_squared_error": ("lower", DEFAULT_MAX),
-        "mean_absolute_percentage_error": ("lower", DEFAULT_MAX),
-    }
+    Raises:
+        ValueError: if the metric is not specified
+        FileNotFoundError: if no folder has a score
 
+    Returns:
+        str: folder with the best score
+    """
     if not metric:
         raise ValueError(f"Metric not specified - options: {metrics.keys()}")
 
     direction, max_score = metrics[metric]
     best_folder = None
-    for folder in folders:
-        try:
-            path = os.path.join(path_results, folder, "metadata.json")
-            data = read_json(path)
-        except FileNotFoundError:
-            continue
-        score = data["model"]["score"][metric]
+    for folder, score_dict in scores.items():
+        score = score_dict[metric]
         if direction == "higher" and score > max_score:
             max_score = score
             best_folder = folder
@@ -71,31 +93,37 @@ def get_best_score_folder(folders: List[str], metric: Optional[str]) -> str:
 def get_model_folder(
     mode: str = "latest", metric: Optional[str] = None, path: Optional[str] = None
 ) -> str:
-    """_summary_
+    """Returns the latest or best scoring folder, the folders are looked up in
+    the model index of the results folder instead of reading every folder
 
     Args:
-        mode (str, optional): _description_. Defaults to "latest".
-        metric (Optional[str], optional): _description_. Defaults to None.
-        path (Optional[str], optional): _description_. Defaults to None.
+        mode (str, optional): "latest" or "best_score". Defaults to "latest".
+        metric (Optional[str], optional): metric of the best score. Defaults to None.
+        path (Optional[str], optional): results folder. Defaults to None.
 
     Raises:
-        ValueError: _description_
+        ValueError: if the mode or the metric is not valid
 
     Returns:
-        str: _description_
+        str: name of the model folder
     """
 
     if path is None:
         path = path_results
 
-    folders = os.listdir(path)
-
-    if mode == "latest":
-        folder = get_latest_folder(folders)
-    elif mode == "best_score":
-        folder = get_best_score_folder(folders, metric)
-    else:
-        raise ValueError("Mode not found - options: latest, best_score")
+    model_index = ModelIndex(path)
+    try:
+        if mode == "latest":
+            folder = model_index.get_latest_folder()
+        elif mode == "best_score":
+            if not metric:
+                raise ValueError(f"Metric not specified - options: {metrics.keys()}")
+            direction, bound = metrics[metric]
+            folder = model_index.get_best_score_folder(metric, direction, bound)
+        else:
+            raise ValueError("Mode not found - options: latest, best_score")
+    finally:
+        model_index.close()
     return folder
 
 
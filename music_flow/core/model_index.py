@@ -0,0 +1,232 @@
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+from music_flow.config import settings
+from music_flow.core.utils import path_results, read_json
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel(settings.LOGGING_LEVEL)
+
+
+def get_score(path_folder: str) -> Optional[dict]:
+    """read the scores of a results folder, None if the folder has no scores
+
+    Args:
+        path_folder (str): path of the results folder
+
+    Returns:
+        Optional[dict]: model_version and score metrics of the model
+    """
+    try:
+        path = os.path.join(path_folder, "score_dict.json")
+        return {"model_version": None, "score": read_json(path)}
+    except (FileNotFoundError, NotADirectoryError, ValueError):
+        pass
+
+    try:
+        metadata = read_json(os.path.join(path_folder, "metadata.json"))
+    except (FileNotFoundError, NotADirectoryError, ValueError):
+        return None
+
+    model = metadata.get("model", {})
+    key = "score" if "score" in model else "score_dict"
+    return {"model_version": model.get("model_version"), "score": model.get(key, {})}
+
+
+class ModelIndex:
+    """Index of the results folders with the model version and the scores
+
+    The index is stored in a SQLite file in a hidden subfolder of the results
+    folder, the scores are
+    indexed per metric, so that the latest or best scoring folder is found
+    without reading the metadata of every folder. The index is updated when a
+    training saves its metadata, folders that are added or removed otherwise
+    are synced once the results folder has changed. The SQLite file and its
+    journal are written to the subfolder, so that writing the index does not
+    change the modification time of the results folder.
+    """
+
+    folder_name = ".model_index"
+    file_name = "index.sqlite"
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path if path else path_results
+        self.lock = threading.Lock()
+        self.connection = None
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            if not os.path.isdir(self.path):
+                raise FileNotFoundError(f"results folder not found: {self.path}")
+            path_index = os.path.join(self.path, self.folder_name)
+            os.makedirs(path_index, exist_ok=True)
+            self.connection = sqlite3.connect(
+                os.path.join(path_index, self.file_name), check_same_thread=False
+            )
+            self.connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS folders (
+                    folder TEXT PRIMARY KEY,
+                    model_version TEXT,
+                    has_score INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS scores (
+                    folder TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (folder, metric)
+                );
+                CREATE INDEX IF NOT EXISTS scores_metric_value
+                    ON scores (metric, value);
+                CREATE TABLE IF NOT EXISTS state (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER
+                );
+                """
+            )
+        return self.connection
+
+    def close(self) -> None:
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def get_mtime(self) -> int:
+        return os.stat(self.path).st_mtime_ns
+
+    def write(self, connection: sqlite3.Connection, folder: str, data: Optional[dict]):
+        connection.execute("DELETE FROM scores WHERE folder = ?", (folder,))
+        connection.execute(
+            "INSERT OR REPLACE INTO folders VALUES (?, ?, ?)",
+            (folder, data["model_version"] if data else None, int(data is not None)),
+        )
+        if data is None:
+            return
+        connection.executemany(
+            "INSERT INTO scores VALUES (?, ?, ?)",
+            [
+                (folder, metric, value)
+                for metric, value in data["score"].items()
+                if isinstance(value, (int, float))
+            ],
+        )
+
+    def add(self, folder: str, metadata: dict) -> None:
+        """add or update a folder with its metadata, called when the metadata
+        of a training is saved
+
+        Args:
+            folder (str): name of the results folder
+            metadata (dict): metadata of the model
+        """
+        model = metadata.get("model", {})
+        data = {
+            "model_version": model.get("model_version"),
+            "score": model.get("score", {}),
+        }
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                self.write(connection, folder, data)
+
+    def refresh(self) -> None:
+        """sync the index with the results folder, if the folder has changed
+
+        Only folders that are not indexed yet, or have no scores yet, are read.
+        """
+        with self.lock:
+            connection = self.connect()
+            mtime = self.get_mtime()
+            row = connection.execute(
+                "SELECT value FROM state WHERE key = 'mtime'"
+            ).fetchone()
+            if row is not None and row[0] == mtime:
+                return
+
+            folders = {
+                entry.name
+                for entry in os.scandir(self.path)
+                if entry.is_dir() and not entry.name.startswith(".")
+            }
+            indexed = dict(connection.execute("SELECT folder, has_score FROM folders"))
+
+            with connection:
+                for folder in set(indexed) - folders:
+                    connection.execute(
+                        "DELETE FROM folders WHERE folder = ?", (folder,)
+                    )
+                    connection.execute("DELETE FROM scores WHERE folder = ?", (folder,))
+
+                for folder in folders:
+                    if indexed.get(folder):
+                        continue
+                    data = get_score(os.path.join(self.path, folder))
+                    self.write(connection, folder, data)
+
+                connection.execute(
+                    "INSERT OR REPLACE INTO state VALUES ('mtime', ?)", (mtime,)
+                )
+            logger.debug(f"model index synced: {len(folders)} folders")
+
+    def get_latest_folder(self) -> str:
+        """name of the latest results folder
+
+        Raises:
+            FileNotFoundError: if the index has no folder
+        """
+        self.refresh()
+        with self.lock:
+            row = (
+                self.connect()
+                .execute("SELECT folder FROM folders ORDER BY folder DESC LIMIT 1")
+                .fetchone()
+            )
+        if row is None:
+            raise FileNotFoundError("No folder found")
+        return row[0]
+
+    def get_best_score_folder(self, metric: str, direction: str, bound: float) -> str:
+        """name of the folder with the best score of the metric
+
+        Args:
+            metric (str): name of the metric
+            direction (str): "higher" or "lower" is better
+            bound (float): the best score has to be better than the bound
+
+        Raises:
+            FileNotFoundError: if no folder has a score of the metric
+        """
+        if direction == "higher":
+            condition, order = "value > ?", "DESC"
+        else:
+            condition, order = "value < ?", "ASC"
+
+        self.refresh()
+        with self.lock:
+            row = (
+                self.connect()
+                .execute(
+                    f"SELECT folder FROM scores WHERE metric = ? AND {condition} "
+                    f"ORDER BY value {order}, folder LIMIT 1",
+                    (metric, bound),
+                )
+                .fetchone()
+            )
+        if row is None:
+            raise FileNotFoundError("No best score file found")
+        return row[0]
+
+    def get_scores(self) -> Dict[str, dict]:
+        """scores per folder of all folders with scores"""
+        self.refresh()
+        with self.lock:
+            rows = self.connect().execute("SELECT folder, metric, value FROM scores")
+            scores: Dict[str, dict] = {}
+            for folder, metric, value in rows:
+                scores.setdefault(folder, {})[metric] = value
+        return scores
@@ -6,6 +6,8 @@ from typing import Optional
 from music_flow.config import model_settings, settings
 from music_flow.core.model_finder import get_model_folder
 from music_flow.core.model_registry import ModelRegistry
+from music_flow.core.startup_profiler import startup_profiler
+from music_flow.core.tree_ensemble import TreeEnsemble
 from music_flow.core.utils import path_results, read_json
 
 logger = logging.getLogger(__name__)
@@ -20,22 +22,25 @@ class ModelLoader:
         mode: str = "latest",
         metric: Optional[str] = None,
         path_registry: Optional[str] = None,
+        backend: str = model_settings.PREDICTOR_BACKEND,
     ):
-        if not model_folder:
-            try:
-                model_folder = get_model_folder(mode, metric)
-            except Exception as e:
-                logger.error(e)
-                model_folder = model_settings.MODEL_FOLDER
-
-        self.model_folder = model_folder
-        logger.info(f"model_folder: {self.model_folder}")
-
         if not path_registry:
             self.path_registry = path_results
         else:
             self.path_registry = path_registry
 
+        # only the files of the backend are downloaded
+        self.backend = backend
+        registry = ModelRegistry(
+            settings.BUCKET_NAME, path_registry=self.path_registry, backend=backend
+        )
+
+        if not model_folder:
+            model_folder = self.find_model_folder(registry, mode, metric)
+
+        self.model_folder = model_folder
+        logger.info(f"model_folder: {self.model_folder}")
+
         try:
             list_of_models = os.listdir(self.path_registry)
         except FileNotFoundError:
@@ -43,23 +48,50 @@ class ModelLoader:
 
         logger.debug(f"list of models: {list_of_models}")
 
-        if model_folder not in list_of_models:
+        is_trained_locally = (
+            self.path_registry == path_results and model_folder in list_of_models
+        )
+
+        # a folder is only complete once all files are downloaded and verified
+        if not registry.is_complete(model_folder) and not is_trained_locally:
             logger.info(f"downloading model from s3 bucket: {model_folder}")
-            registry = ModelRegistry(
-                settings.BUCKET_NAME, path_registry=self.path_registry
-            )
-            registry.download_folder(model_folder)
+            with startup_profiler.phase("model_download"):
+                registry.download_folder(model_folder)
 
         self.path_model_folder = os.path.join(self.path_registry, model_folder)
         self.path_metadata = os.path.join(self.path_model_folder, "metadata.json")
 
-    def load(self):
+    @staticmethod
+    def find_model_folder(
+        registry: ModelRegistry, mode: str, metric: Optional[str]
+    ) -> str:
+        """find the model folder in the local results, then in the registry index,
+        and fall back to the configured model folder"""
+        try:
+            return get_model_folder(mode, metric)
+        except Exception as e:
+            logger.error(e)
+
+        try:
+            return registry.find_folder(mode, metric)
+        except Exception as e:
+            logger.error(e)
+        return model_settings.MODEL_FOLDER
+
+    def load(self, backend: Optional[str] = None):
         # wrap into function
+        backend = backend or self.backend
         self.load_metadata()
         self.features = self.metadata["data"]["features"]
         self.model_name = self.metadata["model"]["name"]
         self.path_model = os.path.join(self.path_model_folder, self.model_name)
-        self.load_model()
+
+        if backend == "numpy":
+            self.load_tree_ensemble()
+        elif backend == "xgboost":
+            self.load_model()
+        else:
+            raise Exception(f"unknown predictor backend: {backend}")
         return self.metadata
 
     def load_model(self) -> None:
@@ -70,14 +102,31 @@ class ModelLoader:
         """
         logger.info(f"loading model from {self.path_model}")
         try:
+            # unpickling imports the model library, e.g. xgboost
             with open(self.path_model, "rb") as handle:
-                self.estimator = pickle.load(handle)
+                with startup_profiler.phase("unpickle"):
+                    self.estimator = pickle.load(handle)
         except FileNotFoundError:
             raise Exception("Model not found!")
         logger.info("Model loaded")
 
         return
 
+    def load_tree_ensemble(self) -> None:
+        """Load the exported trees of the model, older models without exported
+        trees are exported from the pickled model once"""
+        path_trees = os.path.join(self.path_model_folder, TreeEnsemble.file_name)
+
+        if not os.path.exists(path_trees):
+            logger.info(f"exporting the trees of {self.path_model}")
+            self.load_model()
+            TreeEnsemble.from_xgboost(self.estimator).save(path_trees)
+
+        logger.info(f"loading trees from {path_trees}")
+        with startup_profiler.phase("load_trees"):
+            self.estimator = TreeEnsemble.load(path_trees)
+        logger.info("Model loaded")
+
     def load_metadata(self) -> None:
         """Load the metadata of the model
 
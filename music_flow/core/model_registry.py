@@ -1,23 +1,76 @@
+import hashlib
+import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from typing import Optional
 
-import boto3
-from botocore.exceptions import ClientError
+from music_flow.config import model_settings, settings
+from music_flow.core.model_finder import get_latest_folder, select_best_score_folder
+from music_flow.core.startup_profiler import lazy_import
+from music_flow.core.utils import path_results, read_json
 
-from music_flow.config import settings
-from music_flow.core.utils import path_results
+boto3 = lazy_import("boto3")
+boto3_transfer = lazy_import("boto3.s3.transfer")
+botocore_exceptions = lazy_import("botocore.exceptions")
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.StreamHandler())
 logger.setLevel(logging.DEBUG)
 
 
+def get_md5(path: str, chunk_size: int = 8 * 1024 * 1024) -> str:
+    """md5 hex digest of a file"""
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def get_multipart_etag(path: str, chunk_size: int) -> str:
+    """ETag that s3 assigns to a file uploaded in parts of `chunk_size` bytes"""
+    part_digests = []
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            part_digests.append(hashlib.md5(chunk).digest())
+    return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+
 class ModelRegistry:
-    """Model Registry class, uploads and downloads models to a s3 bucket"""
+    """Model Registry class, uploads and downloads models to a s3 bucket
+
+    Every uploaded folder has a manifest, which lists the key, size, md5
+    checksum and role of each file, and an entry in the registry index with the
+    scores of the model. A download reads the manifest with a single request and
+    fetches only the files that the predictor backend loads. The files are
+    transferred concurrently, large files in multiple parts. Downloaded files
+    are verified before they replace the local copy, local copies that are
+    intact are not downloaded again.
+    """
+
+    manifest_file = "manifest.json"
+    index_file = "index.json"
+    roles = {
+        "model.pickle": "model",
+        "model.npz": "trees",
+        "metadata.json": "metadata",
+    }
+    # files that are loaded by each predictor backend
+    backend_files = {
+        "xgboost": ["model.pickle", "metadata.json"],
+        "numpy": ["model.npz", "metadata.json"],
+    }
 
     def __init__(
-        self, bucket_name: str, path_registry: str = None, path_upload: str = None
+        self,
+        bucket_name: str,
+        path_registry: str = None,
+        path_upload: str = None,
+        s3_client=None,
+        max_workers: int = settings.REGISTRY_MAX_WORKERS,
+        backend: str = model_settings.PREDICTOR_BACKEND,
     ):
         self.bucket_name = bucket_name
 
@@ -31,29 +84,160 @@ class ModelRegistry:
         else:
             self.path_results = path_upload
 
-        self.files_to_download = ["model.pickle", "metadata.json"]
+        if backend not in self.backend_files:
+            raise Exception(f"unknown predictor backend: {backend}")
+        self.files_to_download = self.backend_files[backend]
+        self.client = s3_client
+        self.max_workers = max_workers
+
+    @property
+    def s3_client(self):
+        """the boto3 s3 client, created on first use"""
+        if self.client is None:
+            self.client = boto3.client("s3")
+        return self.client
+
+    def get_transfer_config(self):
+        return boto3_transfer.TransferConfig(
+            multipart_threshold=settings.REGISTRY_MULTIPART_THRESHOLD,
+            multipart_chunksize=settings.REGISTRY_MULTIPART_CHUNKSIZE,
+            max_concurrency=self.max_workers,
+        )
+
+    def get_role(self, file: str) -> str:
+        return self.roles.get(os.path.basename(file), "artifact")
+
+    def create_manifest(self, path_folder: str, folder_name: str, files: list[str]):
+        """create the manifest of the files relative to the folder"""
+        entries = []
+        for file in sorted(files):
+            path_file = os.path.join(path_folder, file)
+            file = file.replace("\\", "/")
+            entries.append(
+                {
+                    "key": f"{folder_name}/{file}",
+                    "path": file,
+                    "size": os.path.getsize(path_file),
+                    "md5": get_md5(path_file),
+                    "role": self.get_role(file),
+                }
+            )
+        return {
+            "folder": folder_name,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "files": entries,
+        }
+
+    def write_manifest(self, path_folder: str, manifest: dict) -> str:
+        """write the manifest atomically, it marks the folder as complete"""
+        path_manifest = os.path.join(path_folder, self.manifest_file)
+        path_tmp = f"{path_manifest}.part"
+        with open(path_tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(path_tmp, path_manifest)
+        return path_manifest
+
+    def read_object(self, key: str) -> Optional[dict]:
+        """read a json object of the bucket, None if it does not exist"""
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+        except botocore_exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+        return json.loads(response["Body"].read())
+
+    def write_object(self, key: str, data: dict) -> None:
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=json.dumps(data, indent=4).encode("UTF-8"),
+            ContentType="application/json",
+        )
+
+    def read_index(self) -> dict:
+        """read the registry index with an entry per model folder"""
+        index = self.read_object(self.index_file)
+        return index if index is not None else {"folders": {}}
+
+    def update_index(self, folder_name: str, manifest: dict, path_folder: str) -> None:
+        """add the folder with the scores of the model to the registry index"""
+        try:
+            metadata = read_json(os.path.join(path_folder, "metadata.json"))
+        except FileNotFoundError:
+            metadata = {}
+        model = metadata.get("model", {})
+
+        index = self.read_index()
+        index["folders"][folder_name] = {
+            "manifest": f"{folder_name}/{self.manifest_file}",
+            "created_at": manifest["created_at"],
+            "model_version": model.get("model_version"),
+            "score": model.get("score", {}),
+        }
+        self.write_object(self.index_file, index)
+
+    def find_folder(self, mode: str = "latest", metric: Optional[str] = None) -> str:
+        """find the latest or best scoring model folder in the registry index
+
+        Args:
+            mode (str, optional): "latest" or "best_score". Defaults to "latest".
+            metric (Optional[str], optional): metric of the best score. Defaults to None.
+
+        Returns:
+            str: name of the model folder
+        """
+        folders = self.read_index()["folders"]
+        if mode == "latest":
+            return get_latest_folder(list(folders))
+        elif mode == "best_score":
+            scores = {
+                folder: entry["score"]
+                for folder, entry in folders.items()
+                if metric in entry["score"]
+            }
+            return select_best_score_folder(scores, metric)
+        raise ValueError("Mode not found - options: latest, best_score")
+
+    def upload_file(self, path_file: str, s3_object_name: str) -> None:
+        logger.info(f"upload: {s3_object_name}")
+        try:
+            self.s3_client.upload_file(
+                path_file,
+                self.bucket_name,
+                s3_object_name,
+                ExtraArgs={"Metadata": {"md5": get_md5(path_file)}},
+                Config=self.get_transfer_config(),
+            )
+        except botocore_exceptions.ClientError as e:
+            logger.error(f"upload of {s3_object_name} failed: {e}")
+            raise
 
     def upload_folder(
         self, folder_name: str, exclude_folders: Optional[list[str]] = None
     ):
-        """upload local folder to s3 bucket folder
+        """upload local folder to s3 bucket folder, the files are uploaded
+        concurrently, then the manifest and the registry index. If a file fails,
+        neither the manifest nor the index are written, so that the folder is not
+        published as complete
 
         Args:
             folder_name (str): _description_
             exclude_folders (Optional[list[str]], optional): _description_. Defaults to None.
+
+        Raises:
+            Exception: if a file could not be uploaded
         """
         path_upload = os.path.join(self.path_results, folder_name)
 
-        s3_resource = boto3.resource("s3")
-        s3_bucket = s3_resource.Bucket(self.bucket_name)
-
         if not exclude_folders:
             exclude_folders = ["logs", "plots", "results"]
 
         folder_name = path_upload.split("/")[-1]
         logger.debug(f"folder_name: {folder_name}")
 
-        for path, _, files in os.walk(path_upload):
+        files = []
+        for path, _, file_names in os.walk(path_upload):
             path = path.replace("\\", "/")
             directory_name = path.replace(path_upload, "")
 
@@ -61,52 +245,216 @@ class ModelRegistry:
                 logger.debug(f"Skipping: {directory_name}")
                 continue
 
-            for file in files:
-                local_file_name = os.path.join(path, file)
-                s3_object_name = f"{folder_name}{directory_name}/{file}"
-                logger.info(f"upload: {s3_object_name}")
-                try:
-                    s3_bucket.upload_file(local_file_name, s3_object_name)  # type: ignore
-                except ClientError as e:
-                    print(e)
+            for file in file_names:
+                if file == self.manifest_file and not directory_name:
+                    continue
+                files.append(os.path.relpath(os.path.join(path, file), path_upload))
+
+        manifest = self.create_manifest(path_upload, folder_name, files)
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                list(
+                    executor.map(
+                        self.upload_file,
+                        [
+                            os.path.join(path_upload, entry["path"])
+                            for entry in manifest["files"]
+                        ],
+                        [entry["key"] for entry in manifest["files"]],
+                    )
+                )
+        except Exception as e:
+            logger.error(f"upload of {folder_name} failed, not published: {e}")
+            raise
+
+        # the manifest is uploaded last, a folder with a manifest is complete
+        self.write_manifest(path_upload, manifest)
+        self.write_object(f"{folder_name}/{self.manifest_file}", manifest)
+        self.update_index(folder_name, manifest, path_upload)
+
+    def get_required_files(self, file_names: set[str]) -> set[str]:
+        """names of the files of a folder that are needed to serve the model, the
+        trees of a model that was uploaded before they were exported are exported
+        from the pickled model, see `ModelLoader.load_tree_ensemble`"""
+        required_files = set(self.files_to_download)
+        if "model.npz" in required_files and "model.npz" not in file_names:
+            required_files = required_files - {"model.npz"} | {"model.pickle"}
+        return required_files
+
+    def select_files(self, files: list[str]) -> list[str]:
+        """the files of a folder that are downloaded"""
+        required_files = self.get_required_files(
+            {os.path.basename(file) for file in files}
+        )
+        return [file for file in files if os.path.basename(file) in required_files]
+
+    def list_files(self, folder_name: str) -> list[dict]:
+        """list the objects of the s3 bucket folder that are downloaded"""
+        prefix = folder_name.rstrip("/") + "/"
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+
+        s3_objects = []
+        for result in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for s3_object in result.get("Contents", []):
+                key = s3_object["Key"]
+                if key.endswith("/"):
+                    continue
+                s3_objects.append(s3_object)
+
+        keys = self.select_files([s3_object["Key"] for s3_object in s3_objects])
+        return [s3_object for s3_object in s3_objects if s3_object["Key"] in keys]
+
+    def is_intact(self, path: str, s3_object: dict) -> bool:
+        """check a local file against the ETag or the stored checksum of the object
+
+        Args:
+            path (str): path of the local file
+            s3_object (dict): object of the bucket listing
+
+        Returns:
+            bool: True if the local file is the same as the object
+        """
+        if not os.path.exists(path) or os.path.getsize(path) != s3_object["Size"]:
+            return False
+
+        etag = s3_object["ETag"].strip('"')
+        if "-" not in etag:
+            return get_md5(path) == etag
+
+        # the ETag of a multipart upload is not the md5 of the file
+        response = self.s3_client.head_object(
+            Bucket=self.bucket_name, Key=s3_object["Key"]
+        )
+        md5 = response.get("Metadata", {}).get("md5")
+        if md5:
+            return get_md5(path) == md5
+        return get_multipart_etag(path, settings.REGISTRY_MULTIPART_CHUNKSIZE) == etag
+
+    def is_intact_file(self, path: str, entry: dict) -> bool:
+        """check a local file against the size and checksum of the manifest"""
+        return (
+            os.path.exists(path)
+            and os.path.getsize(path) == entry["size"]
+            and get_md5(path) == entry["md5"]
+        )
+
+    def download_file(self, s3_object: dict, is_intact) -> str:
+        """download an object, unless the local copy is intact
+
+        The object is downloaded into a temporary file, which replaces the local
+        copy only once it is verified, so that no partial file is left behind.
+
+        Args:
+            s3_object (dict): object with the "Key"
+            is_intact (Callable[[str, dict], bool]): check of a local file
+
+        Raises:
+            Exception: if the downloaded file does not match the checksum
+
+        Returns:
+            str: path of the local copy
+        """
+        key = s3_object["Key"]
+        path_destination = os.path.join(self.path_registry, key)
+
+        if is_intact(path_destination, s3_object):
+            logger.debug(f"local copy is intact: {path_destination}")
+            return path_destination
+
+        os.makedirs(os.path.dirname(path_destination), exist_ok=True)
+        path_tmp = f"{path_destination}.part"
+        self.s3_client.download_file(
+            self.bucket_name, key, path_tmp, Config=self.get_transfer_config()
+        )
+
+        if not is_intact(path_tmp, s3_object):
+            os.remove(path_tmp)
+            raise Exception(f"checksum mismatch of the downloaded file: {key}")
+
+        os.replace(path_tmp, path_destination)
+        logger.debug(f"download successful!: {path_destination}")
+        return path_destination
 
     def download_folder(self, folder_name: str):
-        """download s3 folder to local path
+        """download the files of a s3 bucket folder that are needed to serve the
+        model, the local manifest is written once all files are verified
+
+        Folders that were uploaded without a manifest are listed and verified
+        against the ETags instead.
 
         Args:
             folder_name (str): _description_
         """
-        s3_client = boto3.client("s3")
-        s3_resource = boto3.resource("s3")
-        paginator = s3_client.get_paginator("list_objects")
+        folder_name = folder_name.rstrip("/")
+        manifest = self.read_object(f"{folder_name}/{self.manifest_file}")
 
-        for result in paginator.paginate(
-            Bucket=self.bucket_name, Delimiter="/", Prefix=folder_name
-        ):
-            if result.get("CommonPrefixes"):
-                for subdir in result.get("CommonPrefixes"):
-                    logger.debug(f"subdir: {subdir}")
+        if manifest is not None:
+            paths = self.select_files([entry["path"] for entry in manifest["files"]])
+            entries = [entry for entry in manifest["files"] if entry["path"] in paths]
+            s3_objects = [dict(entry, Key=entry["key"]) for entry in entries]
+            is_intact = self.is_intact_file
+        else:
+            logger.info(f"no manifest found, listing the folder: {folder_name}")
+            s3_objects = self.list_files(folder_name)
+            is_intact = self.is_intact
 
-                    self.download_folder(subdir.get("Prefix"))
+        if not s3_objects:
+            raise Exception(f"model folder not found in the registry: {folder_name}")
 
-            for file in result.get("Contents", []):
-                file_path = file.get("Key")
-                logger.debug(f"file_path: {file_path}")
-                path_destination = os.path.join(self.path_registry, file_path)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            paths = list(
+                executor.map(
+                    self.download_file, s3_objects, [is_intact] * len(s3_objects)
+                )
+            )
 
-                if os.path.basename(path_destination) not in self.files_to_download:
-                    continue
+        path_folder = os.path.join(self.path_registry, folder_name)
+        files = [os.path.relpath(path, path_folder) for path in paths]
+        local_manifest = self.create_manifest(path_folder, folder_name, files)
+        self.write_manifest(path_folder, local_manifest)
 
-                if not os.path.exists(os.path.dirname(path_destination)):
-                    os.makedirs(os.path.dirname(path_destination))
+    def is_complete(self, folder_name: str, is_verify_checksums: bool = False) -> bool:
+        """check if the local copy of a folder is complete, without requests to
+        the s3 bucket
 
-                logger.debug(f"path_destination: {path_destination}")
+        The local manifest is only written once all files were downloaded and
+        verified, so the files are checked by their size, which does not read
+        the model on startup. A folder without a manifest, e.g. a model that was
+        trained or copied locally, is complete if the files of the backend exist.
 
-                if not file.get("Key").endswith("/"):
-                    s3_resource.meta.client.download_file(
-                        self.bucket_name, file.get("Key"), path_destination
-                    )
-                    logger.debug(f"download successful!: {path_destination}")
+        Args:
+            folder_name (str): name of the model folder
+            is_verify_checksums (bool, optional): check the md5 checksums of the
+                files as well. Defaults to False.
+
+        Returns:
+            bool: True if all files of the local manifest exist and match
+        """
+        path_folder = os.path.join(self.path_registry, folder_name)
+        try:
+            manifest = read_json(os.path.join(path_folder, self.manifest_file))
+        except FileNotFoundError:
+            try:
+                file_names = set(os.listdir(path_folder))
+            except FileNotFoundError:
+                return False
+            return self.get_required_files(file_names) <= file_names
+        except ValueError:
+            return False
+
+        for entry in manifest["files"]:
+            path_file = os.path.join(path_folder, entry["path"])
+            if is_verify_checksums:
+                is_intact = self.is_intact_file(path_file, entry)
+            else:
+                is_intact = (
+                    os.path.exists(path_file)
+                    and os.path.getsize(path_file) == entry["size"]
+                )
+            if not is_intact:
+                logger.info(f"local copy is incomplete or corrupt: {path_file}")
+                return False
+        return True
 
 
 if __name__ == "__main__":
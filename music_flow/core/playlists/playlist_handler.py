@@ -1,9 +1,25 @@
+from typing import Optional
+
 import requests
 
+from music_flow.config import settings
+from music_flow.core.spotify_token import token_manager
+
 
 class PlaylistHandler:
-    def __init__(self, headers):
-        self.headers = headers
+    def __init__(self, headers: Optional[dict] = None):
+        """
+        Args:
+            headers (Optional[dict], optional): fixed request headers, e.g. with a
+                user token. Defaults to the shared client credentials token.
+        """
+        self.fixed_headers = headers
+
+    @property
+    def headers(self) -> dict:
+        if self.fixed_headers:
+            return self.fixed_headers
+        return token_manager.get_headers()
 
     def get_request(self, url: str):
         response = requests.get(url=url, headers=self.headers)
@@ -18,17 +34,17 @@ class PlaylistHandler:
 
     def get_playlists(self, user_id):
         # Second step – make a request tox any of the playlists endpoint. Make sure to set a valid value for <spotify_user>.
-        url = f"https://api.spotify.com/v1/users/{user_id}/playlists"
+        url = f"{settings.SPOTIFY_API_URL}/users/{user_id}/playlists"
         response, status_code = self.get_request(url)
         return response, status_code
 
     def get_playlist_items(self, playlist_id, limit=100, offset=0):
-        url = f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks?limit={limit}&offset={offset}"
+        url = f"{settings.SPOTIFY_API_URL}/playlists/{playlist_id}/tracks?limit={limit}&offset={offset}"
         response, status_code = self.get_request(url)
         return response, status_code
 
     def create_playlist(self, user_id, params):
-        url = f"https://api.spotify.com/v1/users/{user_id}/playlists"
+        url = f"{settings.SPOTIFY_API_URL}/users/{user_id}/playlists"
         response, status_code = self.get_post(url, params)
         return response, status_code
 
@@ -36,6 +52,6 @@ class PlaylistHandler:
         uris = [f"spotify:track:{track_id}" for track_id in track_ids]
         params = {"uris": uris}
 
-        url = f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks"
+        url = f"{settings.SPOTIFY_API_URL}/playlists/{playlist_id}/tracks"
         response, status_code = self.get_post(url, params=params)
         return response, status_code
@@ -1,15 +1,11 @@
 import logging
 from typing import Optional
 
-import pandas as pd
-
-from music_flow.config import settings
+from music_flow.config import model_settings, settings
+from music_flow.core.features.feature_encoder import FeatureEncoder
 from music_flow.core.features.get_formatted_features import get_formatted_features
 from music_flow.core.features.get_raw_features import get_raw_features
-from music_flow.core.features.preprocessing import (
-    feature_preprocessing,
-    reverse_prediction,
-)
+from music_flow.core.features.preprocessing import reverse_prediction
 from music_flow.core.model_loader import ModelLoader
 
 logger = logging.getLogger(__name__)
@@ -25,16 +21,20 @@ class Predictor:
         metric=None,
         path=None,
         path_registry=None,
+        backend=model_settings.PREDICTOR_BACKEND,
     ):
         model_loader = ModelLoader(
             model_folder=model_folder,
             mode=mode,
             metric=metric,
             path_registry=path_registry,
+            backend=backend,
         )
-        self.metadata = model_loader.load()
+        self.model_folder = model_loader.model_folder
+        self.metadata = model_loader.load(backend=backend)
         self.features = model_loader.get_features()
         self.estimator = model_loader.get_estimator()
+        self.encoder = FeatureEncoder(self.features)
         self.model_version = self.get_model_version()
 
     def get_metdata(self):
@@ -96,17 +96,49 @@ class Predictor:
         return data_response
 
     def predict_from_features(self, features: dict) -> float:
-        # TODO: remove pandas dependency
-        sample = pd.DataFrame(features, index=[0])
-        sample["plays"] = 0
+        """Predict the number of streams from the formatted features of a song
+
+        Args:
+            features (dict): flattened features from `get_formatted_features`
 
-        sample_formated = feature_preprocessing(sample)
-        input_sample = sample_formated[self.features]
+        Returns:
+            float: predicted number of streams
+        """
+        input_sample = self.encoder.transform(features)
 
         scaled_prediction = self.estimator.predict(input_sample)
         prediction = reverse_prediction(scaled_prediction)
         return float(prediction[0])
 
+    def warm_up(self) -> float:
+        """Predict a sample with all features set to zero, so that the first
+        request does not pay for the lazy initialization of the estimator
+
+        Returns:
+            float: prediction of the sample
+        """
+        features = {name: 0 for name in self.features}
+        features["key"] = 0
+        return self.predict_from_features(features)
+
+    def predict_from_features_batch(self, samples: list[dict]) -> list[float]:
+        """Predict the number of streams for multiple songs with a single model call
+
+        Args:
+            samples (list[dict]): flattened features from `get_formatted_features`
+
+        Returns:
+            list[float]: predicted number of streams per song
+        """
+        if not samples:
+            return []
+
+        input_samples = self.encoder.transform_batch(samples)
+
+        scaled_predictions = self.estimator.predict(input_samples)
+        predictions = reverse_prediction(scaled_predictions)
+        return [float(prediction) for prediction in predictions]
+
 
 if __name__ == "__main__":
     model_folder = "2023-01-21--12-33-25"
@@ -0,0 +1,383 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+from music_flow.config import settings
+
+# status codes with which Spotify asks to slow down
+throttle_status_codes = [429, 503]
+
+
+class RequestLimiter(ABC):
+    """Base class of the limiters of the Spotify requests
+
+    A request takes a lease with `acquire` and returns it with `release` and the
+    status code of the response, so that the limiter can adapt to the responses.
+    """
+
+    throttled = 0
+
+    @abstractmethod
+    def try_acquire(self) -> tuple[Any, float]:
+        """take a lease if a request is allowed
+
+        Returns:
+            tuple[Any, float]: the lease or None, and the seconds to wait before
+                trying again
+        """
+
+    def acquire(self) -> Any:
+        """block until a request is allowed"""
+        while True:
+            lease, wait_time = self.try_acquire()
+            if lease is not None:
+                return lease
+            time.sleep(wait_time)
+
+    async def acquire_async(self) -> Any:
+        """wait without blocking the event loop until a request is allowed"""
+        while True:
+            lease, wait_time = self.try_acquire()
+            if lease is not None:
+                return lease
+            await asyncio.sleep(wait_time)
+
+    @abstractmethod
+    def release(
+        self, lease: Any, status_code: Optional[int], retry_after: float = 1.0
+    ) -> None:
+        """return the lease of a request
+
+        Args:
+            lease (Any): lease of `acquire`
+            status_code (Optional[int]): status code of the response, None if the
+                request failed without a response
+            retry_after (float, optional): Retry-After of a 429 or 503 response.
+        """
+
+
+class TokenBucket(RequestLimiter):
+    """Thread-safe token bucket that limits the request rate of all threads
+
+    The bucket holds up to `capacity` tokens and is refilled with `rate` tokens
+    per second, every request takes one token. After a 429 response the bucket
+    is paused for the Retry-After of the response, so that all threads wait
+    instead of only the one that was throttled.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate (float): requests per second
+            capacity (Optional[float], optional): maximum burst of requests.
+                Defaults to one second of requests.
+        """
+        if rate <= 0:
+            raise Exception("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+        self.throttled = 0
+
+    def refill(self, now: float) -> None:
+        elapsed = max(now - self.updated_at, 0)
+        self.tokens = min(self.tokens + elapsed * self.rate, self.capacity)
+        self.updated_at = now
+
+    def get_wait_time(self) -> float:
+        """take a token if one is available, otherwise the seconds to wait"""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+
+            self.refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def try_acquire(self) -> tuple[Any, float]:
+        wait_time = self.get_wait_time()
+        if wait_time <= 0:
+            return time.monotonic(), 0.0
+        return None, wait_time
+
+    def release(
+        self, lease: Any, status_code: Optional[int], retry_after: float = 1.0
+    ) -> None:
+        if status_code in throttle_status_codes:
+            self.pause(retry_after)
+
+    def pause(self, seconds: float) -> None:
+        """stop all requests for `seconds`, e.g. the Retry-After of a 429"""
+        with self.lock:
+            self.throttled += 1
+            now = time.monotonic()
+            self.paused_until = max(self.paused_until, now + seconds)
+            # no burst of the tokens that were saved up during the pause
+            self.tokens = 0.0
+            self.updated_at = self.paused_until
+
+
+class AIMDPolicy:
+    """Additive increase, multiplicative decrease of a concurrency limit
+
+    While the responses are healthy and the limit is reached, the limit is
+    raised by `increase` per `increase_interval` seconds, until the first 429 it
+    is doubled instead (slow start). The rate limit of Spotify is counted over
+    a rolling window, so the limit is raised per time instead of per response,
+    which would overshoot before the first 429. A 429
+    or 503 multiplies the limit by `decrease` and pauses all requests for the
+    Retry-After. Requests that were already in flight when the limit was cut do
+    not cut it again, so that a burst of 429s counts as one.
+    """
+
+    def __init__(
+        self,
+        min_limit: float = settings.SPOTIFY_CONCURRENCY_MIN,
+        max_limit: float = settings.SPOTIFY_CONCURRENCY_MAX,
+        initial_limit: float = settings.SPOTIFY_CONCURRENCY_INITIAL,
+        increase: float = 1.0,
+        increase_interval: float = 2.0,
+        decrease: float = 0.7,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.initial_limit = min(max(initial_limit, min_limit), max_limit)
+        self.increase = increase
+        self.increase_interval = increase_interval
+        self.decrease = decrease
+
+    def get_initial_state(self) -> dict:
+        return {
+            "limit": self.initial_limit,
+            "paused_until": 0.0,
+            "decreased_at": 0.0,
+            "increased_at": 0.0,
+        }
+
+    def update(
+        self,
+        state: dict,
+        now: float,
+        acquired_at: float,
+        in_flight: int,
+        status_code: Optional[int],
+        retry_after: float,
+    ) -> None:
+        """update the state with the response of a request
+
+        Args:
+            state (dict): limit, paused_until, decreased_at and increased_at
+            now (float): time of the response
+            acquired_at (float): time at which the request was allowed
+            in_flight (int): requests in flight, including this one
+            status_code (Optional[int]): status code, None without a response
+            retry_after (float): Retry-After of a 429 or 503
+        """
+        if status_code in throttle_status_codes:
+            state["paused_until"] = max(state["paused_until"], now + retry_after)
+            if acquired_at >= state["decreased_at"]:
+                state["limit"] = max(state["limit"] * self.decrease, self.min_limit)
+                state["decreased_at"] = now
+                state["increased_at"] = state["paused_until"]
+            return
+
+        if status_code is None or status_code >= 500:
+            return
+
+        # the limit is only raised while it limits the requests
+        is_limited = in_flight >= int(state["limit"])
+        if is_limited and now - state["increased_at"] >= self.increase_interval:
+            if state["decreased_at"]:
+                limit = state["limit"] + self.increase
+            else:
+                limit = state["limit"] * 2
+            state["limit"] = min(limit, self.max_limit)
+            state["increased_at"] = now
+
+
+class AdaptiveLimiter(RequestLimiter):
+    """AIMD limit of the concurrent requests of the threads of a process, see
+    `AIMDPolicy`"""
+
+    def __init__(
+        self, policy: Optional[AIMDPolicy] = None, poll_interval: float = 0.005
+    ):
+        self.policy = policy or AIMDPolicy()
+        self.state = self.policy.get_initial_state()
+        self.poll_interval = poll_interval
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.throttled = 0
+
+    @property
+    def limit(self) -> float:
+        return self.state["limit"]
+
+    def try_acquire(self) -> tuple[Any, float]:
+        with self.lock:
+            now = time.monotonic()
+            if now < self.state["paused_until"]:
+                return None, self.state["paused_until"] - now
+            if self.in_flight >= int(self.state["limit"]):
+                return None, self.poll_interval
+            self.in_flight += 1
+            return now, 0.0
+
+    def release(
+        self, lease: Any, status_code: Optional[int], retry_after: float = 1.0
+    ) -> None:
+        with self.lock:
+            self.policy.update(
+                self.state,
+                time.monotonic(),
+                lease,
+                self.in_flight,
+                status_code,
+                retry_after,
+            )
+            self.in_flight -= 1
+            if status_code in throttle_status_codes:
+                self.throttled += 1
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "limit": self.state["limit"],
+                "in_flight": self.in_flight,
+                "throttled": self.throttled,
+            }
+
+
+class SharedAdaptiveLimiter(RequestLimiter):
+    """AIMD limit of the concurrent requests of all processes on a host
+
+    The same limit as `AdaptiveLimiter`, with the state and the leases of the
+    requests in flight stored in a SQLite database, so that e.g. several
+    download processes share one budget. The leases expire after
+    `lease_timeout` seconds, so that a crashed process does not hold its slots.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        policy: Optional[AIMDPolicy] = None,
+        poll_interval: float = 0.01,
+        lease_timeout: float = 60.0,
+    ):
+        self.path = path
+        self.policy = policy or AIMDPolicy()
+        self.poll_interval = poll_interval
+        self.lease_timeout = lease_timeout
+        self.lock = threading.Lock()
+        self.throttled = 0
+
+        self.connection = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        with self.transaction():
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value REAL)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS leases (id INTEGER PRIMARY KEY "
+                "AUTOINCREMENT, pid INTEGER, acquired_at REAL, expires_at REAL)"
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO state VALUES (?, ?)",
+                self.policy.get_initial_state().items(),
+            )
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """a write transaction, that is serialized with the other processes"""
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def read_state(self) -> dict:
+        return dict(self.connection.execute("SELECT key, value FROM state"))
+
+    def count_leases(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM leases").fetchone()[0]
+
+    @property
+    def limit(self) -> float:
+        with self.lock:
+            return self.read_state()["limit"]
+
+    def try_acquire(self) -> tuple[Any, float]:
+        now = time.time()
+        with self.transaction():
+            self.connection.execute("DELETE FROM leases WHERE expires_at < ?", (now,))
+            state = self.read_state()
+            if now < state["paused_until"]:
+                return None, state["paused_until"] - now
+            if self.count_leases() >= int(state["limit"]):
+                return None, self.poll_interval
+
+            cursor = self.connection.execute(
+                "INSERT INTO leases (pid, acquired_at, expires_at) VALUES (?, ?, ?)",
+                (os.getpid(), now, now + self.lease_timeout),
+            )
+            return (cursor.lastrowid, now), 0.0
+
+    def release(
+        self, lease: Any, status_code: Optional[int], retry_after: float = 1.0
+    ) -> None:
+        lease_id, acquired_at = lease
+        with self.transaction():
+            state = self.read_state()
+            self.policy.update(
+                state,
+                time.time(),
+                acquired_at,
+                self.count_leases(),
+                status_code,
+                retry_after,
+            )
+            self.connection.execute("DELETE FROM leases WHERE id = ?", (lease_id,))
+            self.connection.executemany(
+                "UPDATE state SET value = ? WHERE key = ?",
+                [(value, key) for key, value in state.items()],
+            )
+            if status_code in throttle_status_codes:
+                self.throttled += 1
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "limit": self.read_state()["limit"],
+                "in_flight": self.count_leases(),
+                "throttled": self.throttled,
+            }
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+
+def create_limiter() -> RequestLimiter:
+    """the limiter of the Spotify requests of the downloads of the process,
+    shared with the other processes of the host if SPOTIFY_LIMITER_PATH is set"""
+    if settings.SPOTIFY_LIMITER_PATH:
+        return SharedAdaptiveLimiter(settings.SPOTIFY_LIMITER_PATH)
+    return AdaptiveLimiter()
+
+
+spotify_limiter = create_limiter()
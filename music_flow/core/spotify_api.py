@@ -1,53 +1,82 @@
-import json
 import logging
-import os
 import time
+from typing import Optional
 
 import requests
-from dotenv import load_dotenv
 from requests.adapters import HTTPAdapter
 from requests.utils import requote_uri
 from urllib3.util.retry import Retry
 
-from music_flow.core.utils import path_env
+from music_flow.config import settings
+from music_flow.core.rate_limiter import RequestLimiter
+from music_flow.core.spotify_token import SpotifyTokenManager, token_manager
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.StreamHandler())
 logger.setLevel(logging.DEBUG)
 
-load_dotenv(path_env)
-
-CLIENT_ID = os.getenv("CLIENT_ID")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-
-if not CLIENT_ID or not CLIENT_SECRET:
-    raise Exception("CLIENT_ID or CLIENT_SECRET not set in .env file")
-
 status_codes = []
 
 
 class SpotifyAPI:
-    def __init__(self):
-        self.headers = self.get_headers()
-        retry = Retry(connect=1, backoff_factor=0.5)
-        self.adapter = HTTPAdapter(max_retries=retry)
-
-    def get_headers(self):
-        grant_type = "client_credentials"
-        body_params = {"grant_type": grant_type}
-        auth = (CLIENT_ID, CLIENT_SECRET)
+    def __init__(
+        self,
+        pool_size: int = settings.SPOTIFY_MAX_CONNECTIONS,
+        max_retries: int = settings.SPOTIFY_CONNECT_RETRIES,
+        token: SpotifyTokenManager = token_manager,
+        rate_limiter: Optional[RequestLimiter] = None,
+    ):
+        """Setup a long-lived session, so that the connections to the Spotify API
+        are kept alive and reused across requests.
 
-        url = "https://accounts.spotify.com/api/token"
-        response = requests.post(url, data=body_params, auth=auth, verify=True)  # type: ignore
-
-        if response.status_code != 200:
-            print("bad credentials")
-            print(response)
-            exit(1)
+        Args:
+            pool_size (int, optional): maximum number of connections kept per host.
+            max_retries (int, optional): number of retries on connection errors.
+            token (SpotifyTokenManager, optional): access token manager, shared by
+                all clients of the process by default.
+            rate_limiter (Optional[RequestLimiter], optional): limits the
+                requests, e.g. the adaptive limit of the downloads. Defaults
+                to None, the requests are not limited.
+        """
+        # 429 and 503 responses are retried in `get_request`, after the
+        # Retry-After, instead of by urllib3
+        retry = Retry(
+            connect=max_retries, backoff_factor=0.5, respect_retry_after_header=False
+        )
+        self.adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        # e.g. a local stand-in of the Spotify API, see SPOTIFY_API_URL
+        self.session.mount("http://", self.adapter)
+        self.token_manager = token
+        self.rate_limiter = rate_limiter
+
+    @property
+    def headers(self) -> dict:
+        return self.get_headers()
+
+    def get_headers(self) -> dict:
+        """The token is fetched on first use and refreshed before it expires"""
+        return self.token_manager.get_headers()
 
-        token = json.loads(response.text)["access_token"]
-        headers = {"Authorization": f"Bearer {token}"}
-        return headers
+    @staticmethod
+    def get_retry_after(response: requests.Response) -> int:
+        return int(response.headers.get("Retry-After", 1))
+
+    def send(self, url: str) -> requests.Response:
+        """send a GET request within the limit of the rate limiter"""
+        if not self.rate_limiter:
+            return self.session.get(url=url, headers=self.headers)
+
+        lease = self.rate_limiter.acquire()
+        status_code, retry_after = None, 1
+        try:
+            response = self.session.get(url=url, headers=self.headers)
+            status_code = response.status_code
+            retry_after = self.get_retry_after(response)
+            return response
+        finally:
+            self.rate_limiter.release(lease, status_code, retry_after)
 
     def get_request(self, url: str, max_retries: int = 3, rate_limit: int = 1):
         """TODO: move to Base class
@@ -64,33 +93,37 @@ class SpotifyAPI:
         """
 
         retries = 0
+        is_token_refreshed = False
         start_time = time.time()
 
         while True:
-            with requests.Session() as session:
-                session.mount("https://", self.adapter)
-                response = session.get(url=url, headers=self.headers)
+            response = self.send(url)
 
             if response.status_code == 200 or response.status_code == 404:
                 return response.json(), response.status_code
 
+            if response.status_code == 401 and not is_token_refreshed:
+                # the token was revoked or expired early, fetch a new one
+                self.token_manager.invalidate()
+                is_token_refreshed = True
+                continue
+
             if response.status_code == 429 or response.status_code == 503:
                 if retries >= max_retries:
                     raise Exception("Rate limit exceeded after multiple retries.")
 
-                print(response)
-                print("retry")
-                retry_after = int(response.headers.get("Retry-After", 1))
-                logger.debug(retry_after)
-                print("retry_after", retry_after)
-
-                elapsed_time = time.time() - start_time
-
-                # Calculate the time to sleep based on the rate limit and elapsed time
-                sleep_time = (
-                    max(0, (retries + 1) / rate_limit - elapsed_time) + retry_after + 1
-                )
-                time.sleep("sleep_time", sleep_time / 60)
+                retry_after = self.get_retry_after(response)
+                logger.debug(f"{response.status_code}, retry after {retry_after}s")
+
+                if not self.rate_limiter:
+                    # otherwise all threads wait in the rate limiter until the
+                    # Retry-After has passed
+                    elapsed_time = time.time() - start_time
+                    # Calculate the time to sleep based on the rate limit and elapsed time
+                    sleep_time = (
+                        max(0, (retries + 1) / rate_limit - elapsed_time) + retry_after
+                    )
+                    time.sleep(sleep_time)
                 retries += 1
                 continue
 
@@ -105,39 +138,58 @@ class SpotifyAPI:
         if not params:
             params = {}
 
-        with requests.Session() as session:
-            session.mount("https://", self.adapter)
-            response = session.post(url=url, headers=self.headers, json=params)
+        response = self.session.post(url=url, headers=self.headers, json=params)
         return response.json(), response.status_code
 
+    def get_pool_stats(self) -> dict:
+        """Get the statistics of the connection pools of the session
+
+        Returns:
+            dict: number of requests, new connections and reused connections
+        """
+        pools = self.adapter.poolmanager.pools
+        num_requests = 0
+        num_connections = 0
+        for key in pools.keys():
+            pool = pools[key]
+            num_requests += pool.num_requests
+            num_connections += pool.num_connections
+
+        return {
+            "pools": len(pools),
+            "requests": num_requests,
+            "new_connections": num_connections,
+            "reused_connections": num_requests - num_connections,
+        }
+
     def get_playlists(self, user_id: str):
         # Second step – make a request tox any of the playlists endpoint. Make sure to set a valid value for <spotify_user>.
-        url = f"https://api.spotify.com/v1/users/{user_id}/playlists"
+        url = f"{settings.SPOTIFY_API_URL}/users/{user_id}/playlists"
         response, status_code = self.get_request(url)
         return response, status_code
 
     def get_playlist_items(self, playlist_id: str, limit=100, offset=0):
-        url = f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks?limit={limit}&offset={offset}"
+        url = f"{settings.SPOTIFY_API_URL}/playlists/{playlist_id}/tracks?limit={limit}&offset={offset}"
         response, status_code = self.get_request(url)
         return response, status_code
 
     def get_track_info(self, track, artist, limit=4):
-        url = f"https://api.spotify.com/v1/search?q=track:{track}%20artist:{artist}&limit={limit}&type=track"
+        url = f"{settings.SPOTIFY_API_URL}/search?q=track:{track}%20artist:{artist}&limit={limit}&type=track"
         response, status_code = self.get_request(url)
         return response, status_code
 
     def get_track(self, id: str):
-        url = f"https://api.spotify.com/v1/tracks/{id}"
+        url = f"{settings.SPOTIFY_API_URL}/tracks/{id}"
         response, status_code = self.get_request(url)
         return response, status_code
 
     def get_audio_features(self, id: str):
-        url = f"https://api.spotify.com/v1/audio-features/{id}"
+        url = f"{settings.SPOTIFY_API_URL}/audio-features/{id}"
         response, status_code = self.get_request(url)
         return response, status_code
 
     def get_albums(self, id: str):
-        url = f"https://api.spotify.com/v1/albums/{id}"
+        url = f"{settings.SPOTIFY_API_URL}/albums/{id}"
         response, status_code = self.get_request(url)
         return response, status_code
 
@@ -146,10 +198,10 @@ class SpotifyAPI:
         track = "" if not track else track
         track = self.clean_string(track)
         artist = self.clean_string(artist)
-        return f"https://api.spotify.com/v1/search?q=track:{track} artist:{artist}&type=track"
+        return f"{settings.SPOTIFY_API_URL}/search?q=track:{track} artist:{artist}&type=track"
 
     def get_audio_analysis(self, id: str):
-        url = f"https://api.spotify.com/v1/audio-analysis/{id}"
+        url = f"{settings.SPOTIFY_API_URL}/audio-analysis/{id}"
         response, status_code = self.get_request(url)
         return response, status_code
 
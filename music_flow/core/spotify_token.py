@@ -0,0 +1,93 @@
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+import requests
+from dotenv import load_dotenv
+
+from music_flow.config import settings
+from music_flow.core.utils import path_env
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.DEBUG)
+
+
+class SpotifyTokenManager:
+    """Process-wide manager of the Spotify API access token
+
+    The token is fetched lazily on first use with the client credentials flow
+    and cached together with its expiry time. It is refreshed shortly before it
+    expires, so that long running jobs keep working once the token lapses.
+    """
+
+    def __init__(self, refresh_margin: int = settings.SPOTIFY_TOKEN_REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self.url = f"{settings.SPOTIFY_ACCOUNTS_URL}/api/token"
+        self.lock = threading.Lock()
+        self.token: Optional[str] = None
+        self.expires_at: float = 0.0
+
+    @staticmethod
+    def get_credentials() -> tuple[str, str]:
+        """Load the client credentials from the environment or the .env file
+
+        Raises:
+            Exception: if the credentials are not set
+
+        Returns:
+            tuple[str, str]: client id and client secret
+        """
+        load_dotenv(path_env)
+        client_id = os.getenv("CLIENT_ID")
+        client_secret = os.getenv("CLIENT_SECRET")
+
+        if not client_id or not client_secret:
+            raise Exception("CLIENT_ID or CLIENT_SECRET not set in .env file")
+        return client_id, client_secret
+
+    def is_expired(self) -> bool:
+        """Check if the token is missing or about to expire"""
+        return (
+            self.token is None or time.time() >= self.expires_at - self.refresh_margin
+        )
+
+    def refresh(self) -> None:
+        """Fetch a new access token from the Spotify accounts service
+
+        Raises:
+            Exception: if the credentials are rejected
+        """
+        body_params = {"grant_type": "client_credentials"}
+        auth = self.get_credentials()
+
+        response = requests.post(self.url, data=body_params, auth=auth, verify=True)
+
+        if response.status_code != 200:
+            raise Exception(f"bad credentials - status code {response.status_code}")
+
+        data = response.json()
+        self.token = data["access_token"]
+        self.expires_at = time.time() + int(data.get("expires_in", 3600))
+        logger.debug("Spotify access token refreshed")
+
+    def get_token(self) -> str:
+        """Get a valid access token, fetch or refresh it if needed"""
+        if self.is_expired():
+            with self.lock:
+                # another thread might have refreshed the token in the meantime
+                if self.is_expired():
+                    self.refresh()
+        return self.token  # type: ignore
+
+    def get_headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.get_token()}"}
+
+    def invalidate(self) -> None:
+        """Force a refresh on the next request, e.g. after a 401 response"""
+        self.expires_at = 0.0
+
+
+token_manager = SpotifyTokenManager()
@@ -0,0 +1,119 @@
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+import types
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.INFO)
+
+
+def get_process_start() -> float:
+    """get the start of the process on the clock of `time.perf_counter`, so that
+    the imports before this module are included, if the start time is not
+    available (e.g. not on Linux), the current time is used"""
+    now = time.perf_counter()
+    try:
+        is_monotonic = (
+            "CLOCK_MONOTONIC" in time.get_clock_info("perf_counter").implementation
+        )
+        with open("/proc/self/stat") as f:
+            # the fields after the process name, the start time is the 22nd field
+            fields = f.read().rsplit(")", 1)[1].split()
+        start = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return now
+
+    if not is_monotonic or not 0 <= now - start < 60 * 60:
+        return now
+    return start
+
+
+class StartupProfiler:
+    """Timings of the startup phases and of the heavy imports
+
+    The timings are measured relative to the start of the process. Only the
+    first successful occurrence of a phase is recorded, so that the report shows
+    the cold start.
+    """
+
+    def __init__(self):
+        self.start = get_process_start()
+        self.lock = threading.Lock()
+        self.phases: dict[str, dict] = {}
+        self.imports: dict[str, float] = {}
+        self.ready_after: Optional[float] = None
+
+    def get_elapsed(self, since: Optional[float] = None) -> float:
+        """milliseconds since the start of the profiler or the given time"""
+        since = self.start if since is None else since
+        return round((time.perf_counter() - since) * 1000, 1)
+
+    def record_phase(self, name: str, start: float) -> None:
+        with self.lock:
+            if name not in self.phases:
+                self.phases[name] = {
+                    "start": round((start - self.start) * 1000, 1),
+                    "duration": self.get_elapsed(start),
+                }
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """measure the duration of a startup phase"""
+        start = time.perf_counter()
+        yield
+        self.record_phase(name, start)
+
+    def import_module(self, name: str) -> types.ModuleType:
+        """import a module and record the import time if it was not loaded yet"""
+        if name in sys.modules:
+            return sys.modules[name]
+
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        with self.lock:
+            self.imports[name] = self.get_elapsed(start)
+        logger.debug(f"imported {name} in {self.imports[name]} ms")
+        return module
+
+    def set_ready(self) -> None:
+        """mark the app as ready to serve requests"""
+        if self.ready_after is None:
+            self.ready_after = self.get_elapsed()
+
+    def get_report(self) -> dict:
+        return {
+            "ready_after": self.ready_after,
+            "phases": dict(self.phases),
+            "imports": dict(self.imports),
+        }
+
+
+class LazyModule(types.ModuleType):
+    """Module that is imported on first attribute access, e.g. boto3 or pandas
+    are then only loaded once they are used and not at the cold start"""
+
+    def __init__(self, name: str, profiler: StartupProfiler):
+        super().__init__(name)
+        self._profiler = profiler
+
+    def __getattr__(self, attribute: str) -> Any:
+        module = self._profiler.import_module(self.__name__)
+        # cache the attributes of the module, later lookups skip __getattr__
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attribute)
+
+
+startup_profiler = StartupProfiler()
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """get a module that is only imported once it is used"""
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name, startup_profiler)
@@ -0,0 +1,203 @@
+import json
+import logging
+
+import numpy as np
+
+from music_flow.config import settings
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel(settings.LOGGING_LEVEL)
+
+
+class TreeEnsemble:
+    """Trees of a trained XGBRegressor as flat numpy arrays
+
+    Each array has one row per tree and one column per node, the trees are padded
+    to the same number of nodes. The children of a leaf point to the leaf itself,
+    so that all samples can walk down all trees for the maximum depth at once.
+    The predictions are computed with numpy only, xgboost is not needed to serve
+    the model.
+    """
+
+    file_name = "model.npz"
+    # objectives for which the prediction is the raw sum of the trees
+    identity_objectives = [
+        "reg:squarederror",
+        "reg:squaredlogerror",
+        "reg:pseudohubererror",
+        "reg:absoluteerror",
+    ]
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        default_left: np.ndarray,
+        value: np.ndarray,
+        base_score: float,
+        max_depth: int,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.base_score = np.float32(base_score)
+        self.max_depth = int(max_depth)
+        self.trees = np.arange(len(feature))
+
+    @classmethod
+    def from_xgboost(cls, estimator) -> "TreeEnsemble":
+        """export the trees of a trained XGBRegressor
+
+        Args:
+            estimator: trained XGBRegressor, if it was trained with early stopping
+                only the trees up to the best iteration are exported, the same as
+                in `estimator.predict`
+
+        Raises:
+            Exception: if the booster or the objective is not supported
+
+        Returns:
+            TreeEnsemble: exported trees
+        """
+        model = json.loads(estimator.get_booster().save_raw("json"))
+        learner = model["learner"]
+
+        objective = learner["objective"]["name"]
+        if objective not in cls.identity_objectives:
+            raise Exception(f"objective not supported: {objective}")
+
+        gradient_booster = learner["gradient_booster"]
+        if gradient_booster["name"] != "gbtree":
+            raise Exception(f"booster not supported: {gradient_booster['name']}")
+
+        trees = gradient_booster["model"]["trees"]
+        best_iteration = getattr(estimator, "best_iteration", None)
+        if best_iteration is not None:
+            num_parallel_tree = int(
+                gradient_booster["model"]["gbtree_model_param"]["num_parallel_tree"]
+            )
+            trees = trees[: (best_iteration + 1) * num_parallel_tree]
+
+        number_of_nodes = max(len(tree["left_children"]) for tree in trees)
+        shape = (len(trees), number_of_nodes)
+
+        feature = np.zeros(shape, dtype=np.intp)
+        threshold = np.zeros(shape, dtype=np.float32)
+        left = np.tile(np.arange(number_of_nodes, dtype=np.intp), (len(trees), 1))
+        right = left.copy()
+        default_left = np.ones(shape, dtype=bool)
+        value = np.zeros(shape, dtype=np.float32)
+        max_depth = 0
+
+        for index, tree in enumerate(trees):
+            children = np.array(tree["left_children"], dtype=np.intp)
+            nodes = np.arange(len(children))
+            is_split = children != -1
+            split_nodes = nodes[is_split]
+
+            feature[index, split_nodes] = np.array(tree["split_indices"])[is_split]
+            threshold[index, split_nodes] = np.array(
+                tree["split_conditions"], dtype=np.float32
+            )[is_split]
+            left[index, split_nodes] = children[is_split]
+            right[index, split_nodes] = np.array(tree["right_children"])[is_split]
+            default_left[index, nodes] = np.array(tree["default_left"], dtype=bool)
+            # the split condition of a leaf is its value
+            value[index, nodes[~is_split]] = np.array(
+                tree["split_conditions"], dtype=np.float32
+            )[~is_split]
+            max_depth = max(max_depth, cls.get_depth(tree))
+
+        base_score = cls.parse_base_score(learner["learner_model_param"]["base_score"])
+        return cls(
+            feature, threshold, left, right, default_left, value, base_score, max_depth
+        )
+
+    @staticmethod
+    def parse_base_score(base_score: str) -> float:
+        """the base score is written as a number, e.g. "5E-1", or by newer
+        xgboost versions as a vector with a value per target, e.g. "[5E-1]"."""
+        return float(base_score.strip("[]").split(",")[0])
+
+    @staticmethod
+    def get_depth(tree: dict) -> int:
+        """number of splits on the longest path from the root to a leaf"""
+        depth = 0
+        nodes = [0]
+        while True:
+            children = [
+                child
+                for node in nodes
+                for child in (tree["left_children"][node], tree["right_children"][node])
+                if child != -1
+            ]
+            if not children:
+                return depth
+            nodes = children
+            depth += 1
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """predict all samples with all trees at once
+
+        Args:
+            X (np.ndarray): samples of shape (number of samples, number of features),
+                missing values are np.nan
+
+        Returns:
+            np.ndarray: prediction per sample
+        """
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, np.newaxis]
+        nodes = np.zeros((len(X), len(self.trees)), dtype=np.intp)
+
+        for _ in range(self.max_depth):
+            values = X[rows, self.feature[self.trees, nodes]]
+            is_left = np.where(
+                np.isnan(values),
+                self.default_left[self.trees, nodes],
+                values < self.threshold[self.trees, nodes],
+            )
+            nodes = np.where(
+                is_left, self.left[self.trees, nodes], self.right[self.trees, nodes]
+            )
+
+        # sum in float32 in the order of the trees, the same as xgboost
+        leaf_values = self.value[self.trees, nodes]
+        predictions = np.full(len(X), self.base_score, dtype=np.float32)
+        for tree in self.trees:
+            predictions += leaf_values[:, tree]
+        return predictions
+
+    def save(self, path: str) -> None:
+        np.savez(
+            path,
+            feature=self.feature,
+            threshold=self.threshold,
+            left=self.left,
+            right=self.right,
+            default_left=self.default_left,
+            value=self.value,
+            base_score=self.base_score,
+            max_depth=self.max_depth,
+        )
+        logger.info(f"Save: {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "TreeEnsemble":
+        with np.load(path) as arrays:
+            return cls(
+                feature=arrays["feature"],
+                threshold=arrays["threshold"],
+                left=arrays["left"],
+                right=arrays["right"],
+                default_left=arrays["default_left"],
+                value=arrays["value"],
+                base_score=float(arrays["base_score"]),
+                max_depth=int(arrays["max_depth"]),
+            )
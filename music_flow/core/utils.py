@@ -2,6 +2,8 @@ import hashlib
 import json
 import os
 
+from music_flow.config import path_settings
+
 
 def create_folder(path: str) -> str:
     """
@@ -32,9 +34,10 @@ path_base = os.path.join(path, "music_flow")
 path_results = os.path.join(path, "results")
 path_registry = os.path.join(path, "registry")
 path_reports = os.path.join(path, "reports")
-path_data_lake = os.path.join(path, "data_lake_v2")
-path_data_lake_success = os.path.join(path_data_lake, "success")
-path_data_lake_failed = os.path.join(path_data_lake, "failed")
+path_data_lake = path_settings.path_data_lake
+path_data_lake_success = path_settings.path_data_lake_success
+path_data_lake_failed = path_settings.path_data_lake_failed
+path_data_lake_segments = path_settings.path_data_lake_segments
 
 path_data = os.path.join(path, "data")
 path_features = os.path.join(path_data, "features")
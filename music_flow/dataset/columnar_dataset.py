@@ -0,0 +1,120 @@
+import json
+import os
+import shutil
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from music_flow.dataset import __version__ as data_version
+
+schema_file = "schema.json"
+
+
+def write_columnar_dataset(
+    dataset: pd.DataFrame, path: str, schema: dict[str, str]
+) -> dict:
+    """write the columns of the schema as one .npy file per column and the
+    schema as json, the columns are cast to the dtype of the schema
+
+    The folder is written next to the destination and then moved into place, so
+    that readers never see a partially written dataset.
+
+    Args:
+        dataset (pd.DataFrame): preprocessed dataset
+        path (str): folder of the columnar dataset
+        schema (dict[str, str]): dtype per column, e.g. float32, int16, bool or
+            category
+
+    Raises:
+        Exception: if a column is missing or has missing values that the dtype
+            cannot represent
+
+    Returns:
+        dict: the written schema
+    """
+    missing_columns = [column for column in schema if column not in dataset]
+    if missing_columns:
+        raise Exception(f"columns not in the dataset: {missing_columns}")
+
+    path_tmp = f"{path}.tmp"
+    shutil.rmtree(path_tmp, ignore_errors=True)
+    os.makedirs(path_tmp)
+
+    columns = []
+    for position, (column, dtype) in enumerate(schema.items()):
+        values = dataset[column]
+        entry = {"name": column, "dtype": dtype, "file": f"{position:03d}.npy"}
+
+        if dtype == "category":
+            categorical = values.astype("category")
+            entry["categories"] = categorical.cat.categories.tolist()
+            array = categorical.cat.codes.to_numpy(dtype=np.int16)
+        else:
+            if not np.issubdtype(np.dtype(dtype), np.floating) and values.isna().any():
+                shutil.rmtree(path_tmp)
+                raise Exception(f"missing values in the {dtype} column: {column}")
+            array = values.to_numpy(dtype=dtype)
+
+        np.save(os.path.join(path_tmp, entry["file"]), array)
+        columns.append(entry)
+
+    data_schema = {
+        "version": data_version,
+        "rows": len(dataset),
+        "columns": columns,
+    }
+    with open(os.path.join(path_tmp, schema_file), "w", encoding="utf-8") as f:
+        json.dump(data_schema, f, indent=4)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(path_tmp, path)
+    return data_schema
+
+
+def read_schema(path: str) -> dict:
+    with open(os.path.join(path, schema_file), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_columnar_dataset(
+    path: str, columns: Optional[list[str]] = None
+) -> dict[str, np.ndarray]:
+    """memory map the columns of a columnar dataset, only the pages that are
+    accessed are read from disk
+
+    Args:
+        path (str): folder of the columnar dataset
+        columns (Optional[list[str]], optional): columns to read, in this order.
+            Defaults to all columns of the schema.
+
+    Returns:
+        dict[str, np.ndarray]: read-only array per column, category columns hold
+            the codes of the categories in the schema
+    """
+    entries = {entry["name"]: entry for entry in read_schema(path)["columns"]}
+    if columns is None:
+        columns = list(entries)
+
+    return {
+        column: np.load(os.path.join(path, entries[column]["file"]), mmap_mode="r")
+        for column in columns
+    }
+
+
+def load_features_and_target(
+    path: str, columns: list[str], target_column: str
+) -> tuple[np.ndarray, np.ndarray]:
+    """load the features as a float32 matrix and the target as float32 vector
+
+    The columns are copied from the memory mapped files into the matrix one by
+    one, without an intermediate frame.
+    """
+    arrays = read_columnar_dataset(path, columns + [target_column])
+    rows = len(arrays[target_column])
+
+    X = np.empty((rows, len(columns)), dtype=np.float32)
+    for position, column in enumerate(columns):
+        X[:, position] = arrays[column]
+    y = np.asarray(arrays[target_column], dtype=np.float32)
+    return X, y
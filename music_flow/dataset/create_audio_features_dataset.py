@@ -8,58 +8,63 @@ from music_flow.config import dataset_settings
 from music_flow.core.features.get_formatted_features import get_formatted_features
 from music_flow.core.utils import (
     path_data,
-    path_data_lake_success,
+    path_data_lake_segments,
     path_features,
-    read_json,
 )
+from music_flow.dataset.data_lake import DataLake
 
 path_target_values = os.path.join(path_data, dataset_settings.TARGERT_VALUES)
 path_audio_features = os.path.join(path_features, dataset_settings.AUDIO_FEATURES)
 
 
-def create_audio_features_dataset():
-    """Create the audio features dataset"""
+def create_audio_features_dataset(path_data_lake: str = path_data_lake_segments):
+    """Create the audio features dataset
 
-    df = pd.read_csv(path_target_values, sep=";")
-    files_set = set(os.listdir(path_data_lake_success))
+    The downloaded tracks are read segment by segment from the data lake. A
+    track that failed only on the audio analysis still has its features, the
+    other failed tracks and the tracks without features are removed from the
+    index of the data lake, so that they are downloaded again.
+    """
+
+    df = pd.read_csv(path_target_values, sep=";", usecols=["hash"])
+    hashes = set(df["hash"])
     count_failing_tracks = 0
-    count_missing_tracks = 0
-
-    dataset = []
-    start = time.time()
-    for index, row in df.iterrows():
-        if int(index) % 800 == 0:  # type: ignore
-            time_passed = time.time() - start
-            print(f"{index}/{len(df)} - {time_passed/60.:.1f} min")
-            print(
-                f"missing tracks: {count_missing_tracks} - failing tracks:"
-                f" {count_failing_tracks}"
-            )
-        hash = row["hash"]
-        filename = f"{hash}.json"
-
-        if filename not in files_set:
-            count_missing_tracks += 1
-            continue
-
-        path_file = os.path.join(path_data_lake_success, filename)
-        data = read_json(path_file)
-
-        if data["status"] == "failed" and not data["failure_type"] == "audio_analysis":
-            count_failing_tracks += 1
-            pprint(data["track_name"])
-            os.remove(path_file)
-            continue
-
-        features = get_formatted_features(data, hash)
-
-        if not features:
-            count_failing_tracks += 1
-            pprint(data["track_name"])
-            os.remove(path_file)
-            continue
-
-        dataset.append(features)
+
+    with DataLake(path_data_lake) as data_lake:
+        count_missing_tracks = len(hashes - data_lake.get_hashes())
+
+        dataset = []
+        start = time.time()
+        for index, data in enumerate(data_lake.iter_records()):
+            if index % 800 == 0:
+                time_passed = time.time() - start
+                print(f"{index}/{len(hashes)} - {time_passed/60.:.1f} min")
+                print(
+                    f"missing tracks: {count_missing_tracks} - failing tracks:"
+                    f" {count_failing_tracks}"
+                )
+            hash = data["hash"]
+            if hash not in hashes:
+                continue
+
+            if (
+                data["status"] == "failed"
+                and not data["failure_type"] == "audio_analysis"
+            ):
+                count_failing_tracks += 1
+                pprint(data["track_name"])
+                data_lake.delete(hash)
+                continue
+
+            features = get_formatted_features(data, hash)
+
+            if not features:
+                count_failing_tracks += 1
+                pprint(data["track_name"])
+                data_lake.delete(hash)
+                continue
+
+            dataset.append(features)
 
     df_audio_features = pd.DataFrame(dataset)
     df_audio_features.to_csv(path_audio_features, sep=";")
@@ -2,12 +2,15 @@ import os
 
 import pandas as pd
 
-from music_flow.config import dataset_settings
+from music_flow.config import dataset_settings, feature_settings
+from music_flow.core.features.preprocessing import feature_preprocessing
 from music_flow.core.utils import path_data, path_dataset, path_features
+from music_flow.dataset.columnar_dataset import write_columnar_dataset
 
 path_target_values = os.path.join(path_data, dataset_settings.TARGERT_VALUES)
 path_audio_features = os.path.join(path_features, dataset_settings.AUDIO_FEATURES)
 path_dataset_file = os.path.join(path_dataset, dataset_settings.FINAL_DATASET)
+path_columnar_dataset = os.path.join(path_dataset, dataset_settings.COLUMNAR_DATASET)
 
 
 def create_dataset() -> pd.DataFrame:
@@ -32,8 +35,22 @@ def create_dataset() -> pd.DataFrame:
     print(list(df_dataset))
     print(df_dataset.shape)
     print("New rows: ", df_dataset.shape[0] - previous_rows)
+
+    create_columnar_dataset(df_dataset)
     return df_dataset
 
 
+def create_columnar_dataset(df_dataset: pd.DataFrame) -> dict:
+    """Preprocess the dataset and save it with the dtypes of the feature schema
+    as columnar dataset, which the training loads memory mapped"""
+    schema = write_columnar_dataset(
+        feature_preprocessing(df_dataset),
+        path=path_columnar_dataset,
+        schema=feature_settings.dataset_schema,
+    )
+    print(f"save to: {path_columnar_dataset} ({schema['rows']} rows)")
+    return schema
+
+
 if __name__ == "__main__":
     create_dataset()
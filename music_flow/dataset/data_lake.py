@@ -0,0 +1,379 @@
+"""
+Append-only store of the downloaded raw features
+
+The raw features of the tracks are appended to gzip compressed JSONL segments
+of `records_per_segment` records, e.g.
+
+    data_lake_v3/
+        index.sqlite
+        segment-000001.ndjson.gz
+        segment-000002.ndjson.gz.part
+
+Every record is compressed as a gzip member of its own, so that the index can
+map the hash of a track to the (segment, offset, length) of its record and a
+record is read without decompressing the segment. Concatenated gzip members
+are a valid gzip file, a segment can still be read with `gzip.open`.
+
+The last segment is written as `.part` and renamed once it is full. The
+offsets of the records are only known to the process that writes the segment,
+so a data lake is opened by one process at a time, a second process fails to
+open it until the first one has closed it. A track
+that is appended again, e.g. a failed track that was retried, replaces the
+entry in the index, the old record stays in its segment.
+
+    python -m music_flow.dataset.data_lake --source data_lake_v2
+
+migrates the former layout with one json file per track.
+"""
+
+import argparse
+import fcntl
+import gzip
+import json
+import os
+import sqlite3
+import threading
+from typing import Iterator, Optional
+
+from music_flow.config import dataset_settings, path_settings
+
+
+class DataLake:
+    """Segmented append-only store of the raw features, with the status of
+    every track in the index, so that no directory has to be listed"""
+
+    index_name = "index.sqlite"
+    lock_name = "index.lock"
+
+    def __init__(
+        self,
+        path: str = path_settings.path_data_lake_segments,
+        records_per_segment: int = dataset_settings.DATA_LAKE_SEGMENT_RECORDS,
+        compresslevel: int = 6,
+    ):
+        """
+        Args:
+            path (str): folder of the segments and the index
+            records_per_segment (int): records after which a segment is closed
+            compresslevel (int): gzip compression level of the records
+
+        Raises:
+            Exception: if the data lake is opened by another process
+        """
+        if records_per_segment < 1:
+            raise Exception("records_per_segment must be positive")
+        os.makedirs(path, exist_ok=True)
+        self.lock_file = open(os.path.join(path, self.lock_name), "w")
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.lock_file.close()
+            raise Exception(f"data lake {path} is opened by another process")
+        self.path = path
+        self.records_per_segment = records_per_segment
+        self.compresslevel = compresslevel
+        self.lock = threading.RLock()
+
+        self.connection = sqlite3.connect(
+            os.path.join(path, self.index_name), check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS records (hash TEXT PRIMARY KEY, "
+                "status TEXT, segment INTEGER, offset INTEGER, length INTEGER) "
+                "WITHOUT ROWID"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS records_segment "
+                "ON records (segment, offset)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS segments (id INTEGER PRIMARY KEY, "
+                "records INTEGER, is_sealed INTEGER)"
+            )
+
+        self.segment_id, self.segment_records = self.recover()
+        self.file = open(self.get_segment_path(self.segment_id, False), "ab")
+
+    def get_segment_path(self, segment_id: int, is_sealed: bool) -> str:
+        filename = f"segment-{segment_id:06d}.ndjson.gz"
+        return os.path.join(self.path, filename if is_sealed else f"{filename}.part")
+
+    def recover(self) -> tuple[int, int]:
+        """complete a rollover and drop the partial record of a stopped write
+
+        A record is written to the segment before it is added to the index, a
+        stopped process leaves at most bytes after the last indexed record,
+        which are truncated.
+
+        Returns:
+            tuple[int, int]: id and number of records of the open segment
+        """
+        with self.connection:
+            segments = self.connection.execute(
+                "SELECT id, records FROM segments WHERE is_sealed = 0"
+            ).fetchall()
+            if not segments:
+                (last_id,) = self.connection.execute(
+                    "SELECT COALESCE(MAX(id), 0) FROM segments"
+                ).fetchone()
+                self.connection.execute(
+                    "INSERT INTO segments VALUES (?, 0, 0)", (last_id + 1,)
+                )
+                return last_id + 1, 0
+
+            segment_id, records = segments[-1]
+            path_part = self.get_segment_path(segment_id, False)
+            if not os.path.exists(path_part) and os.path.exists(
+                self.get_segment_path(segment_id, True)
+            ):
+                # renamed, but the process stopped before the index was updated
+                self.connection.execute(
+                    "UPDATE segments SET is_sealed = 1 WHERE id = ?", (segment_id,)
+                )
+                self.connection.execute(
+                    "INSERT INTO segments VALUES (?, 0, 0)", (segment_id + 1,)
+                )
+                return segment_id + 1, 0
+
+            size = os.path.getsize(path_part) if os.path.exists(path_part) else 0
+            # records whose bytes did not reach the disk
+            self.connection.execute(
+                "DELETE FROM records WHERE segment = ? AND offset + length > ?",
+                (segment_id, size),
+            )
+            (end,) = self.connection.execute(
+                "SELECT COALESCE(MAX(offset + length), 0) FROM records "
+                "WHERE segment = ?",
+                (segment_id,),
+            ).fetchone()
+        if size > end:
+            with open(path_part, "r+b") as f:
+                f.truncate(end)
+        return segment_id, records
+
+    def append(self, data: dict) -> None:
+        """append the raw features of a track, the hash and status of `data`
+        are added to the index"""
+        record = gzip.compress(
+            (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8"),
+            compresslevel=self.compresslevel,
+            mtime=0,
+        )
+        with self.lock:
+            offset = self.file.tell()
+            self.file.write(record)
+            self.file.flush()
+            with self.connection:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)",
+                    (
+                        data["hash"],
+                        data["status"],
+                        self.segment_id,
+                        offset,
+                        len(record),
+                    ),
+                )
+                self.connection.execute(
+                    "UPDATE segments SET records = records + 1 WHERE id = ?",
+                    (self.segment_id,),
+                )
+            self.segment_records += 1
+            if self.segment_records >= self.records_per_segment:
+                self.rollover()
+
+    def rollover(self) -> None:
+        """close the full segment and open the next one"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(
+            self.get_segment_path(self.segment_id, False),
+            self.get_segment_path(self.segment_id, True),
+        )
+        with self.connection:
+            self.connection.execute(
+                "UPDATE segments SET is_sealed = 1 WHERE id = ?", (self.segment_id,)
+            )
+            self.connection.execute(
+                "INSERT INTO segments VALUES (?, 0, 0)", (self.segment_id + 1,)
+            )
+        self.segment_id += 1
+        self.segment_records = 0
+        self.file = open(self.get_segment_path(self.segment_id, False), "ab")
+
+    def get_segments(self) -> dict[int, str]:
+        """path of every segment by id"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT id, is_sealed FROM segments ORDER BY id"
+            ).fetchall()
+        return {
+            segment_id: self.get_segment_path(segment_id, bool(is_sealed))
+            for segment_id, is_sealed in rows
+        }
+
+    @staticmethod
+    def read_record(f, offset: int, length: int) -> dict:
+        f.seek(offset)
+        return json.loads(gzip.decompress(f.read(length)))
+
+    def get(self, hash: str) -> Optional[dict]:
+        """the raw features of a track, None if the track is not in the store"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT segment, is_sealed, offset, length FROM records "
+                "JOIN segments ON segments.id = records.segment WHERE hash = ?",
+                (hash,),
+            ).fetchone()
+            if row is None:
+                return None
+            segment_id, is_sealed, offset, length = row
+            path_segment = self.get_segment_path(segment_id, bool(is_sealed))
+            with open(path_segment, "rb") as f:
+                return self.read_record(f, offset, length)
+
+    def get_status(self, hash: str) -> Optional[str]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT status FROM records WHERE hash = ?", (hash,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_hashes(self, status: Optional[str] = None) -> set[str]:
+        """hashes of the tracks in the store, optionally only with a status"""
+        query, parameters = "SELECT hash FROM records", ()
+        if status:
+            query, parameters = f"{query} WHERE status = ?", (status,)
+        with self.lock:
+            return {hash for (hash,) in self.connection.execute(query, parameters)}
+
+    def iter_records(self, status: Optional[str] = None) -> Iterator[dict]:
+        """stream the records segment by segment in the order of the offsets, the
+        replaced records are skipped"""
+        for segment_id, path_segment in self.get_segments().items():
+            query = "SELECT offset, length FROM records WHERE segment = ?"
+            parameters: tuple = (segment_id,)
+            if status:
+                query, parameters = f"{query} AND status = ?", (segment_id, status)
+            with self.lock:
+                rows = self.connection.execute(
+                    f"{query} ORDER BY offset", parameters
+                ).fetchall()
+            if not rows:
+                continue
+            with open(path_segment, "rb") as f:
+                for offset, length in rows:
+                    yield self.read_record(f, offset, length)
+
+    def delete(self, hash: str) -> None:
+        """remove a track from the index, so that it is downloaded again"""
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM records WHERE hash = ?", (hash,))
+
+    def __contains__(self, hash: str) -> bool:
+        return self.get_status(hash) is not None
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            statuses = dict(
+                self.connection.execute(
+                    "SELECT status, COUNT(*) FROM records GROUP BY status"
+                )
+            )
+        segments = self.get_segments()
+        return {
+            "records": sum(statuses.values()),
+            "statuses": statuses,
+            "segments": len(segments),
+            "size_bytes": sum(
+                os.path.getsize(path)
+                for path in segments.values()
+                if os.path.exists(path)
+            ),
+        }
+
+    def close(self) -> None:
+        with self.lock:
+            if self.file.closed:
+                return
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.connection.close()
+            # closing the file releases the lock
+            self.lock_file.close()
+
+    def __enter__(self) -> "DataLake":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def migrate_json_files(
+    data_lake: DataLake, path_folder: str, is_delete_files: bool = False
+) -> int:
+    """append the json files of the former layout, one file per track, to the
+    data lake, the tracks that are already in the data lake are skipped, so that
+    a stopped migration resumes
+
+    Args:
+        data_lake (DataLake): the segmented data lake
+        path_folder (str): folder with a `{hash}.json` file per track
+        is_delete_files (bool, optional): delete the migrated files.
+
+    Returns:
+        int: number of migrated files
+    """
+    migrated = 0
+    with os.scandir(path_folder) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".json"):
+                continue
+            hash = entry.name[: -len(".json")]
+            if hash not in data_lake:
+                with open(entry.path, encoding="utf-8") as f:
+                    data = json.load(f)
+                data_lake.append({**data, "hash": hash})
+                migrated += 1
+            if is_delete_files:
+                os.remove(entry.path)
+    return migrated
+
+
+def main(args: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="migrate the json files of the data lake to segments"
+    )
+    parser.add_argument("--source", default=path_settings.path_data_lake)
+    parser.add_argument("--target", default=path_settings.path_data_lake_segments)
+    parser.add_argument(
+        "--records-per-segment",
+        type=int,
+        default=dataset_settings.DATA_LAKE_SEGMENT_RECORDS,
+    )
+    parser.add_argument("--delete", action="store_true")
+    parsed = parser.parse_args(args)
+
+    with DataLake(parsed.target, parsed.records_per_segment) as data_lake:
+        # a retried track can have a success and a failed file, the success
+        # file is migrated first and the failed file is skipped
+        for folder in ["success", "failed"]:
+            path_folder = os.path.join(parsed.source, folder)
+            if not os.path.isdir(path_folder):
+                continue
+            migrated = migrate_json_files(data_lake, path_folder, parsed.delete)
+            print(f"{folder}: migrated {migrated} files")
+        print(data_lake.get_stats())
+
+
+if __name__ == "__main__":
+    main()
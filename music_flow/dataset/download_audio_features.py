@@ -1,98 +1,220 @@
-import json
 import logging
 import os
 import time
-from pprint import pprint
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Iterator, Optional
 
 import pandas as pd
 
 from music_flow.config import dataset_settings
-from music_flow.core.features.get_raw_features import get_raw_features
-from music_flow.core.utils import (
-    path_data,
-    path_data_lake_failed,
-    path_data_lake_success,
-)
+from music_flow.core.features import get_raw_features as raw_features
+from music_flow.core.rate_limiter import RequestLimiter, TokenBucket, spotify_limiter
+from music_flow.core.spotify_api import SpotifyAPI
+from music_flow.core.utils import path_data, path_data_lake_segments
+from music_flow.dataset.data_lake import DataLake
 
 logger = logging.getLogger(__name__)
 
 path_target_values = os.path.join(path_data, dataset_settings.TARGERT_VALUES)
 
 
-def download_audio_features(is_retry_failed_files: bool = False) -> bool:
+class DownloadProgress:
+    """Counts the downloaded tracks and prints the throughput, the number of
+    429 responses and the ETA at most every `interval` seconds"""
+
+    def __init__(
+        self, total: int, rate_limiter: RequestLimiter, interval: float = 10.0
+    ):
+        self.total = total
+        self.rate_limiter = rate_limiter
+        # the limiter might be shared and have counted before
+        self.throttled_before = rate_limiter.throttled
+        self.interval = interval
+        self.start_time = time.monotonic()
+        self.reported_at = self.start_time
+        self.success = 0
+        self.failed = 0
+        self.errors = 0
+
+    @property
+    def done(self) -> int:
+        return self.success + self.failed + self.errors
+
+    def get_stats(self) -> dict:
+        elapsed_time = time.monotonic() - self.start_time
+        rate = self.done / elapsed_time if elapsed_time > 0 else 0.0
+        remaining = self.total - self.done
+        return {
+            "done": self.done,
+            "total": self.total,
+            "success": self.success,
+            "failed": self.failed,
+            "errors": self.errors,
+            "throttled": self.rate_limiter.throttled - self.throttled_before,
+            "limit": getattr(self.rate_limiter, "limit", None),
+            "tracks_per_second": round(rate, 2),
+            "eta_seconds": round(remaining / rate) if rate > 0 else None,
+            "elapsed_seconds": round(elapsed_time, 1),
+        }
+
+    @staticmethod
+    def format_limit(limit: Optional[float]) -> str:
+        return "" if limit is None else f"limit: {limit:.1f}, "
+
+    def report(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self.reported_at < self.interval:
+            return
+        self.reported_at = now
+        stats = self.get_stats()
+        eta = stats["eta_seconds"]
+        print(
+            f"{stats['done']}/{stats['total']} - "
+            f"Success: {stats['success']}, Failed: {stats['failed']}, "
+            f"Errors: {stats['errors']}, 429: {stats['throttled']}, "
+            f"{stats['tracks_per_second']:.1f} tracks/s, "
+            f"{self.format_limit(stats['limit'])}ETA: {'-' if eta is None else f'{eta // 60}min {eta % 60}s'}"
+        )
+
+
+def iter_missing_rows(
+    path: str, skip_hashes: set[str], chunksize: int = 10_000
+) -> Iterator[tuple[str, str, str]]:
+    """stream the rows of the target values that are not in the data lake yet
+
+    Yields:
+        Iterator[tuple[str, str, str]]: hash, track_name and artist_name
     """
-    This function will download the audio features from the spotify API and store them in a json file.
-    The json file will be stored in the path_data_lake folder.
+    columns = ["hash", "track_name", "artist_name"]
+    for chunk in pd.read_csv(path, sep=";", usecols=columns, chunksize=chunksize):
+        for hash, track_name, artist_name in chunk.itertuples(index=False):
+            if hash not in skip_hashes:
+                yield hash, track_name, artist_name
+
+
+def count_missing_rows(path: str, skip_hashes: set[str]) -> int:
+    total = 0
+    for chunk in pd.read_csv(path, sep=";", usecols=["hash"], chunksize=100_000):
+        total += int((~chunk["hash"].isin(skip_hashes)).sum())
+    return total
+
+
+def get_rate_limiter(rate_limit: Optional[float]) -> RequestLimiter:
+    """a token bucket with a fixed rate, by default the adaptive limit of the
+    Spotify requests, that is shared by all downloads of the process"""
+    if rate_limit:
+        return TokenBucket(rate=rate_limit)
+    return spotify_limiter
+
+
+def download_track(
+    api: SpotifyAPI, hash: str, track_name: str, artist_name: str
+) -> dict:
+    data, status_code = raw_features.get_raw_features(track_name, artist_name, api=api)
+    # the cached raw features are shared, the hash is added to a copy
+    data = {**data, "hash": hash}
+    if data["status"] != "success":
+        logger.debug(f"{status_code} - {data}")
+    return data
+
+
+def download_audio_features(
+    is_retry_failed_files: bool = False,
+    max_workers: int = dataset_settings.DOWNLOAD_WORKERS,
+    rate_limit: Optional[float] = dataset_settings.DOWNLOAD_RATE_LIMIT,
+    path_target_values: str = path_target_values,
+    path_data_lake: str = path_data_lake_segments,
+    progress_interval: float = 10.0,
+) -> bool:
+    """
+    This function will download the audio features from the spotify API and
+    append them to the segments of the data lake, see `DataLake`.
+
+    The tracks are downloaded by a pool of `max_workers` threads, the requests of
+    all threads share a rate limiter that pauses all threads for the Retry-After
+    of a 429 response. The rows are streamed
+    from the csv and every result is appended once it completes, tracks that
+    are already in the index of the data lake are skipped, so a stopped download
+    resumes where it ended.
 
     Args:
         is_retry_failed_files (bool): indicate if failed files should be retired or not
+        max_workers (int): number of tracks downloaded concurrently
+        rate_limit (Optional[float]): fixed requests per second across all
+            workers, by default the adaptive limit of the Spotify requests
+        path_target_values (str): csv with the hash, track_name and artist_name
+        path_data_lake (str): folder of the segments of the data lake
+
+    Raises:
+        Exception: if too many tracks fail
 
     Returns:
-        bool: has_finished
+        bool: has_finished, False if some tracks raised an error and have to be
+            downloaded again
     """
-    df = pd.read_csv(path_target_values, sep=";")
-    files_failed_set = set(os.listdir(path_data_lake_failed))
-    number_of_files_failed = len(os.listdir(path_data_lake_failed))
-
-    files_set = set(os.listdir(path_data_lake_success))
-    number_of_files_success = len(os.listdir(path_data_lake_success))
-
-    print(
-        f"Files missing: {len(df) - number_of_files_failed - number_of_files_success}"
+    data_lake = DataLake(path_data_lake)
+    skip_hashes = data_lake.get_hashes("success" if is_retry_failed_files else None)
+
+    rate_limiter = get_rate_limiter(rate_limit)
+    progress = DownloadProgress(
+        count_missing_rows(path_target_values, skip_hashes),
+        rate_limiter,
+        interval=progress_interval,
     )
+    print(f"Files missing: {progress.total}")
 
-    success = 0.000001
-    failed = 0
-    for index, row in df.iterrows():
-        if index % 1_000 == 0:  # type: ignore
-            print(f"{index}/{len(df)}")
-
-        hash = row["hash"]
-        filename = f"{hash}.json"
-
-        if (
-            (filename in files_set)
-            or (filename in files_failed_set)
-            or is_retry_failed_files
-        ):
-            continue
-
-        track_name = row["track_name"]
-        artist_name = row["artist_name"]
-
-        data, status_code = get_raw_features(track_name, artist_name)
-        data["hash"] = hash
+    def save_result(future: Future, hash: str) -> None:
+        try:
+            data = future.result()
+        except Exception as e:
+            # nothing is appended, the track is downloaded again on the next run
+            logger.error(f"{hash}: {e}")
+            progress.errors += 1
+            return
 
+        # a retried track replaces its failed entry in the index
+        data_lake.append(data)
         if data["status"] == "success":
-            save_dict_to_json(data, path_data_lake_success, filename)
-            success += 1
+            progress.success += 1
         else:
-            save_dict_to_json(data, path_data_lake_success, filename)
-            failed += 1
-            logger.debug(f"{status_code} - {data}")
-            print(status_code)
-            pprint(data)
-
-        print(f"Success: {int(success)}, Failed: {failed}, Ratio: {failed/success:.2f}")
+            progress.failed += 1
 
-        if success > 150 and failed / success > 5.0:
+        if progress.success > 150 and progress.failed / progress.success > 5.0:
             raise Exception("Too many failed requests")
 
-    return True
-
-
-def save_dict_to_json(data: dict, path: str, filename: str):
-    """save data to json file
+    # a client of its own, the shared client of the process is not limited
+    api = SpotifyAPI(rate_limiter=rate_limiter)
 
-    Args:
-        data (dict): _description_
-        path (str): _description_
-        filename (str): _description_
-    """
-    assert filename.endswith(".json"), "filename must be a json file"
-
-    with open(os.path.join(path, filename), "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+    # at most two tracks per worker are queued, the rows are read lazily
+    max_pending = max_workers * 2
+    pending: dict[Future, str] = {}
+    executor = ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="download"
+    )
+    try:
+        for hash, track_name, artist_name in iter_missing_rows(
+            path_target_values, skip_hashes
+        ):
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    save_result(future, pending.pop(future))
+                progress.report()
+
+            future = executor.submit(download_track, api, hash, track_name, artist_name)
+            pending[future] = hash
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                save_result(future, pending.pop(future))
+            progress.report()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        data_lake.close()
+        progress.report(force=True)
+
+    return progress.errors == 0
 
 
 def main(max_retries=5):
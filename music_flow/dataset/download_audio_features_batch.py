@@ -1,165 +1,255 @@
-import json
 import logging
 import os
-import time
-from pprint import pprint
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Iterator, Optional
 
-import pandas as pd
-
-from music_flow.config import dataset_settings
+from music_flow.config import dataset_settings, path_settings
 from music_flow.core.batch_spotify_api import BatchSpotifyAPI
 from music_flow.core.features.get_raw_features import get_track_id
-from music_flow.core.utils import (
-    path_data,
+from music_flow.core.rate_limiter import RequestLimiter
+from music_flow.core.utils import path_data
+from music_flow.dataset.data_lake import DataLake
+from music_flow.dataset.download_audio_features import (
+    DownloadProgress,
+    count_missing_rows,
+    get_rate_limiter,
+    iter_missing_rows,
 )
 
 logger = logging.getLogger(__name__)
 
 path_target_values = os.path.join(path_data, dataset_settings.TARGERT_VALUES)
-path_data_lake_failed = r"/Users/mauroluzzatto/Documents/python_scripts/track-recommender/data_lake_v2/failed"
-path_data_lake_success = r"/Users/mauroluzzatto/Documents/python_scripts/track-recommender/data_lake_v2/success"
 
+# parts of the raw features that are fetched in batches, with the batch size
+batch_parts = {
+    "audio_features": BatchSpotifyAPI.max_audio_features_ids,
+    "track": BatchSpotifyAPI.max_tracks_ids,
+}
+end_of_stream = None
+# the request of a batch raised, e.g. after too many 429 responses
+fetch_error = object()
 
-def download_audio_features_batch(is_retry_failed_files: bool = False) -> bool:
-    """
-    This function will download the audio features from the spotify API and store them in a json file.
-    The json file will be stored in the path_data_lake folder.
 
-    Args:
-        is_retry_failed_files (bool): indicate if failed files should be retired or not
+class BatchDownloadPipeline:
+    """Downloads the raw features in stages that are connected by queues
 
-    Returns:
-        bool: has_finished
+    1. search workers look up the track_id of every row
+    2. a batcher collects the found tracks into full-size batches, 100 ids for
+       the audio features and 50 ids for the tracks, and fetches them
+       concurrently on the batch workers
+    3. the writer joins the parts of every track and appends them to the data
+       lake
+
+    All requests share a rate limiter, that pauses every stage after a 429.
     """
-    df = pd.read_csv(path_target_values, sep=";")
-    files_failed_set = set(os.listdir(path_data_lake_failed))
-    number_of_files_failed = len(os.listdir(path_data_lake_failed))
-
-    files_set = set(os.listdir(path_data_lake_success))
-    number_of_files_success = len(os.listdir(path_data_lake_success))
-
-    print(
-        f"Files missing: {len(df) - number_of_files_failed - number_of_files_success}"
-    )
-
-    success = 0.000001
-    failed = 0
-
-    start_time = time.time()
-
-    batch = BatchSpotifyAPI()
-    data_collection = {}
-
-    for index, row in df.iterrows():
-        if index % 1_000 == 0:  # type: ignore
-            print(f"{index}/{len(df)}")
-
-        track_name: str = row["track_name"]
-        artist_name: str = row["artist_name"]
-        hash: str = row["hash"]
-        filename: str = f"{hash}.json"
-        if (
-            (filename in files_set) or (filename in files_failed_set)
-        ) or is_retry_failed_files:
-            continue
-
-        data = {
-            "track_name": track_name,
-            "artist_name": artist_name,
-            "hash": hash,
-            "filename": filename,
-        }
+
+    def __init__(
+        self,
+        data_lake: DataLake,
+        search_workers: int,
+        batch_workers: int,
+        rate_limiter: RequestLimiter,
+        total: int,
+        progress_interval: float = 10.0,
+    ):
+        self.data_lake = data_lake
+        self.search_workers = search_workers
+        self.api = BatchSpotifyAPI(rate_limiter=rate_limiter)
+        self.found: queue.Queue = queue.Queue(maxsize=10 * max(batch_parts.values()))
+        self.results: queue.Queue = queue.Queue()
+        self.search_executor = ThreadPoolExecutor(
+            max_workers=search_workers, thread_name_prefix="search"
+        )
+        self.batch_executor = ThreadPoolExecutor(
+            max_workers=batch_workers, thread_name_prefix="batch"
+        )
+        self.progress = DownloadProgress(total, rate_limiter, progress_interval)
+
+    def search(self, data: dict) -> None:
         try:
-            track_id, _ = get_track_id(track_name, artist_name)
-        except Exception:
-            print("track_id error")
-            track_id = None
+            track_id, _ = get_track_id(
+                data["track_name"], data["artist_name"], api=self.api
+            )
+        except Exception as e:
+            logger.error(f"{data['hash']}: {e}")
+            self.results.put(("error", data, None))
+            return
 
         if not track_id:
-            failure_dict = {
-                "status": "failed",
-                "failure_type": "search_track_url",
-                "track_id": None,
-            }
-            data.update(failure_dict)
-            failed += 1
-            save_dict_to_json(data, path_data_lake_failed, data["filename"])
-            continue
+            data.update(
+                {
+                    "status": "failed",
+                    "failure_type": "search_track_url",
+                    "track_id": None,
+                }
+            )
+            self.results.put(("result", data, None))
+            return
 
         data["track_id"] = track_id
-        data_collection[track_id] = data
-
-        if len(data_collection) < 50:
-            continue
+        self.found.put(data)
 
-        ids = list(data_collection.keys())
-        response, _ = batch.get_batch_audio_features(ids)
-        audio_features_dict = batch.convert_batch_response_to_dict(
-            response["audio_features"]
-        )
-        response, _ = batch.get_batch_tracks(ids)
-        tracks_dict = batch.convert_batch_response_to_dict(response["tracks"])
-
-        for track_id, data in data_collection.items():
-            try:
-                data["audio_features"] = audio_features_dict[track_id]
-                data["track"] = tracks_dict[track_id]
-                data["status"] = "success"
-            except Exception as e:
-                data["status"] = "failed"
-                print(e)
-
-            # print(track_id, data["status"], data["filename"])
-
-            if data["status"] == "success":
-                save_dict_to_json(data, path_data_lake_success, data["filename"])
-                success += 1
+    def fetch_batch(self, part: str, batch: list[dict]) -> None:
+        """fetch one part of the raw features for a batch of tracks, the part is
+        None for the tracks that are unknown to Spotify"""
+        ids = [data["track_id"] for data in batch]
+        try:
+            if part == "audio_features":
+                response, _ = self.api.get_batch_audio_features(ids)
+                values = response["audio_features"]
             else:
-                # save_dict_to_json(data, path_data_lake_failed, data["filename"])
-                failed += 1
-                # logger.debug(f"{data}")
-                # print(status_code)
-                pprint(data)
-
-        end_time = time.time()
-        print(f"Success: {int(success)}, Failed: {failed}, Ratio: {failed/success:.2f}")
-        print(f"--> Elapsed time: {(end_time -start_time)/60:.2f} min")
-        data_collection = {}
-
-        # if success > 150 and failed / success > 5.0:
-        #     raise Exception("Too many failed requests")
-
-    return True
-
+                response, _ = self.api.get_batch_tracks(ids)
+                values = response["tracks"]
+        except Exception as e:
+            logger.error(f"batch of {part} failed: {e}")
+            for data in batch:
+                self.results.put((part, data, fetch_error))
+            return
+
+        values_dict = self.api.convert_batch_response_to_dict(values)
+        for data in batch:
+            self.results.put((part, data, values_dict.get(data["track_id"])))
+
+    def run_batcher(self) -> None:
+        batches: dict[str, list[dict]] = {part: [] for part in batch_parts}
+        futures = []
+        while True:
+            data = self.found.get()
+            for part, batch in batches.items():
+                if data is not end_of_stream:
+                    batch.append(data)
+                if batch and (data is end_of_stream or len(batch) == batch_parts[part]):
+                    futures.append(
+                        self.batch_executor.submit(self.fetch_batch, part, batch)
+                    )
+                    batches[part] = []
+            if data is end_of_stream:
+                break
+        wait(futures)
+        self.results.put(end_of_stream)
+
+    def run_writer(self) -> None:
+        pending: dict[str, dict] = {}
+        while True:
+            item = self.results.get()
+            if item is end_of_stream:
+                break
+            kind, data, value = item
+
+            if kind == "result":
+                self.save(data)
+            elif kind == "error":
+                # nothing is appended, the track is downloaded again on the next run
+                self.progress.errors += 1
+            else:
+                parts = pending.setdefault(data["hash"], {})
+                parts[kind] = value
+                if len(parts) == len(batch_parts):
+                    pending.pop(data["hash"])
+                    self.complete(data, parts)
+            self.progress.report()
+
+    def complete(self, data: dict, parts: dict) -> None:
+        if fetch_error in parts.values():
+            self.progress.errors += 1
+            return
+
+        missing_parts = [part for part in batch_parts if parts.get(part) is None]
+        if missing_parts:
+            data.update({"status": "failed", "failure_type": missing_parts[0]})
+        else:
+            data.update({**parts, "status": "success"})
+        self.save(data)
+
+    def save(self, data: dict) -> None:
+        self.data_lake.append(data)
+        if data["status"] == "success":
+            self.progress.success += 1
+        else:
+            self.progress.failed += 1
+
+    def run(self, rows: Iterator[tuple[str, str, str]]) -> DownloadProgress:
+        """download the rows, the search workers take at most two rows each
+        ahead, so that the rows are read lazily"""
+        batcher = threading.Thread(target=self.run_batcher, name="batcher")
+        writer = threading.Thread(target=self.run_writer, name="writer")
+        batcher.start()
+        writer.start()
+
+        pending: set[Future] = set()
+        try:
+            for hash, track_name, artist_name in rows:
+                if len(pending) >= 2 * self.search_workers:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                data = {
+                    "track_name": track_name,
+                    "artist_name": artist_name,
+                    "hash": hash,
+                }
+                pending.add(self.search_executor.submit(self.search, data))
+            wait(pending)
+        finally:
+            self.search_executor.shutdown(wait=True, cancel_futures=True)
+            self.found.put(end_of_stream)
+            batcher.join()
+            writer.join()
+            self.batch_executor.shutdown(wait=True)
+            self.progress.report(force=True)
+        return self.progress
+
+
+def download_audio_features_batch(
+    is_retry_failed_files: bool = False,
+    search_workers: int = dataset_settings.DOWNLOAD_WORKERS,
+    batch_workers: int = 4,
+    rate_limit: Optional[float] = dataset_settings.DOWNLOAD_RATE_LIMIT,
+    path_target_values: str = path_target_values,
+    path_data_lake: str = path_settings.path_data_lake_segments,
+    progress_interval: float = 10.0,
+) -> bool:
+    """
+    This function will download the audio features from the spotify API and
+    append them to the segments of the data lake, see `DataLake`.
 
-def save_dict_to_json(data: dict, path: str, filename: str):
-    """save data to json file
+    Instead of three requests per track, the audio features and tracks are
+    fetched in batches, see `BatchDownloadPipeline`. Tracks that are already in
+    the data lake are skipped, so a stopped download resumes where it ended.
 
     Args:
-        data (dict): _description_
-        path (str): _description_
-        filename (str): _description_
-    """
-    assert filename.endswith(".json"), "filename must be a json file"
+        is_retry_failed_files (bool): indicate if failed files should be retired or not
+        search_workers (int): number of concurrent searches of the track_id
+        batch_workers (int): number of concurrent batch requests
+        rate_limit (Optional[float]): fixed requests per second across all
+            stages, by default the adaptive limit of the Spotify requests
+        path_target_values (str): csv with the hash, track_name and artist_name
+        path_data_lake (str): folder of the segments of the data lake
 
-    with open(os.path.join(path, filename), "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+    Returns:
+        bool: has_finished, False if some tracks raised an error and have to be
+            downloaded again
+    """
+    with DataLake(path_data_lake) as data_lake:
+        skip_hashes = data_lake.get_hashes("success" if is_retry_failed_files else None)
+        total = count_missing_rows(path_target_values, skip_hashes)
+        print(f"Files missing: {total}")
+
+        pipeline = BatchDownloadPipeline(
+            data_lake=data_lake,
+            search_workers=search_workers,
+            batch_workers=batch_workers,
+            rate_limiter=get_rate_limiter(rate_limit),
+            total=total,
+            progress_interval=progress_interval,
+        )
+        progress = pipeline.run(iter_missing_rows(path_target_values, skip_hashes))
+    return progress.errors == 0
 
 
-def main(max_retries=5):
+def main():
     download_audio_features_batch()
 
-    # while retries < max_retries:
-    #     try:
-    #         has_finished = download_audio_features_batch()
-    #     except Exception as e:
-    #         print(e)
-    #         time.sleep(60 * 3)
-
-    #     retries += 1
-    #     if has_finished:
-    #         break
-
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,7 @@
 from music_flow.core.utils import (
     create_folder,
     path_data,
-    path_data_lake,
-    path_data_lake_failed,
-    path_data_lake_success,
+    path_data_lake_segments,
     path_dataset,
     path_features,
     path_raw,
@@ -21,10 +19,8 @@ def setup_folders():
         path_dataset,
         path_results,
         path_reports,
-        path_data_lake,
+        path_data_lake_segments,
         path_raw,
-        path_data_lake_success,
-        path_data_lake_failed,
     ]
     for path_folder in path_folders:
         _ = create_folder(path_folder)
@@ -1,67 +1,19 @@
 import os
 
 import numpy as np
-import pandas as pd
 from xgboost import XGBRegressor  # type: ignore
 
-from music_flow.config import dataset_settings
-from music_flow.core.features.preprocessing import feature_preprocessing
+from music_flow.config import dataset_settings, feature_settings
 from music_flow.core.utils import create_folder, path_dataset, path_results
 from music_flow.model.evaluator import Evaluator
 from music_flow.model.file_handler import save_json
 from music_flow.model.training_data import TrainingData
 
-path_dataset_file = os.path.join(path_dataset, dataset_settings.FINAL_DATASET)
-dataset = pd.read_csv(path_dataset_file, sep=";", index_col=0)  # type: ignore
-dataset = feature_preprocessing(dataset)
-
-# move to settings
-# add datatype to settings
-target_column = "plays"
-columns_scope = [
-    "number_of_available_markets",
-    "num_artists",
-    "duration_ms",
-    "explicit",
-    "popularity",
-    "release_year",
-    "release_month",
-    "release_day",
-    "date_is_complete",
-    "danceability",
-    "energy",
-    "loudness",
-    "mode",
-    "speechiness",
-    "acousticness",
-    "instrumentalness",
-    "liveness",
-    "valence",
-    "tempo",
-    "time_signature",
-    "A",
-    "A#/Bb",
-    "B",
-    "C",
-    "C#/Db",
-    "D",
-    "D#/Eb",
-    "E",
-    "F",
-    "F#/Gb",
-    "G",
-    "G#/Ab",
-    "Unknown",
-]
-
-
-X: pd.DataFrame = dataset[columns_scope]
-y: pd.Series = dataset[target_column]
-
-print(X.describe().T)
-print(type(X))
-
-dataset = TrainingData(X=X, y=y)
+# written by `create_dataset`, with the dtypes of the feature schema
+path_columnar_dataset = os.path.join(path_dataset, dataset_settings.COLUMNAR_DATASET)
+columns_scope = feature_settings.columns_scope
+
+dataset = TrainingData.from_columnar(path_columnar_dataset, columns_scope)
 dataset.do_train_test_split()
 X_test, y_test = dataset.get_test_data()
 X_train, y_train = dataset.get_training_data()
@@ -1,42 +1,17 @@
-import json
 import os
 
 import pandas as pd
 
+from music_flow.core.model_index import ModelIndex
 from music_flow.core.utils import path_results
 
-results = []
-
-
-def read_json(path):
-    try:
-        with open(path) as f:
-            data = json.load(f)
-    except (FileNotFoundError, NotADirectoryError):
-        data = {}
-    return data
-
-
-for folder in os.listdir(path_results):
-    path = os.path.join(path_results, folder)
-    print(path)
-    if not os.path.isdir(path):
-        continue
-
-    files = os.listdir(path)
-
-    if "score_dict.json" in files:
-        path = os.path.join(path_results, folder, "score_dict.json")
-        score_dict = read_json(path)
-
-    elif "metadata.json" in files:
-        path = os.path.join(path_results, folder, "metadata.json")
-        metadata = read_json(path)
-        key = "score" if "score" in metadata["model"] else "score_dict"
-        score_dict = metadata["model"].get(key, {})
-
-    score_dict["folder"] = folder
-    results.append(score_dict)
+# the scores are read from the model index, only new folders are read from disk
+model_index = ModelIndex(path_results)
+results = [
+    {**score_dict, "folder": folder}
+    for folder, score_dict in model_index.get_scores().items()
+]
+model_index.close()
 
 
 df = pd.DataFrame(results).sort_values("mean_squared_error")
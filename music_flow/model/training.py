@@ -15,6 +15,8 @@ from xgboost import XGBRegressor  # type: ignore
 
 from music_flow.config import model_settings
 from music_flow.core.features.preprocessing import reverse_prediction
+from music_flow.core.model_index import ModelIndex
+from music_flow.core.tree_ensemble import TreeEnsemble
 from music_flow.core.utils import create_folder
 from music_flow.model.evaluator import Evaluator
 from music_flow.model.file_handler import save_json
@@ -266,6 +268,10 @@ class Training:
             path=self.path_model,
         )
 
+        model_index = ModelIndex(os.path.dirname(self.path_model))
+        model_index.add(self.folder_name, results)
+        model_index.close()
+
     def save_pickle(self) -> None:
         """
         save the estimator into a pickle file
@@ -281,6 +287,17 @@ class Training:
 
         self.logger.info(f"Save: {path}")
 
+    def save_tree_ensemble(self) -> None:
+        """
+        export the trees of the estimator for the numpy predictor backend,
+        which serves the model without xgboost
+        """
+        if not isinstance(self.final_model, XGBRegressor):
+            return
+
+        path = os.path.join(self.path_model, TreeEnsemble.file_name)
+        TreeEnsemble.from_xgboost(self.final_model).save(path)
+
     def save_predictions(self):
         self.df_test = pd.DataFrame(self.X_test, columns=self.column_names)
         self.df_test["predictions"] = self.y_pred
@@ -320,6 +337,7 @@ class Training:
         self.save_metadata(score_dict)
         self.train_on_all_data()
         self.save_pickle()
+        self.save_tree_ensemble()
 
         if save:
             self.save_predictions()
@@ -1,16 +1,17 @@
-from typing import Tuple
+from typing import List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split  # type: ignore
 
-from music_flow.config import dataset_settings
+from music_flow.config import dataset_settings, feature_settings
 from music_flow.dataset import __version__ as data_version
+from music_flow.dataset.columnar_dataset import load_features_and_target
 
 
 class TrainingData:
-    def __init__(self, X, y) -> None:
-        self.column_names = list(X)
+    def __init__(self, X, y, column_names: Optional[List[str]] = None) -> None:
+        self.column_names = column_names if column_names else list(X)
 
         self.X = X.values if isinstance(X, pd.DataFrame) else X
         self.y = y.values if isinstance(y, pd.DataFrame) else y
@@ -26,6 +27,26 @@ class TrainingData:
         self.y_train: np.ndarray
         self.y_test: np.ndarray
 
+    @classmethod
+    def from_columnar(
+        cls, path: str, columns: Optional[List[str]] = None
+    ) -> "TrainingData":
+        """Load the features and the target from the memory mapped columnar dataset
+
+        Args:
+            path (str): folder of the columnar dataset
+            columns (Optional[List[str]], optional): features. Defaults to the
+                columns of the feature schema.
+
+        Returns:
+            TrainingData: features and target as float32 arrays
+        """
+        if columns is None:
+            columns = feature_settings.columns_scope
+
+        X, y = load_features_and_target(path, columns, feature_settings.target_column)
+        return cls(X=X, y=y, column_names=columns)
+
     def do_train_test_split(self) -> None:
         """
         Get the train and test split of the features and target values
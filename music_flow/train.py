@@ -1,67 +1,19 @@
 import os
 
-import pandas as pd
 from xgboost import XGBRegressor  # type: ignore
 
 from music_flow.__init__ import __version__ as model_version
-from music_flow.config.core import settings
-from music_flow.core.features.preprocessing import feature_preprocessing
+from music_flow.config import dataset_settings, settings
 from music_flow.core.model_registry import ModelRegistry
 from music_flow.core.utils import path_dataset, path_results
-from music_flow.dataset.config import dataset_settings
-from music_flow.model.v2_Training import Training
+from music_flow.model.training import Training
+from music_flow.model.training_data import TrainingData
 
-path_dataset_file = os.path.join(path_dataset, dataset_settings.FINAL_DATASET)
+# written by `create_dataset`, with the dtypes of the feature schema
+path_columnar_dataset = os.path.join(path_dataset, dataset_settings.COLUMNAR_DATASET)
 
-dataset = pd.read_csv(path_dataset_file, sep=";", index_col=0)
-dataset = feature_preprocessing(dataset)
-
-# move to settings
-# add datatype to settings
-target_column = "plays"
-columns_scope = [
-    "number_of_available_markets",
-    "num_artists",
-    "duration_ms",
-    "explicit",
-    "popularity",
-    "release_year",
-    "release_month",
-    "release_day",
-    "date_is_complete",
-    "danceability",
-    "energy",
-    "loudness",
-    "mode",
-    "speechiness",
-    "acousticness",
-    "instrumentalness",
-    "liveness",
-    "valence",
-    "tempo",
-    "time_signature",
-    "A",
-    "A#/Bb",
-    "B",
-    "C",
-    "C#/Db",
-    "D",
-    "D#/Eb",
-    "E",
-    "F",
-    "F#/Gb",
-    "G",
-    "G#/Ab",
-    "Unknown",
-]
-
-
-X = dataset[columns_scope]
-y = dataset[target_column]
-
-print(X.describe().T)
-
-print(type(X))
+dataset = TrainingData.from_columnar(path_columnar_dataset)
+dataset.do_train_test_split()
 
 estimator = XGBRegressor()
 
@@ -87,8 +39,7 @@ cv_settings = {
 
 trainer = Training(
     estimator=estimator,
-    X=X,
-    y=y,
+    dataset=dataset,
     model_version=model_version,
     path_model=path_results,
 )
@@ -0,0 +1,24 @@
+from benchmarks.benchmark_hot_path import get_raw_features, measure
+from music_flow.core.features.get_formatted_features import get_formatted_features
+
+
+def test_recorded_spotify_responses_are_formatted():
+    raw_features = get_raw_features()
+    assert raw_features["status"] == "success"
+
+    features = get_formatted_features(data=raw_features, is_flattened=True)
+    assert features["number_of_available_markets"] == 183
+    assert features["release_year"] == 2015
+    assert features["key"] == 4
+    assert features["metadata"] == {
+        "song": "The Less I Know The Better",
+        "artist": ["Tame Impala"],
+        "album": "Currents",
+    }
+
+
+def test_measure_reports_percentiles_and_allocations():
+    result = measure(lambda: [0] * 1_000, iterations=20, warmup=1)
+    assert result["iterations"] == 20
+    assert 0 < result["p50_us"] <= result["p95_us"]
+    assert result["peak_kib"] > 0
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from music_flow.config import feature_settings
+from music_flow.dataset.columnar_dataset import (
+    read_columnar_dataset,
+    write_columnar_dataset,
+)
+from music_flow.model.training_data import TrainingData
+
+
+def get_dataset(rows=10):
+    rng = np.random.default_rng(0)
+    data = {}
+    for column, dtype in feature_settings.dataset_schema.items():
+        if dtype == "bool":
+            data[column] = rng.random(rows) < 0.5
+        elif dtype.startswith("int"):
+            data[column] = rng.integers(0, 100, rows)
+        else:
+            data[column] = rng.random(rows)
+    data["genre"] = ["rock", "pop"] * (rows // 2)
+    return pd.DataFrame(data)
+
+
+def test_columnar_dataset_is_typed_and_memory_mapped(tmp_path):
+    path = str(tmp_path / "dataset_columnar")
+    dataset = get_dataset()
+    schema = {**feature_settings.dataset_schema, "genre": "category"}
+    write_columnar_dataset(dataset, path, schema)
+
+    arrays = read_columnar_dataset(path)
+    assert list(arrays) == list(schema)
+    assert isinstance(arrays["popularity"], np.memmap)
+    assert arrays["popularity"].dtype == np.int16
+    assert arrays["explicit"].dtype == bool
+    assert arrays["danceability"].dtype == np.float32
+    assert arrays["genre"].tolist() == [1, 0] * 5
+
+    training_data = TrainingData.from_columnar(path)
+    assert training_data.get_column_names() == feature_settings.columns_scope
+    assert training_data.X.dtype == np.float32
+    np.testing.assert_array_equal(
+        training_data.X,
+        dataset[feature_settings.columns_scope].to_numpy(dtype=np.float32),
+    )
+
+
+def test_missing_values_in_integer_column_are_rejected(tmp_path):
+    dataset = get_dataset().astype({"popularity": float})
+    dataset.loc[0, "popularity"] = np.nan
+    with pytest.raises(Exception, match="popularity"):
+        write_columnar_dataset(
+            dataset, str(tmp_path / "dataset"), feature_settings.dataset_schema
+        )
+    assert not (tmp_path / "dataset").exists()
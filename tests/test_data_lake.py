@@ -0,0 +1,191 @@
+import gzip
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from music_flow.dataset import create_audio_features_dataset
+from music_flow.dataset.data_lake import DataLake, main, migrate_json_files
+
+
+def get_data(index: int, status: str = "success") -> dict:
+    return {"hash": f"hash-{index}", "status": status, "track_name": f"track {index}"}
+
+
+def test_records_are_appended_to_segments_and_indexed(tmp_path):
+    with DataLake(str(tmp_path), records_per_segment=3) as data_lake:
+        for index in range(7):
+            data_lake.append(get_data(index, "failed" if index == 4 else "success"))
+        # a retried track replaces its entry
+        data_lake.append(get_data(4))
+
+        segments = [file for file in os.listdir(tmp_path) if "segment" in file]
+        assert sorted(segments) == [
+            "segment-000001.ndjson.gz",
+            "segment-000002.ndjson.gz",
+            "segment-000003.ndjson.gz.part",
+        ]
+        assert len(data_lake) == 7
+        assert data_lake.get("hash-4") == get_data(4)
+        assert data_lake.get("hash-9") is None
+        assert "hash-6" in data_lake
+        assert data_lake.get_hashes("failed") == set()
+        assert [data["hash"] for data in data_lake.iter_records()] == [
+            f"hash-{index}" for index in [0, 1, 2, 3, 5, 6, 4]
+        ]
+
+        data_lake.delete("hash-0")
+        assert data_lake.get_hashes() == {f"hash-{index}" for index in range(1, 7)}
+
+    # a segment is a gzip file with a record per line
+    with gzip.open(tmp_path / "segment-000002.ndjson.gz", "rt") as f:
+        lines = [json.loads(line) for line in f]
+    assert lines == [get_data(3), get_data(4, "failed"), get_data(5)]
+
+
+def test_reopened_data_lake_recovers_from_a_stopped_write(tmp_path):
+    with DataLake(str(tmp_path), records_per_segment=3) as data_lake:
+        for index in range(4):
+            data_lake.append(get_data(index))
+
+    # bytes of a record that was not indexed before the process stopped
+    path_part = tmp_path / "segment-000002.ndjson.gz.part"
+    size = path_part.stat().st_size
+    with open(path_part, "ab") as f:
+        f.write(b"\x1f\x8b partial record")
+
+    with DataLake(str(tmp_path), records_per_segment=3) as data_lake:
+        assert path_part.stat().st_size == size
+        data_lake.append(get_data(4))
+        assert data_lake.get("hash-4") == get_data(4)
+        assert [data["hash"] for data in data_lake.iter_records()] == [
+            f"hash-{index}" for index in range(5)
+        ]
+
+    # the segment was renamed, but not marked as sealed in the index
+    os.replace(path_part, tmp_path / "segment-000002.ndjson.gz")
+    with DataLake(str(tmp_path), records_per_segment=3) as data_lake:
+        data_lake.append(get_data(6))
+        assert list(data_lake.get_segments().values())[1:] == [
+            str(tmp_path / "segment-000002.ndjson.gz"),
+            str(tmp_path / "segment-000003.ndjson.gz.part"),
+        ]
+        assert data_lake.get("hash-4") == get_data(4)
+
+
+def test_migration_of_the_json_files_resumes(tmp_path):
+    path_source = tmp_path / "data_lake_v2"
+    for folder in ["success", "failed"]:
+        (path_source / folder).mkdir(parents=True)
+    for index in range(5):
+        data = get_data(index)
+        del data["hash"]
+        (path_source / "success" / f"hash-{index}.json").write_text(json.dumps(data))
+    # retried track with a success and a failed file
+    (path_source / "failed" / "hash-0.json").write_text(
+        json.dumps({"status": "failed"})
+    )
+    (path_source / "failed" / "hash-5.json").write_text(
+        json.dumps({"status": "failed"})
+    )
+
+    path_target = str(tmp_path / "data_lake_v3")
+    with DataLake(path_target) as data_lake:
+        assert migrate_json_files(data_lake, str(path_source / "success")) == 5
+    main(["--source", str(path_source), "--target", path_target, "--delete"])
+
+    with DataLake(path_target) as data_lake:
+        assert data_lake.get_hashes("success") == {f"hash-{i}" for i in range(5)}
+        assert data_lake.get_hashes("failed") == {"hash-5"}
+        assert data_lake.get("hash-2") == get_data(2)
+    assert os.listdir(path_source / "success") == []
+    assert os.listdir(path_source / "failed") == []
+
+
+def test_data_lake_is_opened_by_one_writer_at_a_time(tmp_path):
+    data_lake = DataLake(str(tmp_path))
+    data_lake.append(get_data(0))
+    with pytest.raises(Exception, match="opened by another process"):
+        DataLake(str(tmp_path))
+
+    data_lake.close()
+    with DataLake(str(tmp_path)) as data_lake:
+        data_lake.append(get_data(1))
+        assert data_lake.get("hash-0") == get_data(0)
+        assert data_lake.get("hash-1") == get_data(1)
+
+
+def test_audio_features_dataset_is_created_from_the_data_lake(tmp_path, monkeypatch):
+    with open("benchmarks/fixtures/spotify_responses.json") as f:
+        fixture = json.load(f)
+    raw_features = {
+        "track_name": fixture["track_name"],
+        "artist_name": fixture["artist_name"],
+        "track": fixture["track"],
+        "audio_features": fixture["audio_features"],
+    }
+    path_data_lake = str(tmp_path / "data_lake")
+    with DataLake(path_data_lake) as data_lake:
+        data_lake.append({**raw_features, "hash": "success", "status": "success"})
+        # the audio analysis is not a feature of the dataset
+        data_lake.append(
+            {
+                **raw_features,
+                "hash": "no-analysis",
+                "status": "failed",
+                "failure_type": "audio_analysis",
+            }
+        )
+        data_lake.append(
+            {
+                **get_data(2, "failed"),
+                "hash": "not-found",
+                "failure_type": "search_track_url",
+            }
+        )
+
+    path_target_values = tmp_path / "target_values.csv"
+    hashes = ["success", "no-analysis", "not-found", "missing"]
+    pd.DataFrame({"hash": hashes}).to_csv(path_target_values, sep=";")
+    monkeypatch.setattr(
+        create_audio_features_dataset, "path_target_values", str(path_target_values)
+    )
+    monkeypatch.setattr(
+        create_audio_features_dataset,
+        "path_audio_features",
+        str(tmp_path / "audio_features.csv"),
+    )
+
+    df = create_audio_features_dataset.create_audio_features_dataset(path_data_lake)
+    assert len(df) == 2
+    with DataLake(path_data_lake) as data_lake:
+        # the failed track is downloaded again
+        assert data_lake.get_hashes() == {"success", "no-analysis"}
+
+
+def test_data_lake_is_closed_if_the_dataset_fails(tmp_path, monkeypatch):
+    path_data_lake = str(tmp_path / "data_lake")
+    with DataLake(path_data_lake) as data_lake:
+        data_lake.append(get_data(0))
+
+    path_target_values = tmp_path / "target_values.csv"
+    pd.DataFrame({"hash": ["hash-0"]}).to_csv(path_target_values, sep=";")
+    monkeypatch.setattr(
+        create_audio_features_dataset, "path_target_values", str(path_target_values)
+    )
+
+    def get_formatted_features(data, hash):
+        raise ValueError("invalid record")
+
+    monkeypatch.setattr(
+        create_audio_features_dataset, "get_formatted_features", get_formatted_features
+    )
+    with pytest.raises(ValueError) as error:
+        create_audio_features_dataset.create_audio_features_dataset(path_data_lake)
+    # the frames of the traceback are still referenced
+    assert error.traceback
+
+    # the lock of the data lake was released
+    with DataLake(path_data_lake) as data_lake:
+        assert data_lake.get("hash-0") == get_data(0)
@@ -0,0 +1,116 @@
+import time
+
+import pandas as pd
+import pytest
+import requests
+
+from benchmarks.spotify_stub import StubConfig, start_stub_server
+from music_flow.config import settings
+from music_flow.core.features import get_raw_features
+from music_flow.core.rate_limiter import TokenBucket
+from music_flow.dataset.data_lake import DataLake
+from music_flow.dataset.download_audio_features import download_audio_features
+from music_flow.dataset.download_audio_features_batch import (
+    download_audio_features_batch,
+)
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server, url = start_stub_server(StubConfig(latency="uniform:5:15"))
+    monkeypatch.setattr(settings, "SPOTIFY_API_URL", f"{url}/v1")
+    monkeypatch.setattr(get_raw_features.spotify_api.token_manager, "token", "t")
+    monkeypatch.setattr(get_raw_features.spotify_api.token_manager, "expires_at", 1e12)
+    yield url
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_is_concurrent_and_resumes(stub, tmp_path, monkeypatch):
+    path_data_lake = str(tmp_path / "data_lake")
+    target_values = pd.DataFrame(
+        {
+            "hash": [f"hash-{i}" for i in range(40)],
+            "track_name": [f"download track {i}" for i in range(40)],
+            "artist_name": ["artist"] * 40,
+            "plays": [1] * 40,
+        }
+    )
+    path_target_values = tmp_path / "target_values.csv"
+    target_values.to_csv(path_target_values, sep=";", index=False)
+    # a previous run stopped after the first ten tracks
+    with DataLake(path_data_lake) as data_lake:
+        for i in range(10):
+            data_lake.append({"hash": f"hash-{i}", "status": "success"})
+
+    def get_request(url):
+        raise Exception("the shared client of the process is used")
+
+    # the download has a client of its own
+    monkeypatch.setattr(get_raw_features.spotify_api, "get_request", get_request)
+
+    kwargs = dict(
+        max_workers=8,
+        rate_limit=1_000,
+        path_target_values=str(path_target_values),
+        path_data_lake=path_data_lake,
+    )
+    assert download_audio_features(**kwargs)
+
+    with DataLake(path_data_lake) as data_lake:
+        assert data_lake.get_hashes("success") == {f"hash-{i}" for i in range(40)}
+        assert data_lake.get("hash-0") == {"hash": "hash-0", "status": "success"}
+        assert data_lake.get("hash-20")["track_name"] == "download track 20"
+    assert get_raw_features.spotify_api.rate_limiter is None
+
+    requests_made = requests.get(f"{stub}/stub/stats").json()["requests"]
+    assert download_audio_features(**kwargs)
+    assert requests.get(f"{stub}/stub/stats").json()["requests"] == requests_made
+
+
+def test_token_bucket_limits_the_rate_and_pauses():
+    limiter = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(11):
+        limiter.acquire()
+    assert time.monotonic() - start >= 0.18
+
+    limiter.pause(0.2)
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.18
+    assert limiter.throttled == 1
+
+
+def test_batch_download_pipeline(stub, tmp_path):
+    path_data_lake = str(tmp_path / "data_lake")
+    target_values = pd.DataFrame(
+        {
+            "hash": [f"hash-{i}" for i in range(130)],
+            "track_name": [f"batch track {i}" for i in range(130)],
+            "artist_name": ["artist"] * 130,
+        }
+    )
+    path_target_values = tmp_path / "target_values.csv"
+    target_values.to_csv(path_target_values, sep=";", index=False)
+    with DataLake(path_data_lake) as data_lake:
+        data_lake.append({"hash": "hash-0", "status": "failed"})
+
+    assert download_audio_features_batch(
+        is_retry_failed_files=True,
+        search_workers=8,
+        batch_workers=2,
+        rate_limit=1_000,
+        path_target_values=str(path_target_values),
+        path_data_lake=path_data_lake,
+    )
+    with DataLake(path_data_lake) as data_lake:
+        assert len(data_lake.get_hashes("success")) == 130
+        assert data_lake.get_hashes("failed") == set()
+        data = data_lake.get("hash-7")
+    assert data["status"] == "success"
+    assert data["track"]["id"] == data["track_id"]
+    assert data["audio_features"]["id"] == data["track_id"]
+    requests_made = requests.get(f"{stub}/stub/stats").json()["requests"]
+    # one search per track, 2 audio features and 3 tracks batches
+    assert requests_made == 130 + 2 + 3
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+from music_flow.core.features.feature_encoder import FeatureEncoder
+from music_flow.core.features.preprocessing import feature_preprocessing
+
+model_features = [
+    "number_of_available_markets",
+    "num_artists",
+    "duration_ms",
+    "explicit",
+    "popularity",
+    "release_year",
+    "release_month",
+    "release_day",
+    "date_is_complete",
+    "danceability",
+    "energy",
+    "loudness",
+    "mode",
+    "speechiness",
+    "acousticness",
+    "instrumentalness",
+    "liveness",
+    "valence",
+    "tempo",
+    "time_signature",
+    "A",
+    "A#/Bb",
+    "B",
+    "C",
+    "C#/Db",
+    "D",
+    "D#/Eb",
+    "E",
+    "F",
+    "F#/Gb",
+    "G",
+    "G#/Ab",
+    "Unknown",
+]
+
+features = {
+    "track_name": "The Less I Know The Better",
+    "artist_name": "Tame Impala",
+    "number_of_available_markets": 183,
+    "num_artists": 1,
+    "duration_ms": 216320,
+    "explicit": True,
+    "popularity": 88,
+    "isrc": "AUUM71500303",
+    "release_date_precision": "day",
+    "release_year": 2015,
+    "release_month": 7,
+    "release_day": 17,
+    "date_is_complete": True,
+    "album": "Currents",
+    "danceability": 0.64,
+    "energy": 0.74,
+    "key": 4,
+    "loudness": -4.083,
+    "mode": 1,
+    "speechiness": 0.0284,
+    "acousticness": 0.0115,
+    "instrumentalness": 0.00678,
+    "liveness": 0.167,
+    "valence": 0.785,
+    "tempo": 116.879,
+    "id": "6K4t31amVTZDgR3sKmwUJJ",
+    "time_signature": 4,
+}
+
+
+def get_reference_sample(features: dict, columns: list) -> np.ndarray:
+    sample = pd.DataFrame(features, index=[0])
+    sample["plays"] = 0
+    sample_formated = feature_preprocessing(sample)
+    return sample_formated[columns].to_numpy(dtype=np.float32)
+
+
+def test_encoder_matches_feature_preprocessing():
+    encoder = FeatureEncoder(model_features)
+    for key in [0, 4, 11, float("nan")]:
+        sample = {**features, "key": key}
+        encoded = encoder.transform(sample)
+        reference = get_reference_sample(sample, model_features)
+        assert encoded.dtype == np.float32
+        assert encoded.shape == (1, len(model_features))
+        assert encoded.tobytes() == reference.tobytes()
+
+
+def test_encoder_follows_model_column_order():
+    columns = list(reversed(model_features))
+    encoder = FeatureEncoder(columns)
+    encoded = encoder.transform(features)
+    reference = get_reference_sample(features, columns)
+    assert encoded.tobytes() == reference.tobytes()
+
+
+def test_encoder_writes_into_preallocated_row():
+    encoder = FeatureEncoder(model_features)
+    out = np.full((1, len(model_features)), -1.0, dtype=np.float32)
+    encoded = encoder.transform(features, out=out)
+    assert encoded is out
+    assert out.tobytes() == get_reference_sample(features, model_features).tobytes()
+
+
+def test_encoder_batch_matches_single_rows():
+    encoder = FeatureEncoder(model_features)
+    samples = [{**features, "key": key} for key in range(12)]
+    encoded = encoder.transform_batch(samples)
+    assert encoded.shape == (len(samples), len(model_features))
+    for position, sample in enumerate(samples):
+        assert encoded[position].tobytes() == encoder.transform(sample)[0].tobytes()
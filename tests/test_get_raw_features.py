@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from music_flow.core.features import get_raw_features as raw_features_module
+from music_flow.core.features.get_raw_features import get_raw_features
+
+track = {
+    "name": "The Less I Know The Better",
+    "album": {"name": "Currents", "artists": [{"name": "Tame Impala"}]},
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_raw_features_cache():
+    raw_features_module.raw_features_cache.clear()
+
+
+def delayed(response, status_code, delay=0.2):
+    def endpoint(track_id):
+        time.sleep(delay)
+        return response, status_code
+
+    return endpoint
+
+
+def test_endpoints_are_fetched_concurrently(monkeypatch):
+    spotify_api = raw_features_module.spotify_api
+    monkeypatch.setattr(spotify_api, "get_audio_features", delayed({"key": 4}, 200))
+    monkeypatch.setattr(spotify_api, "get_track", delayed(track, 200))
+
+    start = time.perf_counter()
+    data, status_code = get_raw_features("song", "artist", track_id="abc")
+    elapsed = time.perf_counter() - start
+
+    assert status_code == 200
+    assert data["status"] == "success"
+    assert data["track_id"] == "abc"
+    assert data["metadata"]["album"] == "Currents"
+    assert elapsed < 0.35
+
+
+def test_first_failing_endpoint_sets_failure_type(monkeypatch):
+    spotify_api = raw_features_module.spotify_api
+    monkeypatch.setattr(spotify_api, "get_audio_features", delayed({}, 404, 0.2))
+    monkeypatch.setattr(spotify_api, "get_track", delayed({}, 404, 0.0))
+
+    data, status_code = get_raw_features("song", "artist", track_id="abc")
+
+    assert status_code == 404
+    assert data["status"] == "failed"
+    assert data["failure_type"] == "audio_features"
@@ -0,0 +1,79 @@
+import json
+import os
+
+from music_flow.core import model_index as model_index_module
+from music_flow.core.model_finder import get_model_folder
+from music_flow.core.model_index import ModelIndex
+
+
+def create_folder(path, folder, score=None):
+    os.makedirs(path / folder)
+    if score is not None:
+        metadata = {"model": {"model_version": "0.1.0", "score": score}}
+        (path / folder / "metadata.json").write_text(json.dumps(metadata))
+
+
+def test_latest_and_best_score_folder(tmp_path):
+    create_folder(tmp_path, "2023-01-01--00-00-00", {"r2_score": 0.6})
+    create_folder(tmp_path, "2023-02-01--00-00-00", {"r2_score": 0.4})
+    create_folder(tmp_path, "2023-03-01--00-00-00", {"r2_score": -0.1})
+    create_folder(tmp_path, "2023-04-01--00-00-00")
+
+    assert get_model_folder(path=str(tmp_path)) == "2023-04-01--00-00-00"
+    assert (
+        get_model_folder("best_score", "r2_score", path=str(tmp_path))
+        == "2023-01-01--00-00-00"
+    )
+
+
+def test_index_is_updated_incrementally(tmp_path, monkeypatch):
+    create_folder(tmp_path, "2023-01-01--00-00-00", {"mean_squared_error": 2.0})
+    model_index = ModelIndex(str(tmp_path))
+    assert model_index.get_best_score_folder("mean_squared_error", "lower", 1e6) == (
+        "2023-01-01--00-00-00"
+    )
+
+    # indexed folders are not read again
+    read_folders = []
+    monkeypatch.setattr(
+        "music_flow.core.model_index.get_score",
+        lambda path: read_folders.append(os.path.basename(path)),
+    )
+    create_folder(tmp_path, "2023-02-01--00-00-00")
+    model_index.add(
+        "2023-02-01--00-00-00", {"model": {"score": {"mean_squared_error": 1.0}}}
+    )
+    assert model_index.get_scores() == {
+        "2023-01-01--00-00-00": {"mean_squared_error": 2.0},
+        "2023-02-01--00-00-00": {"mean_squared_error": 1.0},
+    }
+    assert read_folders == []
+
+    os.rmdir(tmp_path / "2023-02-01--00-00-00")
+    assert model_index.get_latest_folder() == "2023-01-01--00-00-00"
+    model_index.close()
+
+
+def test_unchanged_results_folder_is_not_scanned_again(tmp_path, monkeypatch):
+    create_folder(tmp_path, "2023-01-01--00-00-00", {"r2_score": 0.6})
+    create_folder(tmp_path, "2023-02-01--00-00-00")
+
+    read_folders = []
+    get_score = model_index_module.get_score
+
+    def record_get_score(path):
+        read_folders.append(os.path.basename(path))
+        return get_score(path)
+
+    monkeypatch.setattr(model_index_module, "get_score", record_get_score)
+    for _ in range(3):
+        model_index = ModelIndex(str(tmp_path))
+        assert model_index.get_latest_folder() == "2023-02-01--00-00-00"
+        assert model_index.get_latest_folder() == "2023-02-01--00-00-00"
+        model_index.close()
+
+    # the folder without scores is only read by the first scan
+    assert sorted(read_folders) == ["2023-01-01--00-00-00", "2023-02-01--00-00-00"]
+
+    create_folder(tmp_path, "2023-03-01--00-00-00")
+    assert ModelIndex(str(tmp_path)).get_latest_folder() == "2023-03-01--00-00-00"
@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+from app.core.model_manager import ModelManager
+
+
+class FakePredictor:
+    def __init__(self, model_folder):
+        self.model_folder = model_folder
+        self.model_version = model_folder
+        self.is_warmed_up = False
+
+    def warm_up(self):
+        self.is_warmed_up = True
+        return 0.0
+
+
+def test_reload_swaps_in_warmed_up_predictor():
+    swapped = []
+    manager = ModelManager(FakePredictor, "v1", on_swap=swapped.append)
+    old_predictor = manager.load()
+
+    new_predictor = manager.reload("v2")
+    assert new_predictor.is_warmed_up
+    assert manager.get_predictor() is new_predictor
+    assert old_predictor.model_folder == "v1"
+    assert [predictor.model_folder for predictor in swapped] == ["v1", "v2"]
+
+    # the lifespan of the next Lambda invocation keeps the reloaded model
+    assert manager.load() is new_predictor
+
+
+def test_failed_or_concurrent_reload_keeps_current_model():
+    loading = threading.Event()
+    release = threading.Event()
+
+    def loader(model_folder):
+        if model_folder == "broken":
+            raise Exception("model not found")
+        if model_folder == "slow":
+            loading.set()
+            release.wait()
+        return FakePredictor(model_folder)
+
+    manager = ModelManager(loader, "v1")
+    manager.load()
+
+    with pytest.raises(Exception, match="model not found"):
+        manager.reload("broken")
+    assert manager.get_status()["last_error"] == "model not found"
+    assert manager.get_predictor().model_folder == "v1"
+
+    thread = threading.Thread(target=manager.reload, args=("slow",))
+    thread.start()
+    loading.wait()
+    with pytest.raises(Exception, match="already running"):
+        manager.reload("v3")
+    assert manager.get_predictor().model_folder == "v1"
+    release.set()
+    thread.join()
+    assert manager.get_predictor().model_folder == "slow"
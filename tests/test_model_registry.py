@@ -0,0 +1,269 @@
+import io
+import json
+import os
+import shutil
+
+import pytest
+from botocore.exceptions import ClientError
+
+from music_flow.core import model_registry
+from music_flow.core.model_registry import ModelRegistry, get_md5, get_multipart_etag
+
+
+class Paginator:
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, Bucket, Prefix):
+        keys = sorted(key for key in self.client.objects if key.startswith(Prefix))
+        # two objects per page to exercise the pagination
+        for start in range(0, len(keys), 2):
+            yield {
+                "Contents": [
+                    self.client.get_listing(key) for key in keys[start : start + 2]
+                ]
+            }
+
+
+class FileSystemS3Client:
+    """Stand-in for the boto3 s3 client that stores the objects in a folder"""
+
+    def __init__(self, path):
+        self.path = path
+        self.objects = {}
+        self.downloads = []
+        self.listings = 0
+        self.corrupt_downloads = False
+
+    def get_paginator(self, name):
+        assert name == "list_objects_v2"
+        self.listings += 1
+        return Paginator(self)
+
+    def get_listing(self, key):
+        return {
+            "Key": key,
+            "Size": os.path.getsize(self.objects[key]["path"]),
+            "ETag": self.objects[key]["etag"],
+        }
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Config=None):
+        path = os.path.join(self.path, Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(Filename, path)
+
+        if os.path.getsize(path) >= Config.multipart_threshold:
+            etag = get_multipart_etag(path, Config.multipart_chunksize)
+        else:
+            etag = get_md5(path)
+        metadata = (ExtraArgs or {}).get("Metadata", {})
+        self.objects[Key] = {"path": path, "etag": f'"{etag}"', "metadata": metadata}
+
+    def download_file(self, Bucket, Key, Filename, Config=None):
+        self.downloads.append(Key)
+        shutil.copyfile(self.objects[Key]["path"], Filename)
+        if self.corrupt_downloads:
+            with open(Filename, "r+b") as f:
+                f.write(b"x")
+
+    def head_object(self, Bucket, Key):
+        return {"Metadata": self.objects[Key]["metadata"]}
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            error = {"Error": {"Code": "NoSuchKey"}}
+            raise ClientError(error, "GetObject")
+        with open(self.objects[Key]["path"], "rb") as f:
+            return {"Body": io.BytesIO(f.read())}
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):
+        path = os.path.join(self.path, Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(Body)
+        self.objects[Key] = {"path": path, "etag": f'"{get_md5(path)}"', "metadata": {}}
+
+
+@pytest.fixture
+def model_folder(tmp_path):
+    path_results = tmp_path / "results"
+    folder = path_results / "2023-03-24--22-58-57"
+    os.makedirs(folder / "plots")
+    (folder / "model.pickle").write_bytes(os.urandom(300_000))
+    metadata = {"model": {"name": "model.pickle", "score": {"r2_score": 0.5}}}
+    (folder / "metadata.json").write_text(json.dumps(metadata))
+    (folder / "plots" / "plot.png").write_bytes(b"png")
+    return str(path_results), folder.name
+
+
+def get_registries(tmp_path, path_results, backend="xgboost"):
+    client = FileSystemS3Client(str(tmp_path / "s3"))
+    uploader = ModelRegistry("bucket", path_upload=path_results, s3_client=client)
+    downloader = ModelRegistry(
+        "bucket",
+        path_registry=str(tmp_path / "registry"),
+        s3_client=client,
+        backend=backend,
+    )
+    return client, uploader, downloader
+
+
+def test_intact_files_are_not_downloaded_again(tmp_path, model_folder, monkeypatch):
+    path_results, folder_name = model_folder
+    client, uploader, downloader = get_registries(tmp_path, path_results)
+    uploader.upload_folder(folder_name)
+
+    assert not downloader.is_complete(folder_name)
+    downloader.download_folder(folder_name)
+    assert sorted(client.downloads) == [
+        f"{folder_name}/metadata.json",
+        f"{folder_name}/model.pickle",
+    ]
+    assert downloader.is_complete(folder_name)
+
+    path_model = os.path.join(downloader.path_registry, folder_name, "model.pickle")
+    assert get_md5(path_model) == get_md5(
+        os.path.join(path_results, folder_name, "model.pickle")
+    )
+
+    # a corrupt local copy is detected and only this file is downloaded again,
+    # the startup check only compares the sizes and does not read the files
+    with open(path_model, "r+b") as f:
+        f.write(b"corrupt")
+    with monkeypatch.context() as context:
+        context.setattr(model_registry, "get_md5", None)
+        assert downloader.is_complete(folder_name)
+    assert not downloader.is_complete(folder_name, is_verify_checksums=True)
+
+    client.downloads.clear()
+    downloader.download_folder(folder_name)
+    assert client.downloads == [f"{folder_name}/model.pickle"]
+    assert downloader.is_complete(folder_name, is_verify_checksums=True)
+
+    with open(path_model, "ab") as f:
+        f.write(b"truncated download")
+    assert not downloader.is_complete(folder_name)
+
+
+def test_local_folder_without_manifest_is_complete(tmp_path, model_folder):
+    path_results, folder_name = model_folder
+    registry = ModelRegistry("bucket", path_registry=path_results, s3_client=object())
+    assert registry.is_complete(folder_name)
+
+    numpy_registry = ModelRegistry(
+        "bucket", path_registry=path_results, s3_client=object(), backend="numpy"
+    )
+    # the trees are exported from the pickled model
+    assert numpy_registry.is_complete(folder_name)
+
+    os.remove(os.path.join(path_results, folder_name, "model.pickle"))
+    assert not registry.is_complete(folder_name)
+    assert not numpy_registry.is_complete(folder_name)
+
+
+def test_multipart_uploads_are_verified_with_stored_checksum(
+    tmp_path, model_folder, monkeypatch
+):
+    monkeypatch.setattr(
+        model_registry.settings, "REGISTRY_MULTIPART_THRESHOLD", 100_000
+    )
+    monkeypatch.setattr(
+        model_registry.settings, "REGISTRY_MULTIPART_CHUNKSIZE", 100_000
+    )
+    path_results, folder_name = model_folder
+    client, uploader, downloader = get_registries(tmp_path, path_results)
+    uploader.upload_folder(folder_name)
+
+    assert client.objects[f"{folder_name}/model.pickle"]["etag"].endswith('-3"')
+    downloader.download_folder(folder_name)
+    assert downloader.is_complete(folder_name)
+
+    client.downloads.clear()
+    downloader.download_folder(folder_name)
+    assert client.downloads == []
+
+
+def test_corrupt_download_does_not_replace_local_copy(tmp_path, model_folder):
+    path_results, folder_name = model_folder
+    client, uploader, downloader = get_registries(tmp_path, path_results)
+    uploader.upload_folder(folder_name)
+    client.corrupt_downloads = True
+
+    with pytest.raises(Exception, match="checksum mismatch"):
+        downloader.download_folder(folder_name)
+
+    path_folder = os.path.join(downloader.path_registry, folder_name)
+    assert not os.path.exists(os.path.join(path_folder, "model.pickle"))
+    assert not any(file.endswith(".part") for file in os.listdir(path_folder))
+    assert not downloader.is_complete(folder_name)
+
+
+def test_download_is_resolved_from_manifest(tmp_path, model_folder):
+    path_results, folder_name = model_folder
+    client, uploader, downloader = get_registries(tmp_path, path_results)
+    uploader.upload_folder(folder_name)
+
+    manifest = json.loads(
+        client.get_object("bucket", f"{folder_name}/manifest.json")["Body"].read()
+    )
+    roles = {entry["path"]: entry["role"] for entry in manifest["files"]}
+    assert roles == {"metadata.json": "metadata", "model.pickle": "model"}
+
+    index = downloader.read_index()
+    assert index["folders"][folder_name]["score"] == {"r2_score": 0.5}
+    assert downloader.find_folder() == folder_name
+    assert downloader.find_folder("best_score", "r2_score") == folder_name
+
+    downloader.download_folder(folder_name)
+    assert client.listings == 0
+    assert downloader.is_complete(folder_name)
+
+
+def test_failed_upload_is_not_published(tmp_path, model_folder):
+    path_results, folder_name = model_folder
+    client, uploader, downloader = get_registries(tmp_path, path_results)
+    upload_file = client.upload_file
+
+    def fail_model_upload(Filename, Bucket, Key, ExtraArgs=None, Config=None):
+        if Key.endswith("model.pickle"):
+            raise ClientError({"Error": {"Code": "SlowDown"}}, "PutObject")
+        upload_file(Filename, Bucket, Key, ExtraArgs, Config)
+
+    client.upload_file = fail_model_upload
+    with pytest.raises(ClientError):
+        uploader.upload_folder(folder_name)
+
+    assert f"{folder_name}/manifest.json" not in client.objects
+    assert "index.json" not in client.objects
+    assert not os.path.exists(os.path.join(path_results, folder_name, "manifest.json"))
+
+
+def test_only_the_files_of_the_backend_are_downloaded(tmp_path, model_folder):
+    path_results, folder_name = model_folder
+    client, uploader, downloader = get_registries(tmp_path, path_results, "numpy")
+    # a model that was uploaded before the trees were exported
+    uploader.upload_folder(folder_name)
+    downloader.download_folder(folder_name)
+    assert sorted(client.downloads) == [
+        f"{folder_name}/metadata.json",
+        f"{folder_name}/model.pickle",
+    ]
+
+    path_trees = os.path.join(path_results, folder_name, "model.npz")
+    with open(path_trees, "wb") as f:
+        f.write(b"trees")
+    uploader.upload_folder(folder_name)
+    client.downloads.clear()
+    downloader.download_folder(folder_name)
+    assert client.downloads == [f"{folder_name}/model.npz"]
+    assert downloader.is_complete(folder_name)
+
+    # the folder is listed if it was uploaded without a manifest
+    del client.objects[f"{folder_name}/manifest.json"]
+    client.downloads.clear()
+    shutil.rmtree(downloader.path_registry)
+    downloader.download_folder(folder_name)
+    assert sorted(client.downloads) == [
+        f"{folder_name}/metadata.json",
+        f"{folder_name}/model.npz",
+    ]
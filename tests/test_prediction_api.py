@@ -0,0 +1,159 @@
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.spotify_stub import StubConfig, get_track_id, start_stub_server
+from music_flow.config import settings
+from music_flow.core.features import get_batch_raw_features
+from music_flow.core.features.get_raw_features import raw_features_cache
+from music_flow.core.spotify_token import token_manager
+
+client = TestClient(main.app)
+
+
+class FakePredictor:
+    def __init__(self, model_folder="fake-model", value=12.0):
+        self.model_folder = model_folder
+        self.model_version = model_folder
+        self.value = value
+        self.batch_sizes = []
+
+    def predict_from_features(self, features):
+        return self.predict_from_features_batch([features])[0]
+
+    def predict_from_features_batch(self, samples):
+        self.batch_sizes.append(len(samples))
+        return [self.value] * len(samples)
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server, url = start_stub_server(StubConfig())
+    monkeypatch.setattr(settings, "SPOTIFY_API_URL", f"{url}/v1")
+    monkeypatch.setattr(token_manager, "token", "t")
+    monkeypatch.setattr(token_manager, "expires_at", 1e12)
+    raw_features_cache.clear()
+    main.prediction_cache.clear()
+    yield url
+    raw_features_cache.clear()
+    main.prediction_cache.clear()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def predictor(monkeypatch):
+    predictor = FakePredictor()
+    monkeypatch.setattr(main.model_manager, "predictor", predictor)
+    return predictor
+
+
+def get_stats(url: str) -> dict:
+    return requests.get(f"{url}/stub/stats").json()
+
+
+def test_batch_predictions_are_fetched_in_batches(stub, predictor):
+    track_id = get_track_id("track:Other Song artist:Other Artist")
+    items = [
+        {"song": "Batch Song", "artist": "Artist"},
+        {"song": "Other Song", "artist": "Other Artist"},
+        {"song": "Batch Song", "artist": "Artist"},
+        {"track_id": track_id},
+    ]
+    response = client.post("/api/predictions", json={"items": items})
+
+    assert response.status_code == 200
+    assert response.headers["X-Model-Version"] == "fake-model"
+    predictions = response.json()["predictions"]
+    assert [prediction["status"] for prediction in predictions] == ["success"] * 4
+    assert [prediction["prediction"] for prediction in predictions] == [12.0] * 4
+    assert predictions[1]["track_id"] == predictions[3]["track_id"] == track_id
+    assert predictions[3]["song"] == "The Less I Know The Better"
+    # one model call for all songs
+    assert predictor.batch_sizes == [4]
+    # a search per song, the two distinct ids in one batch per endpoint
+    assert get_stats(stub)["requests"] == 3 + 2
+
+
+def test_batch_predictions_map_failures_per_item(stub, predictor, monkeypatch):
+    missing_id = get_track_id("track:Missing Features artist:Artist")
+    api = get_batch_raw_features.batch_spotify_api
+    get_batch_audio_features = api.get_batch_audio_features
+
+    def get_audio_features_without_missing_id(ids):
+        response, status_code = get_batch_audio_features(ids)
+        features = response["audio_features"]
+        response["audio_features"] = [
+            None if value["id"] == missing_id else value for value in features
+        ]
+        return response, status_code
+
+    search_track_id = get_batch_raw_features.search_track_id
+
+    def search_track_id_without_unknown_song(item):
+        if item["track_name"] == "Unknown Song":
+            return None, 404
+        return search_track_id(item)
+
+    monkeypatch.setattr(
+        api, "get_batch_audio_features", get_audio_features_without_missing_id
+    )
+    monkeypatch.setattr(
+        get_batch_raw_features, "search_track_id", search_track_id_without_unknown_song
+    )
+
+    items = [
+        {"song": "Unknown Song", "artist": "Artist"},
+        {"song": "Missing Features", "artist": "Artist"},
+        {"song": "Found Song", "artist": "Artist"},
+    ]
+    response = client.post("/api/predictions", json={"items": items})
+
+    assert response.status_code == 200
+    predictions = response.json()["predictions"]
+    assert [prediction["failure_type"] for prediction in predictions] == [
+        "search_track_url",
+        "audio_features",
+        None,
+    ]
+    assert [prediction["prediction"] for prediction in predictions] == [
+        None,
+        None,
+        12.0,
+    ]
+    assert predictor.batch_sizes == [1]
+
+
+def test_predictions_are_memoized_until_the_model_is_swapped(
+    stub, predictor, monkeypatch
+):
+    params = {"song": "Memoized Song", "artist": "Artist"}
+    first = client.get("/api/prediction/", params=params)
+    second = client.get("/api/prediction/", params=params)
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert predictor.batch_sizes == [1]
+    assert main.prediction_cache.ttl == settings.RAW_FEATURES_CACHE_TTL
+
+    monkeypatch.setattr(main.model_manager, "model_folder", None)
+    monkeypatch.setattr(main.model_manager, "loaded_at", None)
+    new_predictor = FakePredictor(model_folder="new-model", value=20.0)
+    main.model_manager.swap(new_predictor)
+    assert len(main.prediction_cache) == 0
+
+    response = client.get("/api/prediction/", params=params)
+    assert response.json()["prediction"] == 20.0
+    assert response.headers["X-Model-Version"] == "new-model"
+    assert new_predictor.batch_sizes == [1]
+
+
+def test_song_form_renders_the_prediction(stub, predictor):
+    response = client.post(
+        "/search_song", data={"song": "form song", "artist": "form artist"}
+    )
+
+    assert response.status_code == 200
+    assert "&#34;Form song&#34; by &#34;Form artist&#34;" in response.text
+    assert predictor.batch_sizes == [1]
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from music_flow.core.features.preprocessing import all_keys, feature_preprocessing
+
+
+def get_dataset(keys):
+    return pd.DataFrame(
+        {
+            "track_name": ["a"] * len(keys),
+            "key": keys,
+            "liveness": [0.5] * len(keys),
+            "plays": [10, 100, 5, 0][: len(keys)],
+        }
+    )
+
+
+def test_feature_preprocessing_has_fixed_columns():
+    dataset = get_dataset([4, 4])
+    original = dataset.copy()
+    result = feature_preprocessing(dataset)
+
+    assert list(result) == ["liveness", "plays"] + all_keys
+    assert result["E"].tolist() == [1, 1]
+    assert result[all_keys].to_numpy().sum() == 2
+    assert result["plays"].tolist() == [np.log1p(10), np.log1p(30)]
+    pd.testing.assert_frame_equal(dataset, original)
+
+
+def test_feature_preprocessing_maps_unknown_keys():
+    result = feature_preprocessing(get_dataset([np.nan, -1, 11, 0]))
+    assert result["Unknown"].tolist() == [1, 1, 0, 0]
+    assert result["B"].tolist() == [0, 0, 1, 0]
+    assert result["C"].tolist() == [0, 0, 0, 1]
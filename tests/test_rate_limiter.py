@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+from music_flow.core.rate_limiter import (
+    AdaptiveLimiter,
+    AIMDPolicy,
+    RequestLimiter,
+    SharedAdaptiveLimiter,
+)
+
+
+def test_policy_increases_per_interval_and_decreases_once_per_burst():
+    policy = AIMDPolicy(
+        min_limit=1, max_limit=8, initial_limit=2, increase_interval=1, decrease=0.5
+    )
+    state = policy.get_initial_state()
+
+    # the limit is only raised if it was reached, doubled until the first 429
+    policy.update(
+        state, now=10, acquired_at=9, in_flight=1, status_code=200, retry_after=1
+    )
+    assert state["limit"] == 2
+    policy.update(
+        state, now=10, acquired_at=9, in_flight=2, status_code=200, retry_after=1
+    )
+    assert state["limit"] == 4
+    policy.update(
+        state, now=10.5, acquired_at=10, in_flight=4, status_code=404, retry_after=1
+    )
+    assert state["limit"] == 4
+
+    policy.update(
+        state, now=11, acquired_at=10.8, in_flight=4, status_code=429, retry_after=2
+    )
+    assert state["limit"] == 2
+    assert state["paused_until"] == 13
+    # in flight before the cut
+    policy.update(
+        state, now=11.1, acquired_at=10.9, in_flight=2, status_code=429, retry_after=2
+    )
+    assert state["limit"] == 2
+    assert state["paused_until"] == 13.1
+
+    # no increase during the pause, a server error leaves the limit as is
+    policy.update(
+        state, now=13.5, acquired_at=13.2, in_flight=2, status_code=200, retry_after=1
+    )
+    assert state["limit"] == 2
+    policy.update(
+        state, now=14.2, acquired_at=14, in_flight=1, status_code=500, retry_after=1
+    )
+    assert state["limit"] == 2
+    policy.update(
+        state, now=14.2, acquired_at=14, in_flight=2, status_code=200, retry_after=1
+    )
+    assert state["limit"] == 3
+
+
+def test_adaptive_limiter_limits_the_requests_in_flight_and_pauses():
+    limiter = AdaptiveLimiter(
+        AIMDPolicy(min_limit=1, max_limit=8, initial_limit=2, decrease=0.5)
+    )
+    leases = [limiter.acquire(), limiter.acquire()]
+    assert limiter.try_acquire()[0] is None
+
+    limiter.release(leases[0], 429, retry_after=0.1)
+    limiter.release(leases[1], 429, retry_after=0.1)
+    assert limiter.get_stats() == {"limit": 1, "in_flight": 0, "throttled": 2}
+
+    lease, wait_time = limiter.try_acquire()
+    assert lease is None and 0.05 < wait_time <= 0.1
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.05
+    assert limiter.try_acquire()[0] is None
+
+
+def test_shared_limiter_shares_the_budget_between_processes(tmp_path):
+    path = str(tmp_path / "limiter.sqlite")
+    policy = AIMDPolicy(min_limit=1, max_limit=4, initial_limit=2, decrease=0.5)
+    first = SharedAdaptiveLimiter(path, policy)
+    # the state of the first limiter is kept
+    second = SharedAdaptiveLimiter(
+        path, AIMDPolicy(min_limit=1, max_limit=4, initial_limit=3, decrease=0.5)
+    )
+
+    leases = [first.acquire(), second.acquire()]
+    assert first.try_acquire()[0] is None
+    assert second.get_stats()["in_flight"] == 2
+
+    second.release(leases[1], 429, retry_after=0.2)
+    lease, wait_time = first.try_acquire()
+    assert lease is None and wait_time > 0.1
+    assert first.limit == 1
+
+    first.release(leases[0], 200)
+    assert second.get_stats() == {"limit": 1, "in_flight": 0, "throttled": 1}
+
+    # the lease of a crashed process expires
+    crashed = SharedAdaptiveLimiter(path, policy, lease_timeout=0)
+    time.sleep(0.2)
+    crashed.acquire()
+    assert first.acquire() is not None
+    for limiter in [first, second, crashed]:
+        limiter.close()
+
+
+def test_limiter_without_release_cannot_be_created():
+    class Limiter(RequestLimiter):
+        def try_acquire(self):
+            return time.monotonic(), 0.0
+
+    with pytest.raises(TypeError):
+        Limiter()
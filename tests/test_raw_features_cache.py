@@ -0,0 +1,79 @@
+from music_flow.core.cache import LRUCache
+from music_flow.core.features import get_raw_features as raw_features_module
+from music_flow.core.features.get_raw_features import get_raw_features
+from music_flow.core.features.raw_features_cache import RawFeaturesCache
+
+raw_features = {
+    "track_name": "The Less I Know The Better",
+    "artist_name": "Tame Impala",
+    "track_id": "abc",
+    "status": "success",
+    "audio_features": {"key": 4},
+}
+
+
+def test_lru_cache_evicts_least_recently_used_and_expired(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr("music_flow.core.cache.time.time", lambda: clock[0])
+
+    cache = LRUCache(max_size=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    clock[0] += 10
+    assert cache.get("c") is None
+    assert cache.get_stats() == {
+        "size": 1,
+        "max_size": 2,
+        "hits": 2,
+        "misses": 2,
+        "evictions": 1,
+    }
+
+
+def test_cache_is_keyed_by_normalized_name_and_track_id(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = RawFeaturesCache(max_size=10)
+    cache.set_path(path)
+    cache.add(raw_features)
+    cache.add({**raw_features, "track_id": "xyz", "status": "failed"})
+
+    data = cache.get("the less i know  the better ", "TAME IMPALA")
+    assert data["audio_features"] == {"key": 4}
+    assert data["artist_name"] == "TAME IMPALA"
+    assert cache.get("song", "artist", track_id="abc")["track_id"] == "abc"
+    assert cache.get("song", "artist", track_id="xyz") is None
+
+    # the disk tier survives a restart of the process
+    restarted_cache = RawFeaturesCache(max_size=10)
+    restarted_cache.set_path(path)
+    assert restarted_cache.get("song", "artist", track_id="abc") is not None
+    assert restarted_cache.get_stats()["disk"]["hits"] == 1
+
+
+def test_get_raw_features_is_served_from_cache(monkeypatch):
+    calls = []
+
+    def endpoint(response):
+        def func(track_id):
+            calls.append(track_id)
+            return response, 200
+
+        return func
+
+    track = {"name": "song", "album": {"name": "album", "artists": []}}
+    spotify_api = raw_features_module.spotify_api
+    monkeypatch.setattr(spotify_api, "get_audio_features", endpoint({"key": 4}))
+    monkeypatch.setattr(spotify_api, "get_track", endpoint(track))
+    monkeypatch.setattr(raw_features_module, "raw_features_cache", RawFeaturesCache())
+
+    first, _ = get_raw_features("song", "artist", track_id="abc")
+    second, status_code = get_raw_features("song", "artist", track_id="abc")
+
+    assert status_code == 200
+    assert second == first
+    assert len(calls) == 2
@@ -0,0 +1,92 @@
+import asyncio
+import gzip
+import json
+import os
+
+from app.core.record_sink import LocalUploader, RecordSink
+
+
+def read_records(path):
+    records = []
+    for root, _, files in os.walk(path):
+        for file in sorted(files):
+            assert file.endswith(".ndjson.gz")
+            with gzip.open(os.path.join(root, file), "rt") as f:
+                records.extend(json.loads(line) for line in f)
+    return records
+
+
+def test_records_are_uploaded_in_batches_on_flush(tmp_path):
+    sink = RecordSink(LocalUploader(str(tmp_path)), folder="activity", max_records=2)
+    for index in range(5):
+        sink.add({"index": index})
+
+    assert read_records(tmp_path) == []
+    assert sink.flush() == 5
+    assert len(os.listdir(tmp_path / "activity")) == 3
+    indices = sorted(record["index"] for record in read_records(tmp_path))
+    assert indices == list(range(5))
+
+
+def test_background_task_uploads_full_and_old_batches(tmp_path):
+    async def run():
+        sink = RecordSink(
+            LocalUploader(str(tmp_path)), folder="activity", max_records=3, max_age=0.2
+        )
+        sink.start()
+        for index in range(3):
+            sink.add({"index": index})
+        await asyncio.sleep(0.05)
+        assert sink.get_stats()["uploaded_records"] == 3
+
+        sink.add({"index": 3})
+        await asyncio.sleep(0.3)
+        assert sink.get_stats()["uploaded_records"] == 4
+
+        sink.add({"index": 4})
+        await sink.stop()
+        return sink.get_stats()
+
+    stats = asyncio.run(run())
+    assert stats["uploaded_batches"] == 3
+    assert stats["buffered_records"] == 0
+    assert len(read_records(tmp_path)) == 5
+
+
+def test_failed_upload_keeps_records_buffered(tmp_path):
+    class FailingUploader:
+        def upload(self, data, save_name):
+            raise Exception("s3 not available")
+
+    sink = RecordSink(FailingUploader(), folder="activity", max_buffer=3)
+    for index in range(5):
+        sink.add({"index": index})
+
+    assert sink.flush() == 0
+    stats = sink.get_stats()
+    assert stats["buffered_records"] == 3
+    assert stats["dropped_records"] == 2
+    assert stats["failed_uploads"] == 1
+
+
+def test_partitioned_batches_are_stored_by_upload_hour(tmp_path):
+    sink = RecordSink(
+        LocalUploader(str(tmp_path)), folder="predictions", is_partitioned=True
+    )
+    sink.add({"prediction": 1.0})
+    sink.flush()
+
+    (path,) = [
+        os.path.join(root, file)
+        for root, _, files in os.walk(tmp_path)
+        for file in files
+    ]
+    partition = os.path.relpath(os.path.dirname(path), tmp_path).split(os.sep)
+    assert partition[0] == "predictions"
+    assert [part.split("=")[0] for part in partition[1:]] == [
+        "year",
+        "month",
+        "day",
+        "hour",
+    ]
+    assert read_records(tmp_path) == [{"prediction": 1.0}]
@@ -0,0 +1,53 @@
+import threading
+
+from app.core.shadow import ShadowEvaluator
+
+
+class ListSink:
+    def __init__(self):
+        self.records = []
+
+    def add(self, record):
+        self.records.append(record)
+
+
+class FakePredictor:
+    model_folder = "shadow"
+    model_version = "0.2.0"
+
+    def __init__(self, release=None):
+        self.release = release
+
+    def predict_from_features_batch(self, samples):
+        if self.release:
+            self.release.wait()
+        return [sample["x"] * 2.0 for sample in samples]
+
+
+def test_shadow_predictions_are_paired_with_primary_records():
+    sink = ListSink()
+    evaluator = ShadowEvaluator(sink, max_pending=10)
+    records = [{"track_id": "a", "primary": {"prediction": 1.0}}, {"track_id": "b"}]
+    evaluator.submit(FakePredictor(), [{"x": 1.0}, {"x": 2.5}], records)
+    evaluator.wait()
+
+    assert [record["track_id"] for record in sink.records] == ["a", "b"]
+    assert sink.records[0]["primary"] == {"prediction": 1.0}
+    assert [record["shadow"]["prediction"] for record in sink.records] == [2.0, 5.0]
+    assert sink.records[0]["shadow"]["model_version"] == "0.2.0"
+    assert evaluator.get_stats()["evaluated"] == 2
+
+
+def test_shadow_evaluations_are_dropped_when_backlogged():
+    release = threading.Event()
+    sink = ListSink()
+    evaluator = ShadowEvaluator(sink, max_pending=1)
+    predictor = FakePredictor(release)
+
+    evaluator.submit(predictor, [{"x": 1.0}], [{"track_id": "a"}])
+    evaluator.submit(predictor, [{"x": 1.0}], [{"track_id": "b"}])
+    release.set()
+    evaluator.wait()
+
+    assert [record["track_id"] for record in sink.records] == ["a"]
+    assert evaluator.get_stats()["dropped"] == 1
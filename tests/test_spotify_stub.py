@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+import requests
+
+from benchmarks.spotify_stub import StubConfig, get_track_id, start_stub_server
+from music_flow.config import settings
+from music_flow.core.async_spotify_api import AsyncSpotifyAPI
+from music_flow.core.batch_spotify_api import BatchSpotifyAPI
+from music_flow.core.playlists.playlist_handler import PlaylistHandler
+from music_flow.core.spotify_api import SpotifyAPI
+from music_flow.core.spotify_token import SpotifyTokenManager
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    servers = []
+
+    def start(**kwargs):
+        server, url = start_stub_server(StubConfig(**kwargs))
+        servers.append(server)
+        monkeypatch.setattr(settings, "SPOTIFY_API_URL", f"{url}/v1")
+        monkeypatch.setattr(settings, "SPOTIFY_ACCOUNTS_URL", url)
+        return url
+
+    monkeypatch.setattr(
+        SpotifyTokenManager, "get_credentials", staticmethod(lambda: ("id", "secret"))
+    )
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_spotify_api_against_stub(stub):
+    url = stub()
+    api = SpotifyAPI(token=SpotifyTokenManager())
+
+    response, status_code = api.get_track_info("Song", "Artist", limit=1)
+    assert status_code == 200
+    track_id = response["tracks"]["items"][0]["id"]
+    assert track_id == get_track_id("track:Song artist:Artist")
+
+    track, status_code = api.get_track(track_id)
+    assert status_code == 200
+    assert track["id"] == track_id
+    features, _ = api.get_audio_features(track_id)
+    assert features["uri"] == f"spotify:track:{track_id}"
+    analysis, _ = api.get_audio_analysis(track_id)
+    assert analysis["track"]["tempo"] == features["tempo"]
+
+    api = BatchSpotifyAPI()
+    api.token_manager = SpotifyTokenManager()
+    tracks, _ = api.get_batch_tracks(["a", "b"])
+    assert [track["id"] for track in tracks["tracks"]] == ["a", "b"]
+
+    stats = requests.get(f"{url}/stub/stats").json()
+    assert stats["token"] == 2
+
+
+def test_session_reuses_the_connections(stub):
+    stub()
+    api = SpotifyAPI(token=SpotifyTokenManager(), rate_limiter=None)
+    for index in range(5):
+        _, status_code = api.get_track(f"track{index}")
+        assert status_code == 200
+
+    assert api.get_pool_stats() == {
+        "pools": 1,
+        "requests": 5,
+        "new_connections": 1,
+        "reused_connections": 4,
+    }
+
+
+def get_sockets(client) -> list:
+    """sockets of the pooled connections of an httpx client"""
+    return [
+        connection._connection._network_stream.get_extra_info("socket")
+        for connection in client._transport._pool.connections
+    ]
+
+
+def test_async_client_against_stub(stub):
+    url = stub(latency="constant:20")
+    api = AsyncSpotifyAPI(token=SpotifyTokenManager(), rate_limiter=None)
+
+    async def run():
+        client = api.get_client()
+        responses = await asyncio.gather(
+            *[api.get_track(f"track{index}") for index in range(10)]
+        )
+        # the pool of the running loop is shared by all requests
+        assert api.get_client() is client
+        return client, responses
+
+    first_client, responses = asyncio.run(run())
+    assert [response["id"] for response, _ in responses] == [
+        f"track{index}" for index in range(10)
+    ]
+    assert {status_code for _, status_code in responses} == {200}
+
+    first_sockets = get_sockets(first_client)
+    assert first_sockets
+
+    # a new event loop gets a new pool, the pool of the closed loop is not used
+    second_client, responses = asyncio.run(run())
+    assert second_client is not first_client
+    # the connections of the closed loop were closed
+    assert {sock.fileno() for sock in first_sockets} == {-1}
+    assert len(responses) == 10
+    second_sockets = get_sockets(second_client)
+    asyncio.run(api.aclose())
+    assert api.client is None
+    assert {sock.fileno() for sock in second_sockets} == {-1}
+
+    stats = requests.get(f"{url}/stub/stats").json()
+    assert stats["requests"] == 20
+    assert stats["token"] == 1
+
+
+def test_playlist_items_are_paged(stub):
+    stub(playlist_size=150)
+    handler = PlaylistHandler(headers={"Authorization": "Bearer t"})
+
+    first, _ = handler.get_playlist_items("playlist", limit=100, offset=0)
+    second, _ = handler.get_playlist_items("playlist", limit=100, offset=100)
+    assert len(first["items"]) == 100
+    assert len(second["items"]) == 50
+    assert first["next"].endswith("offset=100&limit=100")
+    assert second["next"] is None
+
+
+def test_stub_injects_rate_limits_and_errors(stub):
+    url = stub(rate_limit=2, retry_after=3)
+    headers = {"Authorization": "Bearer t"}
+    status_codes = [
+        requests.get(f"{url}/v1/tracks/a", headers=headers).status_code
+        for _ in range(3)
+    ]
+    assert status_codes == [200, 200, 429]
+    response = requests.get(f"{url}/v1/tracks/a", headers=headers)
+    assert response.headers["Retry-After"] == "3"
+
+    url = stub(error_rate=1.0, error_status=502, latency="uniform:1:5")
+    response = requests.get(f"{url}/v1/tracks/a", headers=headers)
+    assert response.status_code == 502
+    assert requests.get(f"{url}/v1/tracks/a").status_code == 401
@@ -0,0 +1,44 @@
+from music_flow.core import spotify_token
+from music_flow.core.spotify_token import SpotifyTokenManager
+
+
+class TokenResponse:
+    status_code = 200
+
+    def __init__(self, token, expires_in):
+        self.token = token
+        self.expires_in = expires_in
+
+    def json(self):
+        return {"access_token": self.token, "expires_in": self.expires_in}
+
+
+def test_token_is_fetched_lazily_and_refreshed_before_expiry(monkeypatch):
+    requests_made = []
+
+    def post(url, **kwargs):
+        requests_made.append(url)
+        return TokenResponse(f"token-{len(requests_made)}", expires_in=100)
+
+    monkeypatch.setattr(spotify_token.requests, "post", post)
+    monkeypatch.setattr(
+        SpotifyTokenManager, "get_credentials", staticmethod(lambda: ("id", "secret"))
+    )
+    clock = [1_000.0]
+    monkeypatch.setattr(spotify_token.time, "time", lambda: clock[0])
+
+    manager = SpotifyTokenManager(refresh_margin=10)
+    assert requests_made == []
+
+    assert manager.get_headers() == {"Authorization": "Bearer token-1"}
+    clock[0] += 80
+    assert manager.get_token() == "token-1"
+    assert len(requests_made) == 1
+
+    # within the refresh margin of the expiry
+    clock[0] += 15
+    assert manager.get_token() == "token-2"
+    assert len(requests_made) == 2
+
+    manager.invalidate()
+    assert manager.get_token() == "token-3"
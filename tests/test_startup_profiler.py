@@ -0,0 +1,36 @@
+import sys
+
+import pytest
+
+from music_flow.core.startup_profiler import LazyModule, StartupProfiler
+
+
+def test_lazy_module_is_imported_on_first_use(monkeypatch):
+    monkeypatch.delitem(sys.modules, "colorsys", raising=False)
+    profiler = StartupProfiler()
+    colorsys = LazyModule("colorsys", profiler)
+
+    assert "colorsys" not in sys.modules
+    assert colorsys.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert "colorsys" in sys.modules
+    assert list(profiler.get_report()["imports"]) == ["colorsys"]
+
+
+def test_only_first_successful_phase_is_recorded():
+    profiler = StartupProfiler()
+
+    with pytest.raises(ValueError):
+        with profiler.phase("token"):
+            raise ValueError("bad credentials")
+    assert "token" not in profiler.phases
+
+    with profiler.phase("model"):
+        pass
+    first = profiler.phases["model"]
+    with profiler.phase("model"):
+        pass
+
+    profiler.set_ready()
+    report = profiler.get_report()
+    assert report["phases"] == {"model": first}
+    assert report["ready_after"] >= first["start"] + first["duration"]
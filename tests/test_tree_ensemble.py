@@ -0,0 +1,67 @@
+import json
+
+import numpy as np
+from xgboost import XGBRegressor  # type: ignore
+
+from music_flow.core.tree_ensemble import TreeEnsemble
+
+
+def get_data(n_samples=400, n_features=10):
+    rng = np.random.default_rng(42)
+    X = rng.normal(size=(n_samples, n_features)).astype(np.float32)
+    X[rng.random(X.shape) < 0.1] = np.nan
+    y = np.nansum(X[:, :3], axis=1) + rng.normal(scale=0.1, size=n_samples)
+    return X, y
+
+
+def test_predictions_match_xgboost(tmp_path):
+    X, y = get_data()
+    estimator = XGBRegressor(n_estimators=50, max_depth=5).fit(X, y)
+
+    path = str(tmp_path / TreeEnsemble.file_name)
+    TreeEnsemble.from_xgboost(estimator).save(path)
+    trees = TreeEnsemble.load(path)
+
+    np.testing.assert_array_equal(trees.predict(X), estimator.predict(X))
+    np.testing.assert_array_equal(trees.predict(X[:1]), estimator.predict(X[:1]))
+
+
+def test_only_trees_up_to_best_iteration_are_used():
+    X, y = get_data()
+    estimator = XGBRegressor(n_estimators=300, early_stopping_rounds=3)
+    estimator.fit(X[:300], y[:300], eval_set=[(X[300:], y[300:])], verbose=False)
+
+    trees = TreeEnsemble.from_xgboost(estimator)
+
+    assert len(trees.trees) == estimator.best_iteration + 1
+    np.testing.assert_array_equal(trees.predict(X), estimator.predict(X))
+
+
+class VectorBaseScoreEstimator:
+    """the estimator as saved by newer xgboost versions, which write the base
+    score as a vector"""
+
+    def __init__(self, estimator):
+        self.estimator = estimator
+        self.best_iteration = getattr(estimator, "best_iteration", None)
+
+    def get_booster(self):
+        return self
+
+    def save_raw(self, raw_format):
+        model = json.loads(self.estimator.get_booster().save_raw(raw_format))
+        parameters = model["learner"]["learner_model_param"]
+        parameters["base_score"] = f"[{float(parameters['base_score']):E}]"
+        return json.dumps(model).encode("utf-8")
+
+
+def test_vector_base_score_is_parsed():
+    X, y = get_data()
+    estimator = XGBRegressor(n_estimators=20, max_depth=3, base_score=0.25)
+    estimator.fit(X, y)
+
+    trees = TreeEnsemble.from_xgboost(VectorBaseScoreEstimator(estimator))
+
+    assert trees.base_score == np.float32(0.25)
+    np.testing.assert_array_equal(trees.predict(X), estimator.predict(X))
+    assert TreeEnsemble.parse_base_score("[5E-1,1E0]") == 0.5